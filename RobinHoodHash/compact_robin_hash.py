@@ -0,0 +1,491 @@
+"""
+compact_robin_hash.py
+
+This module contains a memory compact version of the Robin Hood hash map in
+robin_hash.py
+
+RobinHash keeps a RobinEntry object in every occupied bin, and each of those
+carries its own __dict__, which costs far more memory than the key and value
+references it holds. CompactRobinHash stores the same information as a struct
+of arrays instead:
+    bin_hashes (array): the hash of the key in each bin
+    bin_dists (array): the probe distance of each bin, -1 for empty bins
+    bin_keys (list): the key in each bin
+    bin_values (list): the value in each bin
+
+The probing, Robin Hood swapping, backward shift deletion and incremental
+resizing all work the same way as in RobinHash. Since the hash of every key is
+stored, probing compares hashes before keys and migrating a bin during a
+resize never has to hash its key again
+
+Like RobinHash, the table counts the entries at each probe distance so that
+max_probe stays exact after deletes
+"""
+
+from array import array
+
+from robin_hash_functions import hash_function
+
+# Python 2's range builds a whole list, which the probing loops can't afford
+try:
+    range = xrange
+except NameError:
+    pass
+
+# Widest unsigned typecode available for the stored hashes
+# 'Q' doesn't exist before Python 3.3, where 'L' is 64 bits on most platforms
+try:
+    HASH_TYPECODE = 'Q'
+    array(HASH_TYPECODE)
+except ValueError:
+    HASH_TYPECODE = 'L'
+# Hashes are masked to fit in the hash array
+HASH_MASK = (1 << (8 * array(HASH_TYPECODE).itemsize)) - 1
+
+# Probe distance of an empty bin
+EMPTY = -1
+
+class CompactRobinHash():
+    """
+    compact_robin_hash.CompactRobinHash
+
+    Struct of arrays HashMap class
+    Has the same get/set/delete/load interface as robin_hash.RobinHash
+    """
+
+    def __init__(self, size = 128, max_load = None, min_load = None,
+                 rehash_step = 4, hash_fn = None):
+        """
+        CONSTRUCTOR
+
+        Parameters:
+            size: size of the hash map
+            max_load (float):
+                load factor above which the map doubles in size
+                None (default) keeps the map at a fixed size, in which case
+                set returns False once the map is full
+            min_load (float):
+                load factor below which the map halves in size
+                The map never shrinks below its initial size
+                None (default) disables shrinking
+            rehash_step (int):
+                number of old bins migrated on each get/set/delete while a
+                resize is in progress
+            hash_fn (function):
+                key -> int hash used to place keys in the bins
+                None (default) uses hash_function, Python's built in hash
+        Variables:
+            bin_hashes (array): masked hash of the key in each bin
+            bin_dists (array):
+                offset between the bin of each entry and the bin it would have
+                been inserted in had there been no collision
+                EMPTY for empty bins
+            bin_keys (list): key in each bin, None for empty bins
+            bin_values (list): value in each bin, None for empty bins
+            num_bins (int): number of bins in the hash table/hash map size
+            used_bins (int): number of bins currently in use
+            max_probe (int): max extra probing distance used by any entry
+            dist_counts (list):
+                number of entries at each probe distance, from 0 to max_probe
+            min_size (int): initial size, the map never shrinks below this
+            old_table (CompactRobinHash):
+                fixed size map holding the bins that still have to be
+                migrated during a resize
+                None if no resize is in progress
+            rehash_idx (int):
+                next bin of old_table to be migrated
+                Bins are migrated from the end of a cluster backwards
+            hash_fn (function): hash used to place keys in the bins
+        """
+        if max_load is not None and not 0 < max_load <= 1:
+            raise ValueError("max_load must be in (0, 1]")
+        if min_load is not None and not 0 <= min_load < (max_load or 1) / 2.0:
+            raise ValueError("min_load must be less than half of max_load")
+        if rehash_step < 1:
+            raise ValueError("rehash_step must be at least 1")
+
+        self.__allocate(size)
+        self.used_bins = 0
+
+        self.max_load = max_load
+        self.min_load = min_load
+        self.rehash_step = rehash_step
+        self.min_size = size
+        self.old_table = None
+        self.rehash_idx = 0
+        self.hash_fn = hash_function if hash_fn is None else hash_fn
+
+    def get(self, key):
+        """
+        CompactRobinHash.get
+
+        Gets the value associated with a key in the hash map
+
+        Parameters:
+            key (string): the key to be searched for in the map
+        Returns:
+            (AnyType)
+                Value associated with the key if the pair has been inserted
+                None otherwise
+        """
+
+        hash_value = self.hash_fn(key) & HASH_MASK
+        if self.old_table is not None:
+            self.__rehash()
+            # Keys that have not been migrated yet are still in the old bins
+            if self.old_table is not None:
+                idx = self.__find(key, hash_value)
+                if idx is None:
+                    return self.old_table.__get_value(key, hash_value)
+                return self.bin_values[idx]
+
+        return self.__get_value(key, hash_value)
+
+    def set(self, key, value):
+        """
+        CompactRobinHash.set
+        Inserts a key: value pair into the hash map
+
+        Parameters:
+            key (string): the key of the pair to be inserted
+            value (AnyType): the value of the pair to be inserted
+        Returns:
+            (Bool)
+                True if the set is successful
+                False if the set is not successful
+                    This should only occur if the hash map is full
+        """
+        if self.old_table is not None:
+            self.__rehash()
+
+        # First search for the key and override it if it is found
+        hash_value = self.hash_fn(key) & HASH_MASK
+        idx = self.__find(key, hash_value)
+        if idx is not None:
+            self.bin_values[idx] = value
+            return True
+
+        # The key may also be waiting to be migrated from the old bins
+        if self.old_table is not None:
+            old_idx = self.old_table.__find(key, hash_value)
+            if old_idx is not None:
+                self.old_table.bin_values[old_idx] = value
+                return True
+
+        # Grow the map before the insert would push it past max_load
+        if (self.max_load is not None and
+                self.used_bins + 1 > self.max_load * self.num_bins):
+            self.__start_resize(self.num_bins * 2 + 1)
+
+        # If map is full, return False
+        if self.used_bins == self.num_bins:
+            return False
+
+        self.used_bins += 1
+        return self.__insert(hash_value, key, value)
+
+    def delete(self, key):
+        """
+        CompactRobinHash.delete
+        Deletes a key: value pair in the map and backshifts affected entries
+
+        Parameters:
+            key (string): Key of the pair to delete
+        Returns:
+            (AnyType)
+                The value of the deleted pair if it is in the map
+                None if the value is not in the map
+        """
+
+        if self.old_table is not None:
+            self.__rehash()
+
+        hash_value = self.hash_fn(key) & HASH_MASK
+        idx = self.__find(key, hash_value)
+
+        if idx is None:
+            # Return None if the key is not found in the map
+            if self.old_table is None:
+                return None
+            # Otherwise the key may not have been migrated yet
+            old_table = self.old_table
+            old_idx = old_table.__find(key, hash_value)
+            if old_idx is None:
+                return None
+            val = old_table.bin_values[old_idx]
+            old_table.__remove(old_idx)
+            old_table.used_bins -= 1
+            self.used_bins -= 1
+            if old_table.used_bins == 0:
+                self.old_table = None
+            return val
+
+        val = self.bin_values[idx]
+        self.__remove(idx)
+        self.used_bins -= 1
+
+        # Shrink the map once it drops below min_load
+        if (self.min_load is not None and self.num_bins > self.min_size and
+                self.used_bins < self.min_load * self.num_bins):
+            self.__start_resize(max(self.num_bins // 2, self.min_size))
+        return val
+
+    def load(self):
+        """
+        CompactRobinHash.load
+        Returns the load factor of the map
+
+        Returns:
+            (float) load factor of hash map
+        """
+
+        return float(self.used_bins) / self.num_bins
+
+    def __allocate(self, size):
+        """
+        CompactRobinHash.__allocate
+        Internal function to replace the bins with size empty bins
+
+        Parameters:
+            size (int): number of bins to allocate
+        """
+
+        self.bin_hashes = array(HASH_TYPECODE, [0]) * size
+        self.bin_dists = array('i', [EMPTY]) * size
+        self.bin_keys = [None] * size
+        self.bin_values = [None] * size
+        self.num_bins = size
+        self.max_probe = 0
+        self.dist_counts = [0]
+
+    def __find(self, key, hash_value):
+        """
+        CompactRobinHash.__find
+        Internal function to search for a key
+
+        Parameters:
+            key (string): The key to search for
+            hash_value (int): The masked hash of the key
+        Returns:
+            (int) index of the bin holding the key, None if it is not found
+        """
+
+        num_bins = self.num_bins
+        bin_dists = self.bin_dists
+        bin_hashes = self.bin_hashes
+        bin_keys = self.bin_keys
+
+        init_idx = hash_value % num_bins
+        # Search until an empty bin, a bin where the entry would have been
+        #   inserted, or until the max probing distance of the table is
+        #   exceeded
+        # Empty bins have a distance of -1, so they also end the search
+        for i in range(self.max_probe + 1):
+            curr_idx = (init_idx + i) % num_bins
+            if i > bin_dists[curr_idx]:
+                return None
+            # Only compare keys whose full hashes match
+            if (bin_hashes[curr_idx] == hash_value and
+                    bin_keys[curr_idx] == key):
+                return curr_idx
+        return None
+
+    def __get_value(self, key, hash_value):
+        """
+        CompactRobinHash.__get_value
+        Internal function to get the value of a key in this table only
+
+        Parameters:
+            key (string): The key to search for
+            hash_value (int): The masked hash of the key
+        Returns:
+            (AnyType) the value of the key, None if it is not found
+        """
+
+        idx = self.__find(key, hash_value)
+        if idx is None:
+            return None
+        return self.bin_values[idx]
+
+    def __insert(self, hash_value, key, value):
+        """
+        CompactRobinHash.__insert
+        Internal function to place a pair into the bins using Robin Hood
+            linear probing
+        Does not update used_bins, which is up to the caller
+
+        Parameters:
+            hash_value (int): The masked hash of the key
+            key (string): The key to insert
+            value (AnyType): The value to insert
+        Returns:
+            (Bool)
+                True if the pair was placed
+                False if no empty bin was found
+        """
+
+        num_bins = self.num_bins
+        bin_dists = self.bin_dists
+        bin_hashes = self.bin_hashes
+        bin_keys = self.bin_keys
+        bin_values = self.bin_values
+        dist_counts = self.dist_counts
+
+        curr_idx = hash_value % num_bins
+        probe_dist = 0
+        for _ in range(num_bins):
+            curr_dist = bin_dists[curr_idx]
+            # Empty bin found -> insert here
+            if curr_dist == EMPTY:
+                bin_hashes[curr_idx] = hash_value
+                bin_dists[curr_idx] = probe_dist
+                bin_keys[curr_idx] = key
+                bin_values[curr_idx] = value
+                if probe_dist > self.max_probe:
+                    self.__raise_max_probe(probe_dist)
+                dist_counts[probe_dist] += 1
+                return True
+            # Current pair is further from home than the one in this bin
+            # Swap them and carry on inserting the pair that was there
+            if probe_dist > curr_dist:
+                if probe_dist > self.max_probe:
+                    self.__raise_max_probe(probe_dist)
+                dist_counts[probe_dist] += 1
+                dist_counts[curr_dist] -= 1
+                bin_hashes[curr_idx], hash_value = hash_value, bin_hashes[curr_idx]
+                bin_dists[curr_idx] = probe_dist
+                bin_keys[curr_idx], key = key, bin_keys[curr_idx]
+                bin_values[curr_idx], value = value, bin_values[curr_idx]
+                probe_dist = curr_dist
+            probe_dist += 1
+            curr_idx = (curr_idx + 1) % num_bins
+        # Should never run since an empty spot should always be found if the map
+        #   isn't full
+        return False
+
+    def __raise_max_probe(self, probe_dist):
+        """
+        CompactRobinHash.__raise_max_probe
+        Internal function to raise max_probe to a new longest probe distance
+
+        Parameters:
+            probe_dist (int): The probe distance about to be used
+        """
+
+        self.dist_counts.extend([0] * (probe_dist - self.max_probe))
+        self.max_probe = probe_dist
+
+    def __remove(self, idx):
+        """
+        CompactRobinHash.__remove
+        Internal function to empty a bin and backshift the entries after it
+        Does not update used_bins, which is up to the caller
+
+        Parameters:
+            idx (int): The index of the bin to empty
+        """
+
+        num_bins = self.num_bins
+        bin_dists = self.bin_dists
+        bin_hashes = self.bin_hashes
+        bin_keys = self.bin_keys
+        bin_values = self.bin_values
+        dist_counts = self.dist_counts
+        dist_counts[bin_dists[idx]] -= 1
+
+        # Shift entries back one until either an entry is in it's correct spot
+        #   or an empty bin is found
+        next_idx = (idx + 1) % num_bins
+        while bin_dists[next_idx] > 0:
+            next_dist = bin_dists[next_idx]
+            dist_counts[next_dist] -= 1
+            dist_counts[next_dist - 1] += 1
+            bin_hashes[idx] = bin_hashes[next_idx]
+            bin_dists[idx] = next_dist - 1
+            bin_keys[idx] = bin_keys[next_idx]
+            bin_values[idx] = bin_values[next_idx]
+            idx = next_idx
+            next_idx = (idx + 1) % num_bins
+        bin_hashes[idx] = 0
+        bin_dists[idx] = EMPTY
+        bin_keys[idx] = None
+        bin_values[idx] = None
+
+        # Lower max_probe past any distances no entry uses anymore
+        while self.max_probe and not dist_counts[self.max_probe]:
+            dist_counts.pop()
+            self.max_probe -= 1
+
+    def __start_resize(self, new_size):
+        """
+        CompactRobinHash.__start_resize
+        Internal function to swap in a new set of bins of a different size
+        The current bins are moved into old_table, from where they are
+            migrated a few at a time by __rehash
+
+        Parameters:
+            new_size (int): The number of bins after the resize
+        """
+
+        # Only one resize can be in flight at a time
+        if self.old_table is not None:
+            self.__finish_resize()
+
+        old_table = CompactRobinHash(0)
+        old_table.bin_hashes = self.bin_hashes
+        old_table.bin_dists = self.bin_dists
+        old_table.bin_keys = self.bin_keys
+        old_table.bin_values = self.bin_values
+        old_table.num_bins = self.num_bins
+        old_table.used_bins = self.used_bins
+        old_table.max_probe = self.max_probe
+        old_table.dist_counts = self.dist_counts
+        old_table.hash_fn = self.hash_fn
+
+        # Migrate backwards from the end of a cluster, so the bin after the
+        #   one being migrated is always empty and nothing has to backshift
+        boundary = 0
+        while (boundary < old_table.num_bins and
+                old_table.bin_dists[boundary] > 0):
+            boundary += 1
+
+        self.old_table = old_table
+        self.rehash_idx = (boundary - 1) % max(old_table.num_bins, 1)
+        self.__allocate(new_size)
+
+    def __rehash(self):
+        """
+        CompactRobinHash.__rehash
+        Internal function to migrate up to rehash_step bins from old_table
+            into the current bins, reusing the stored hashes
+
+        Bins are visited backwards starting from the end of a cluster, so
+            removing the entry at rehash_idx never has to shift anything back
+        """
+
+        old_table = self.old_table
+        for _ in range(self.rehash_step):
+            if old_table.used_bins == 0:
+                self.old_table = None
+                return
+            idx = self.rehash_idx
+            if old_table.bin_dists[idx] == EMPTY:
+                self.rehash_idx = (idx - 1) % old_table.num_bins
+            else:
+                hash_value = old_table.bin_hashes[idx]
+                key = old_table.bin_keys[idx]
+                value = old_table.bin_values[idx]
+                old_table.__remove(idx)
+                old_table.used_bins -= 1
+                self.__insert(hash_value, key, value)
+        if old_table.used_bins == 0:
+            self.old_table = None
+
+    def __finish_resize(self):
+        """
+        CompactRobinHash.__finish_resize
+        Internal function to migrate everything left in old_table at once
+        """
+
+        while self.old_table is not None:
+            self.__rehash()
@@ -0,0 +1,396 @@
+"""
+concurrent_robin_hash.py
+
+This module contains a thread-safe version of the Robin Hood hash map in
+robin_hash.py that can be shared by the threads of a request-serving pool
+
+Writers lock the bins in stripes of stripe_size bins. An insert or a delete
+only ever touches the bins from the key's ideal bin up to the empty bin that
+ends the Robin Hood swaps, or the bin that ends the backward shift, so it only
+locks the stripes covering that run. Stripes are always locked walking forward
+from the ideal bin, which is also the order of their indices except where the
+run wraps round past the last bin. Locks past the wrap are only tried, and if
+one is held the writer drops everything and starts again, so writers can't
+deadlock.
+A writer finds and locks the whole run before it changes anything, so it never
+has to undo a half-done change
+
+Readers never lock. Every stripe has a version number which a writer makes
+odd while it holds the stripe and even again when it lets go, like a seqlock.
+A reader notes the version of each stripe it probes and checks them again at
+the end; if any stripe was being written, or has been written since, the
+reader retries rather than trust what may have been a half-shifted cluster
+
+The map has a fixed size, and set returns False once it is full
+"""
+
+import threading
+
+from robin_hash import RobinEntry
+from robin_hash_functions import hash_function
+
+# Python 2's range builds a whole list, which the probing loops can't afford
+try:
+    range = xrange
+except NameError:
+    pass
+
+class _Retry(Exception):
+    """
+    concurrent_robin_hash._Retry
+
+    Raised when a writer couldn't take a lock without risking a deadlock
+    """
+
+# Returned by a read that overlapped a write
+_RETRY = object()
+
+class ConcurrentRobinHash():
+    """
+    concurrent_robin_hash.ConcurrentRobinHash
+
+    Thread-safe HashMap class with striped locks and lock-free reads
+    Has the same get/set/delete/load interface as robin_hash.RobinHash
+    """
+
+    def __init__(self, size = 128, stripe_size = 64, hash_fn = None):
+        """
+        CONSTRUCTOR
+
+        Parameters:
+            size: size of the hash map
+            stripe_size: number of bins covered by each lock
+            hash_fn (function):
+                key -> int hash used to place keys in the bins
+                None (default) uses hash_function, Python's built in hash
+                It's called without any lock held, so it must be thread-safe
+        Variables:
+            bins (list): array corresponding to the hash table
+            num_bins (int): number of bins in the hash table/hash map size
+            used_bins (int): number of bins currently in use
+            max_probe (int): max extra probing distance used by any entry
+            stripe_size (int): number of bins covered by each lock
+            locks (list): one lock per stripe
+            versions (list):
+                one version number per stripe
+                odd while a writer holds the stripe
+            count_lock (Lock): guards used_bins and max_probe
+            hash_fn (function): hash used to place keys in the bins
+        """
+        self.bins = [None] * size
+        self.num_bins = size
+        self.used_bins = 0
+        self.max_probe = 0
+
+        self.stripe_size = stripe_size
+        num_stripes = (size + stripe_size - 1) // stripe_size
+        self.locks = [threading.Lock() for _ in range(num_stripes)]
+        self.versions = [0] * num_stripes
+        self.count_lock = threading.Lock()
+        self.hash_fn = hash_function if hash_fn is None else hash_fn
+
+    def get(self, key):
+        """
+        ConcurrentRobinHash.get
+
+        Gets the value associated with a key in the hash map
+        Never blocks, but retries if a writer changed the bins it probed
+
+        Parameters:
+            key (string): the key to be searched for in the map
+        Returns:
+            (AnyType)
+                Value associated with the key if the pair has been inserted
+                None otherwise
+        """
+
+        hash_value = self.hash_fn(key)
+        while True:
+            value = self.__try_get(key, hash_value)
+            if value is not _RETRY:
+                return value
+
+    def set(self, key, value):
+        """
+        ConcurrentRobinHash.set
+        Inserts a key: value pair into the hash map
+
+        Parameters:
+            key (string): the key of the pair to be inserted
+            value (AnyType): the value of the pair to be inserted
+        Returns:
+            (Bool)
+                True if the set is successful
+                False if the set is not successful
+                    This should only occur if the hash map is full
+        """
+
+        hash_value = self.hash_fn(key)
+        while True:
+            held = []
+            try:
+                return self.__set(key, value, hash_value, held)
+            except _Retry:
+                pass
+            finally:
+                self.__release(held)
+
+    def delete(self, key):
+        """
+        ConcurrentRobinHash.delete
+        Deletes a key: value pair in the map and backshifts affected entries
+
+        Parameters:
+            key (string): Key of the pair to delete
+        Returns:
+            (AnyType)
+                The value of the deleted pair if it is in the map
+                None if the value is not in the map
+        """
+
+        hash_value = self.hash_fn(key)
+        while True:
+            held = []
+            try:
+                return self.__delete(key, hash_value, held)
+            except _Retry:
+                pass
+            finally:
+                self.__release(held)
+
+    def load(self):
+        """
+        ConcurrentRobinHash.load
+        Returns the load factor of the map
+
+        Returns:
+            (float) load factor of hash map
+        """
+
+        return float(self.used_bins) / self.num_bins
+
+    def __try_get(self, key, hash_value):
+        """
+        ConcurrentRobinHash.__try_get
+        Internal function to search for a key without taking any locks
+
+        Parameters:
+            key (string): The key to search for
+            hash_value (int): The hash of the key
+        Returns:
+            (AnyType)
+                the value of the key, None if it is not found
+                _RETRY if a writer changed any of the stripes probed
+        """
+
+        bins = self.bins
+        num_bins = self.num_bins
+        stripe_size = self.stripe_size
+        versions = self.versions
+
+        seen = []
+        last_stripe = -1
+        value = None
+        curr_idx = hash_value % num_bins
+        probe_dist = 0
+        # max_probe is read on every step, since writers raise it before
+        #   moving anything further out
+        while probe_dist <= self.max_probe:
+            stripe = curr_idx // stripe_size
+            if stripe != last_stripe:
+                version = versions[stripe]
+                # A writer holds this stripe
+                if version & 1:
+                    return _RETRY
+                seen.append((stripe, version))
+                last_stripe = stripe
+            curr_bin = bins[curr_idx]
+            if not curr_bin or probe_dist > curr_bin.bin_dist:
+                break
+            if curr_bin.hash_value == hash_value and curr_bin.key == key:
+                value = curr_bin.value
+                break
+            probe_dist += 1
+            curr_idx = (curr_idx + 1) % num_bins
+
+        # Everything read is only valid if no stripe was written meanwhile
+        for stripe, version in seen:
+            if versions[stripe] != version:
+                return _RETRY
+        return value
+
+    def __hold(self, held, idx):
+        """
+        ConcurrentRobinHash.__hold
+        Internal function to make sure a writer holds the stripe of a bin
+
+        Parameters:
+            held (list): stripes held by the writer, in the order taken
+            idx (int): The bin about to be read or written
+        Raises:
+            _Retry if the stripe is past the wrap round and is busy
+        """
+
+        stripe = idx // self.stripe_size
+        if stripe in held:
+            return
+        lock = self.locks[stripe]
+        # Runs only walk forward, so a stripe before the first one held means
+        #   the run has wrapped round
+        if held and stripe < held[0]:
+            # Only try these, to keep the lock order acyclic
+            if not lock.acquire(False):
+                raise _Retry()
+        else:
+            lock.acquire()
+        # Odd version tells readers the stripe may be mid-write
+        self.versions[stripe] += 1
+        held.append(stripe)
+
+    def __release(self, held):
+        """
+        ConcurrentRobinHash.__release
+        Internal function to let go of every stripe a writer holds
+
+        Parameters:
+            held (list): stripes held by the writer
+        """
+
+        for stripe in held:
+            self.versions[stripe] += 1
+            self.locks[stripe].release()
+        del held[:]
+
+    def __raise_max_probe(self, probe_dist):
+        """
+        ConcurrentRobinHash.__raise_max_probe
+        Internal function to raise max_probe before an entry is placed
+            further out than it
+
+        Parameters:
+            probe_dist (int): probe distance about to be used
+        """
+
+        if probe_dist > self.max_probe:
+            with self.count_lock:
+                self.max_probe = max(probe_dist, self.max_probe)
+
+    def __set(self, key, value, hash_value, held):
+        """
+        ConcurrentRobinHash.__set
+        Internal function to insert a pair, locking stripes into held
+
+        Parameters:
+            key (string): the key of the pair to be inserted
+            value (AnyType): the value of the pair to be inserted
+            hash_value (int): The hash of the key
+            held (list): stripes held, for the caller to release
+        Returns:
+            (Bool) as for set
+        Raises:
+            _Retry, before anything has been changed
+        """
+
+        bins = self.bins
+        num_bins = self.num_bins
+
+        # Search for the key, which ends where the insert has to start
+        curr_idx = hash_value % num_bins
+        probe_dist = 0
+        for _ in range(num_bins):
+            self.__hold(held, curr_idx)
+            curr_bin = bins[curr_idx]
+            if not curr_bin or probe_dist > curr_bin.bin_dist:
+                break
+            if curr_bin.hash_value == hash_value and curr_bin.key == key:
+                curr_bin.value = value
+                return True
+            probe_dist += 1
+            curr_idx = (curr_idx + 1) % num_bins
+
+        # The swaps end at the first empty bin, lock everything up to it
+        end_idx = curr_idx
+        for _ in range(num_bins):
+            self.__hold(held, end_idx)
+            if not bins[end_idx]:
+                break
+            end_idx = (end_idx + 1) % num_bins
+        else:
+            return False
+
+        with self.count_lock:
+            if self.used_bins == num_bins:
+                return False
+            self.used_bins += 1
+
+        # Robin Hood insert, every bin touched is now held
+        entry = RobinEntry(key, value, hash_value)
+        while True:
+            curr_bin = bins[curr_idx]
+            if not curr_bin:
+                self.__raise_max_probe(probe_dist)
+                entry.bin_dist = probe_dist
+                bins[curr_idx] = entry
+                return True
+            if probe_dist > curr_bin.bin_dist:
+                self.__raise_max_probe(probe_dist)
+                entry.bin_dist = probe_dist
+                bins[curr_idx] = entry
+                entry = curr_bin
+                probe_dist = entry.bin_dist
+            probe_dist += 1
+            curr_idx = (curr_idx + 1) % num_bins
+
+    def __delete(self, key, hash_value, held):
+        """
+        ConcurrentRobinHash.__delete
+        Internal function to delete a pair, locking stripes into held
+
+        Parameters:
+            key (string): Key of the pair to delete
+            hash_value (int): The hash of the key
+            held (list): stripes held, for the caller to release
+        Returns:
+            (AnyType) as for delete
+        Raises:
+            _Retry, before anything has been changed
+        """
+
+        bins = self.bins
+        num_bins = self.num_bins
+
+        # Search for the key
+        idx = hash_value % num_bins
+        for probe_dist in range(num_bins):
+            self.__hold(held, idx)
+            curr_bin = bins[idx]
+            if not curr_bin or probe_dist > curr_bin.bin_dist:
+                return None
+            if curr_bin.hash_value == hash_value and curr_bin.key == key:
+                break
+            idx = (idx + 1) % num_bins
+        else:
+            return None
+        val = bins[idx].value
+
+        # The shift ends at an empty bin or an entry in its ideal bin, lock
+        #   everything up to it
+        end_idx = (idx + 1) % num_bins
+        while True:
+            self.__hold(held, end_idx)
+            if not bins[end_idx] or bins[end_idx].bin_dist == 0:
+                break
+            end_idx = (end_idx + 1) % num_bins
+
+        # Backwards shift, every bin touched is now held
+        next_idx = (idx + 1) % num_bins
+        while next_idx != end_idx:
+            bins[next_idx].bin_dist -= 1
+            bins[idx] = bins[next_idx]
+            idx = next_idx
+            next_idx = (idx + 1) % num_bins
+        bins[idx] = None
+
+        with self.count_lock:
+            self.used_bins -= 1
+        return val
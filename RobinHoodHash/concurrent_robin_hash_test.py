@@ -0,0 +1,149 @@
+"""
+concurrent_robin_hash_test.py
+
+This program stress tests the ConcurrentRobinHash with writer threads that
+insert, overwrite and delete keys while reader threads look them up, then
+checks that the map ends up agreeing with what the writers did
+"""
+
+from concurrent_robin_hash import ConcurrentRobinHash
+import random
+import string
+import sys
+import threading
+
+# Switch threads far more often than usual to shake out races
+if hasattr(sys, 'setswitchinterval'):
+    sys.setswitchinterval(1e-6)
+else:
+    sys.setcheckinterval(1)
+
+def _get_random_string():
+    valid_chars = string.ascii_letters + string.digits
+    r_str = ""
+    length = random.randint(1, 20)
+    for i in range(length):
+        r_str += random.choice(valid_chars)
+    return r_str
+
+def _check_invariants(rh):
+    used = 0
+    max_dist = 0
+    for idx, entry in enumerate(rh.bins):
+        if entry is None:
+            continue
+        used += 1
+        max_dist = max(entry.bin_dist, max_dist)
+        assert (entry.hash_value + entry.bin_dist) % rh.num_bins == idx
+    assert used == rh.used_bins
+    assert max_dist <= rh.max_probe
+    assert all(v % 2 == 0 for v in rh.versions)
+
+print "Initializing Hash Map"
+rh = ConcurrentRobinHash(10, stripe_size = 3)
+
+print "Setting, overriding and deleting"
+assert rh.set('one', 1) == True
+assert rh.get('one') == 1
+assert rh.set('one', 'uno') == True
+assert rh.get('one') == 'uno'
+assert rh.load() == 0.1
+assert rh.delete('one') == 'uno'
+assert rh.get('one') == None
+assert rh.delete('one') == None
+
+print "Filling map"
+for i in range(10):
+    assert rh.set(str(i), i) == True
+assert rh.set('10', 10) == False
+for i in range(10):
+    assert rh.get(str(i)) == i
+_check_invariants(rh)
+for i in range(10):
+    assert rh.delete(str(i)) == i
+assert rh.load() == 0
+_check_invariants(rh)
+
+NUM_WRITERS = 4
+NUM_READERS = 4
+OPS = 5000
+errors = []
+
+def _writer(rh, keys, shared, final):
+    try:
+        for i in range(OPS):
+            key = random.choice(keys)
+            if random.random() < 0.3:
+                final.pop(key, None)
+                rh.delete(key)
+            else:
+                # Values carry their key so readers can spot mixed up entries
+                final[key] = (key, i)
+                assert rh.set(key, (key, i))
+            # Every writer also fights over the same few keys
+            if random.random() < 0.1:
+                key = random.choice(shared)
+                assert rh.set(key, (key, -1))
+    except Exception as e:
+        errors.append(e)
+
+def _reader(rh, keys, stable, done):
+    try:
+        while not done.is_set():
+            key = random.choice(keys)
+            value = rh.get(key)
+            assert value is None or value[0] == key
+            # Keys no writer touches must always be found
+            key = random.choice(stable)
+            assert rh.get(key) == (key, 0)
+    except Exception as e:
+        errors.append(e)
+
+print "\nRunning threaded experiments\n"
+NUM_EXPERIMENTS = 5
+for j in range(NUM_EXPERIMENTS):
+    # Small stripes and a small map make writers collide and wrap round often
+    rh = ConcurrentRobinHash(2048, stripe_size = random.choice([1, 4, 64]))
+    stable = [_get_random_string() + 's' + str(i) for i in range(200)]
+    for key in stable:
+        assert rh.set(key, (key, 0))
+    shared = [_get_random_string() + 'x' + str(i) for i in range(10)]
+    owned = [[_get_random_string() + 'w' + str(w) + '_' + str(i)
+              for i in range(300)] for w in range(NUM_WRITERS)]
+    finals = [{} for _ in range(NUM_WRITERS)]
+
+    done = threading.Event()
+    all_keys = sum(owned, shared)
+    readers = [threading.Thread(target = _reader,
+                                args = (rh, all_keys, stable, done))
+               for _ in range(NUM_READERS)]
+    writers = [threading.Thread(target = _writer,
+                                args = (rh, owned[w], shared, finals[w]))
+               for w in range(NUM_WRITERS)]
+    for t in readers + writers:
+        t.start()
+    for t in writers:
+        t.join()
+    done.set()
+    for t in readers:
+        t.join()
+    assert not errors, errors
+
+    _check_invariants(rh)
+    for key in stable:
+        assert rh.get(key) == (key, 0)
+    for w in range(NUM_WRITERS):
+        for key in owned[w]:
+            assert rh.get(key) == finals[w].get(key)
+    for key in shared:
+        assert rh.get(key) == (key, -1)
+    assert rh.used_bins == (len(stable) + len(shared) +
+                            sum(len(final) for final in finals))
+
+    print "{0:03d}/{1:d} | Max Probe: {2:03d} | Load Factor: {3:f}".format(
+                                                            j + 1,
+                                                            NUM_EXPERIMENTS,
+                                                            rh.max_probe,
+                                                            rh.load())
+
+print "All tests successful!"
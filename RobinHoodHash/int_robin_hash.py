@@ -0,0 +1,297 @@
+"""
+int_robin_hash.py
+
+This module contains a Robin Hood hash map specialized for 64-bit integer
+keys, such as user IDs, stored in NumPy arrays
+
+The bins are kept as three parallel arrays:
+    bin_keys (ndarray): int64 key in each bin
+    bin_dists (ndarray): probe distance of each bin, -1 for empty bins
+    bin_values (ndarray): value in each bin
+
+Integer keys are their own hash, so the ideal bin of a key is simply
+key % num_bins, the same as with Python's hash for any key that fits in 61
+bits. That makes it possible to look up a whole array of keys at once: every
+key takes one step of its probe sequence per round, and the keys that are
+found or that hit a bin closer to home than the current probe distance drop
+out, so the whole batch is answered in at most max_probe + 1 rounds of NumPy
+operations instead of a Python loop over each key
+"""
+
+import numpy as np
+
+# Python 2's range builds a whole list, which the probing loops can't afford
+try:
+    range = xrange
+except NameError:
+    pass
+
+# Probe distance of an empty bin
+EMPTY = -1
+
+class IntRobinHash():
+    """
+    int_robin_hash.IntRobinHash
+
+    Integer key HashMap class
+    Has the same get/set/delete/load interface as robin_hash.RobinHash, plus
+    vectorized get_many and contains
+    """
+
+    def __init__(self, size = 128, value_dtype = object):
+        """
+        CONSTRUCTOR
+
+        Parameters:
+            size: size of the hash map
+            value_dtype: NumPy dtype of the values, object by default
+        Variables:
+            bin_keys (ndarray): int64 key in each bin
+            bin_dists (ndarray):
+                offset between the bin of each entry and the bin it would have
+                been inserted in had there been no collision
+                EMPTY for empty bins
+            bin_values (ndarray): value in each bin
+            num_bins (int): number of bins in the hash table/hash map size
+            used_bins (int): number of bins currently in use
+            max_probe (int): max extra probing distance used by any entry
+        """
+        self.bin_keys = np.zeros(size, dtype = np.int64)
+        self.bin_dists = np.full(size, EMPTY, dtype = np.int32)
+        self.bin_values = np.zeros(size, dtype = value_dtype)
+        if self.bin_values.dtype == object:
+            self.bin_values[:] = None
+        self.num_bins = size
+        self.used_bins = 0
+        self.max_probe = 0
+
+    def get(self, key):
+        """
+        IntRobinHash.get
+
+        Gets the value associated with a key in the hash map
+
+        Parameters:
+            key (int): the key to be searched for in the map
+        Returns:
+            (AnyType)
+                Value associated with the key if the pair has been inserted
+                None otherwise
+        """
+
+        idx = self.__find(key)
+        if idx is None:
+            return None
+        return self.bin_values[idx]
+
+    def set(self, key, value):
+        """
+        IntRobinHash.set
+        Inserts a key: value pair into the hash map
+
+        Parameters:
+            key (int): the key of the pair to be inserted
+            value (AnyType): the value of the pair to be inserted
+        Returns:
+            (Bool)
+                True if the set is successful
+                False if the set is not successful
+                    This should only occur if the hash map is full
+        """
+
+        key = int(key)
+        idx = self.__find(key)
+        if idx is not None:
+            self.bin_values[idx] = value
+            return True
+
+        if self.used_bins == self.num_bins:
+            return False
+        self.used_bins += 1
+
+        num_bins = self.num_bins
+        bin_keys = self.bin_keys
+        bin_dists = self.bin_dists
+        bin_values = self.bin_values
+
+        curr_idx = key % num_bins
+        probe_dist = 0
+        for _ in range(num_bins):
+            curr_dist = bin_dists[curr_idx]
+            # Empty bin found -> insert here
+            if curr_dist == EMPTY:
+                bin_keys[curr_idx] = key
+                bin_dists[curr_idx] = probe_dist
+                bin_values[curr_idx] = value
+                self.max_probe = max(probe_dist, self.max_probe)
+                return True
+            # Current pair is further from home than the one in this bin
+            # Swap them and carry on inserting the pair that was there
+            if probe_dist > curr_dist:
+                self.max_probe = max(probe_dist, self.max_probe)
+                old_key = int(bin_keys[curr_idx])
+                old_value = bin_values[curr_idx]
+                bin_keys[curr_idx] = key
+                bin_dists[curr_idx] = probe_dist
+                bin_values[curr_idx] = value
+                key, value, probe_dist = old_key, old_value, int(curr_dist)
+            probe_dist += 1
+            curr_idx = (curr_idx + 1) % num_bins
+        # Should never run since an empty spot should always be found if the map
+        #   isn't full
+        return False
+
+    def delete(self, key):
+        """
+        IntRobinHash.delete
+        Deletes a key: value pair in the map and backshifts affected entries
+
+        Parameters:
+            key (int): Key of the pair to delete
+        Returns:
+            (AnyType)
+                The value of the deleted pair if it is in the map
+                None if the value is not in the map
+        """
+
+        idx = self.__find(key)
+        if idx is None:
+            return None
+        val = self.bin_values[idx]
+
+        num_bins = self.num_bins
+        bin_keys = self.bin_keys
+        bin_dists = self.bin_dists
+        bin_values = self.bin_values
+
+        # Shift entries back one until either an entry is in it's correct spot
+        #   or an empty bin is found
+        next_idx = (idx + 1) % num_bins
+        while bin_dists[next_idx] > 0:
+            bin_keys[idx] = bin_keys[next_idx]
+            bin_dists[idx] = bin_dists[next_idx] - 1
+            bin_values[idx] = bin_values[next_idx]
+            idx = next_idx
+            next_idx = (idx + 1) % num_bins
+        bin_keys[idx] = 0
+        bin_dists[idx] = EMPTY
+        bin_values[idx] = None if bin_values.dtype == object else 0
+        self.used_bins -= 1
+        return val
+
+    def load(self):
+        """
+        IntRobinHash.load
+        Returns the load factor of the map
+
+        Returns:
+            (float) load factor of hash map
+        """
+
+        return float(self.used_bins) / self.num_bins
+
+    def get_many(self, keys, default = None):
+        """
+        IntRobinHash.get_many
+        Gets the values associated with an array of keys in one vectorized
+            probe
+
+        Parameters:
+            keys (array_like): int64 keys to be searched for in the map
+            default:
+                value given to keys that are not in the map
+                Must fit in value_dtype
+                None (default) gives None for object values and 0 for
+                numeric ones, as empty bins hold after a delete
+        Returns:
+            (ndarray) the value associated with each key, in order
+        """
+
+        idx = self.__find_many(keys)
+        found = idx != EMPTY
+        values = np.empty(len(idx), dtype = self.bin_values.dtype)
+        if not found.all():
+            if default is None and values.dtype != object:
+                default = 0
+            values[~found] = default
+        values[found] = self.bin_values[idx[found]]
+        return values
+
+    def contains(self, keys):
+        """
+        IntRobinHash.contains
+        Checks which keys of an array are in the map in one vectorized probe
+
+        Parameters:
+            keys (array_like): int64 keys to be searched for in the map
+        Returns:
+            (ndarray) boolean array, True where the key is in the map
+        """
+
+        return self.__find_many(keys) != EMPTY
+
+    def __find(self, key):
+        """
+        IntRobinHash.__find
+        Internal function to search for a single key
+
+        Parameters:
+            key (int): The key to search for
+        Returns:
+            (int) index of the bin holding the key, None if it is not found
+        """
+
+        num_bins = self.num_bins
+        bin_keys = self.bin_keys
+        bin_dists = self.bin_dists
+
+        init_idx = key % num_bins
+        # Empty bins have a distance of -1, so they also end the search
+        for i in range(self.max_probe + 1):
+            curr_idx = (init_idx + i) % num_bins
+            if i > bin_dists[curr_idx]:
+                return None
+            if bin_keys[curr_idx] == key:
+                return curr_idx
+        return None
+
+    def __find_many(self, keys):
+        """
+        IntRobinHash.__find_many
+        Internal function to search for an array of keys at once
+
+        Every key still being searched for takes one probing step per round
+        A key drops out when it is found, or when the bin it reaches is
+            empty or closer to home than the current probe distance, since
+            then the key cannot be further along
+
+        Parameters:
+            keys (array_like): The int64 keys to search for
+        Returns:
+            (ndarray) index of the bin holding each key, EMPTY if not found
+        """
+
+        keys = np.asarray(keys, dtype = np.int64).ravel()
+        num_bins = self.num_bins
+        bin_keys = self.bin_keys
+        bin_dists = self.bin_dists
+
+        result = np.full(len(keys), EMPTY, dtype = np.intp)
+        # Which keys are still being searched for, and the bin each is at
+        active = np.arange(len(keys))
+        active_keys = keys
+        curr_idx = keys % num_bins
+        for i in range(self.max_probe + 1):
+            if not len(active):
+                break
+            # Early termination mask: empty bins have a distance of -1
+            alive = bin_dists[curr_idx] >= i
+            hit = alive & (bin_keys[curr_idx] == active_keys)
+            result[active[hit]] = curr_idx[hit]
+
+            searching = alive & ~hit
+            active = active[searching]
+            active_keys = active_keys[searching]
+            curr_idx = curr_idx[searching] + 1
+            curr_idx[curr_idx == num_bins] = 0
+        return result
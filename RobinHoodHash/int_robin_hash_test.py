@@ -0,0 +1,80 @@
+"""
+int_robin_hash_test.py
+
+This program tests that the IntRobinHash integer key hash map agrees with a
+plain dict, through both the single key and the vectorized operations
+"""
+
+from __future__ import division
+from int_robin_hash import IntRobinHash
+import numpy as np
+import random
+
+print "Initializing Hash Map"
+rh = IntRobinHash(10)
+
+print "Setting, overriding and deleting"
+assert rh.set(1, 'one') == True
+assert rh.set(-7, 'minus seven') == True
+assert rh.get(1) == 'one'
+assert rh.get(-7) == 'minus seven'
+assert rh.set(1, 1) == True
+assert rh.get(1) == 1
+assert rh.load() == 0.2
+assert rh.delete(1) == 1
+assert rh.get(1) == None
+assert rh.delete(1) == None
+assert rh.load() == 0.1
+
+print "Inserting colliding keys to fill map"
+rh = IntRobinHash(10)
+for i in range(10):
+    assert rh.set(8 + 10 * i, i) == True
+    assert rh.load() == (i + 1) / 10
+assert rh.set(11, 11) == False
+assert rh.max_probe == 9
+assert list(rh.get_many([8 + 10 * i for i in range(10)])) == list(range(10))
+for i in range(10):
+    assert rh.delete(8 + 10 * i) == i
+assert rh.load() == 0
+
+print "\nRunning randomized experiments\n"
+NUM_EXPERIMENTS = 20
+for j in range(NUM_EXPERIMENTS):
+    rh = IntRobinHash(4096, value_dtype = np.int64)
+    d = {}
+    for i in range(6000):
+        key = random.randint(-2 ** 63, 2 ** 63 - 1)
+        if random.random() < 0.3 and d:
+            key = random.choice(list(d))
+        if random.random() < 0.2:
+            assert rh.delete(key) == d.pop(key, None)
+        else:
+            assert rh.set(key, i)
+            d[key] = i
+
+    present = np.array(list(d), dtype = np.int64)
+    missing = np.array([random.randint(-2 ** 63, 2 ** 63 - 1)
+                        for _ in range(1000)], dtype = np.int64)
+    missing = missing[~np.isin(missing, present)]
+    keys = np.concatenate([present, missing])
+
+    found = rh.contains(keys)
+    assert found[:len(present)].all()
+    assert not found[len(present):].any()
+    values = rh.get_many(keys, default = -1)
+    assert list(values[:len(present)]) == [d[key] for key in present]
+    assert (values[len(present):] == -1).all()
+    # The default default fits the int64 values
+    values = rh.get_many(keys)
+    assert values.dtype == np.int64
+    assert (values[len(present):] == 0).all()
+    assert len(rh.get_many([])) == 0
+
+    print "{0:03d}/{1:d} | Max Probe: {2:03d} | Load Factor: {3:f}".format(
+                                                            j + 1,
+                                                            NUM_EXPERIMENTS,
+                                                            rh.max_probe,
+                                                            rh.load())
+
+print "All tests successful!"
@@ -0,0 +1,294 @@
+"""
+robin_cache.py
+
+This module contains a fixed capacity cache built on the Robin Hood hash map
+in robin_hash.py, for keeping the hot keys of a slow store in memory
+
+The cache evicts with the CLOCK algorithm, an approximation of least recently
+used eviction that needs no recency list. Every entry carries a reference bit
+which a hit sets. When a new key arrives at a full cache, a clock hand sweeps
+the bins from where it last stopped, clearing set reference bits as it passes
+them, and evicts the first entry whose bit is already clear: one that hasn't
+been hit since the hand last came round
+
+The reference bit lives on the entry rather than in a separate array, so it
+moves with the entry through Robin Hood swaps and backward shifts. A hit only
+flips that bit, so get doesn't allocate anything or touch any other entry
+
+The hand doesn't move to the next bin but a stride of about 0.618 of the
+table ahead, a stride that shares no factor with the number of bins, so it
+still visits every bin once per turn. A hand moving one bin at a time leaves
+the bins just behind it nearly empty and those just ahead of it nearly full,
+and with linear probing those full bins become long clusters that slow down
+every insert and delete. Striding spreads the evictions over the whole table
+so the load stays even
+"""
+
+from robin_hash import RobinEntry, RobinHash
+
+def _clock_stride(num_bins):
+    """
+    Step for the clock hand: close to num_bins / golden ratio and coprime to
+    num_bins, so successive positions are spread out but cover every bin
+    """
+    stride = int(num_bins * 0.6180339887) | 1
+    while True:
+        a, b = stride, num_bins
+        while b:
+            a, b = b, a % b
+        if a == 1:
+            return stride
+        stride += 2
+
+class CacheEntry(RobinEntry):
+    """
+    robin_cache.CacheEntry
+
+    Entries of the cache
+    """
+
+    def __init__(self, key, value, hash_value = None):
+        """
+        CONSTRUCTOR
+
+        Parameters:
+            key (string): dictionary key
+            value (AnyType): dictionary value
+            hash_value (int): hash of the key
+        Variables:
+            referenced (bool):
+                CLOCK reference bit, set by every hit and cleared as the
+                clock hand passes
+                New entries start clear, so a key that is set but never read
+                is the first to go
+        """
+
+        RobinEntry.__init__(self, key, value, hash_value)
+        self.referenced = False
+
+class RobinCache(RobinHash):
+    """
+    robin_cache.RobinCache
+
+    Fixed capacity cache with CLOCK eviction
+    set evicts an entry to make room instead of returning False
+    """
+
+    _entry_class = CacheEntry
+
+    def __init__(self, capacity, size = None, hash_fn = None):
+        """
+        CONSTRUCTOR
+
+        Parameters:
+            capacity (int): most pairs the cache holds
+            size (int):
+                number of bins
+                Defaults to keeping the load factor at or below 0.8 when full
+            hash_fn (function):
+                key -> int hash used to place keys in the bins
+                None (default) uses Python's built in hash
+        Variables:
+            capacity (int): most pairs the cache holds
+            hand (int): bin the clock hand is at
+            stride (int): number of bins the hand moves each step
+            hits (int): number of get calls that found their key
+            misses (int): number of get calls that didn't
+            evictions (int): number of pairs evicted to make room
+        """
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        if size is None:
+            size = int(capacity / 0.8) + 1
+        if size <= capacity:
+            raise ValueError("size must be larger than capacity")
+
+        RobinHash.__init__(self, size, hash_fn = hash_fn)
+        self.capacity = capacity
+        self.hand = 0
+        self.stride = _clock_stride(self.num_bins)
+
+    def get(self, key, default = None):
+        """
+        RobinCache.get
+
+        Gets the value associated with a key and marks it as recently used
+
+        Parameters:
+            key (string): the key to be searched for in the cache
+            default (AnyType): value returned for keys not in the cache
+        Returns:
+            (AnyType)
+                Value associated with the key if it is cached
+                default (None) otherwise
+        """
+
+        entry = self._find_entry(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        entry.referenced = True
+        return entry.value
+
+    def __getitem__(self, key):
+        entry = self._find_entry(key)
+        if entry is None:
+            self.misses += 1
+            raise KeyError(key)
+        self.hits += 1
+        entry.referenced = True
+        return entry.value
+
+    def get_many(self, keys):
+        """
+        RobinCache.get_many
+        Gets the values associated with many keys, marking each one found as
+            recently used and counting the hits and misses like get
+
+        Parameters:
+            keys (iterable): the keys to be searched for in the cache
+        Returns:
+            (list) the value associated with each key, None for keys not in
+                the cache
+        """
+
+        find_entry = self._find_entry
+        values = []
+        hits = 0
+        for key in keys:
+            entry = find_entry(key)
+            if entry is None:
+                values.append(None)
+            else:
+                hits += 1
+                entry.referenced = True
+                values.append(entry.value)
+        self.hits += hits
+        self.misses += len(values) - hits
+        return values
+
+    def set(self, key, value):
+        """
+        RobinCache.set
+        Inserts a key: value pair, evicting another pair if the cache is full
+
+        Parameters:
+            key (string): the key of the pair to be inserted
+            value (AnyType): the value of the pair to be inserted
+        Returns:
+            (Bool) True
+        """
+
+        # One probe finds the key or the bin a new entry goes in, and the
+        # new entry is placed from there
+        hash_value = self.hash_fn(key)
+        idx, probe_dist, entry = self._probe(key, hash_value)
+        if entry is not None:
+            entry.value = value
+            entry.referenced = True
+            return True
+        if self.used_bins >= self.capacity:
+            self.evict()
+            # Evicting shifts entries back, so the stopping bin may be stale:
+            # place the entry from its ideal bin, without comparing keys
+            idx, probe_dist = None, 0
+        return self._insert_at(self._entry_class(key, value, hash_value),
+                               idx, probe_dist)
+
+    def set_many(self, items):
+        """
+        RobinCache.set_many
+        Inserts many key: value pairs, evicting as needed
+
+        Parameters:
+            items (iterable): (key, value) pairs to insert
+        Returns:
+            (int) the number of pairs set
+        """
+
+        count = 0
+        for key, value in items:
+            count += self.set(key, value)
+        return count
+
+    @classmethod
+    def from_items(cls, items, capacity = None, size = None, hash_fn = None):
+        """
+        RobinCache.from_items
+        Builds a cache from an iterable of key: value pairs
+
+        Parameters:
+            items (iterable): (key, value) pairs to insert, in order
+            capacity (int):
+                most pairs the cache holds
+                Defaults to the number of pairs, so none are evicted
+            size (int): number of bins, as for the constructor
+            hash_fn (function): key -> int hash, as for the constructor
+        Returns:
+            (RobinCache) the cache holding the pairs, less any evicted to
+                stay within capacity
+        """
+
+        items = list(items)
+        if capacity is None:
+            capacity = max(len(items), 1)
+        cache = cls(capacity, size = size, hash_fn = hash_fn)
+        cache.set_many(items)
+        return cache
+
+    def evict(self):
+        """
+        RobinCache.evict
+        Moves the clock hand on to the next entry that hasn't been hit since
+            the hand last passed it, and evicts it
+
+        Returns:
+            (tuple) the evicted (key, value) pair, None if the cache is empty
+        """
+
+        if not self.used_bins:
+            return None
+        bins = self.bins
+        num_bins = self.num_bins
+        stride = self.stride
+        hand = self.hand
+        while True:
+            idx = hand
+            entry = bins[idx]
+            hand += stride
+            if hand >= num_bins:
+                hand -= num_bins
+            if entry:
+                if not entry.referenced:
+                    self.hand = hand
+                    self._remove_at(idx)
+                    self.evictions += 1
+                    return (entry.key, entry.value)
+                entry.referenced = False
+
+    def reset_counters(self):
+        """
+        RobinCache.reset_counters
+        Sets the hit, miss and eviction counts, and any instrumentation
+            counters, back to zero
+        """
+
+        RobinHash.reset_counters(self)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def hit_rate(self):
+        """
+        RobinCache.hit_rate
+        Returns the fraction of get calls that found their key
+
+        Returns:
+            (float) hits / (hits + misses), 0 before any get
+        """
+
+        lookups = self.hits + self.misses
+        if not lookups:
+            return 0.0
+        return float(self.hits) / lookups
@@ -0,0 +1,124 @@
+"""
+robin_cache_test.py
+
+This program tests that the RobinCache stays within its capacity, evicts keys
+that haven't been used before ones that have, and counts hits, misses and
+evictions correctly
+"""
+
+from robin_cache import RobinCache
+import random
+import string
+
+def _get_random_string():
+    valid_chars = string.ascii_letters + string.digits
+    r_str = ""
+    length = random.randint(1, 20)
+    for i in range(length):
+        r_str += random.choice(valid_chars)
+    return r_str
+
+print "Initializing Cache"
+cache = RobinCache(3)
+assert cache.num_bins > 3
+
+print "Setting, getting and counting"
+assert cache.set('one', 1) == True
+assert cache.get('one') == 1
+assert cache.get('two') == None
+assert cache.get('two', 2) == 2
+assert cache['one'] == 1
+try:
+    cache['two']
+    assert False
+except KeyError:
+    pass
+assert cache.hits == 2 and cache.misses == 3
+assert cache.hit_rate() == 0.4
+cache.reset_counters()
+assert cache.hits == cache.misses == cache.evictions == 0
+assert cache.hit_rate() == 0
+
+print "Evicting unused keys first"
+cache = RobinCache(3)
+for key in ('a', 'b', 'c'):
+    cache[key] = key
+cache.get('a')
+cache.get('c')
+cache['d'] = 'd'
+assert 'b' not in cache
+assert len(cache) == 3 and cache.evictions == 1
+# 'a' is hit again, so it outlasts the keys that aren't
+cache.get('a')
+cache['e'] = 'e'
+assert len(cache) == 3 and cache.evictions == 2
+assert 'a' in cache
+assert cache.evict() is not None
+assert len(cache) == 2
+assert RobinCache(1).evict() == None
+
+print "Overwriting a cached key doesn't evict"
+cache = RobinCache(2)
+cache['a'] = 1
+cache['b'] = 2
+cache['a'] = 3
+assert cache.evictions == 0 and cache['a'] == 3
+
+print "Batch reads count and mark like get"
+cache = RobinCache(3)
+for key in ('a', 'b', 'c'):
+    cache[key] = key
+assert cache.get_many(['a', 'b', 'z']) == ['a', 'b', None]
+assert cache.hits == 2 and cache.misses == 1
+cache['d'] = 'd'
+assert 'c' not in cache and 'a' in cache and 'b' in cache
+
+print "Building from items fills the capacity, not the bins"
+cache = RobinCache.from_items([('a', 1), ('b', 2), ('c', 3)])
+assert cache.capacity == 3 and len(cache) == 3 and cache.evictions == 0
+cache = RobinCache.from_items([(str(i), i) for i in range(10)], capacity = 4)
+assert cache.capacity == 4 and len(cache) == 4 and cache.evictions == 6
+assert cache.num_bins > 4
+
+print "\nRunning randomized experiments\n"
+NUM_EXPERIMENTS = 20
+for j in range(NUM_EXPERIMENTS):
+    capacity = random.randint(20, 300)
+    cache = RobinCache(capacity)
+    # Each hot key is hit about 20 times for every time the hand comes round
+    hot = [_get_random_string() + 'hot' + str(i)
+           for i in range(capacity // 20)]
+    inserted = 0
+    for i in range(5000):
+        key = random.choice(hot)
+        value = cache.get(key)
+        assert value in (key, None)
+        if value is None:
+            cache[key] = key
+            inserted += 1
+        # A stream of cold keys that are never read again
+        cold = _get_random_string() + 'cold' + str(i)
+        cache[cold] = cold
+        inserted += 1
+        assert cold in cache
+        assert len(cache) <= capacity
+    # CLOCK only approximates LRU, and shifts can move a hot key under the
+    #   hand early, but hot keys should almost never need reloading
+    assert cache.misses < len(hot) + 50
+    assert cache.evictions == inserted - len(cache)
+    # Evicting and inserting in place keep every entry findable
+    for idx, entry in enumerate(cache.bins):
+        if entry:
+            assert (entry.hash_value + entry.bin_dist) % cache.num_bins == idx
+            assert cache._find_entry(entry.key) is entry
+    assert cache.set_many((str(i), i) for i in range(capacity + 10)) == \
+        capacity + 10
+    assert len(cache) == capacity
+
+    print "{0:03d}/{1:d} | Capacity: {2:03d} | Hit Rate: {3:f}".format(
+                                                            j + 1,
+                                                            NUM_EXPERIMENTS,
+                                                            capacity,
+                                                            cache.hit_rate())
+
+print "All tests successful!"
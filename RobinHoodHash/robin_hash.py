@@ -14,22 +14,53 @@ swapping with another entry if it is closer to it's ideal location.
 In addition, rather than having tombstones to handle deletion, the hash map
 uses a backwards shift deletion method which essentially modifies the hash map
 to be as if that key had never been inserted in the first place
+
+The table also counts how many entries sit at each probe distance, so that
+max_probe, which bounds every search, drops again as soon as deletes shift the
+furthest entries back, rather than staying at the worst case ever reached
+
+The hash map can optionally resize itself once its load factor crosses a
+configurable threshold. Rather than rehashing everything at once, the old bins
+are kept around and migrated a few at a time on each later get/set/delete, so
+no single operation has to pay for a full rehash
+
+A map can also be saved to a snapshot file and opened again with open_mmap,
+which answers lookups straight from the mapped file (see robin_hash_snapshot)
+
+RobinHash is a full MutableMapping, so it can be indexed, iterated and
+updated like a dict. Iterating walks the bins once, and raises RuntimeError if
+the map changes under the iterator
+
+With instrument=True the map also counts the bins probed by every get, set and
+delete, the Robin Hood swaps made by inserts and the entries shifted back by
+deletes. stats() reports these along with the distribution of probe distances
+and the longest cluster, to spot a bad hash before lookups slow down
+
+Each map hashes its keys with its own hash_fn, Python's hash by default. See
+robin_hash_functions for a seeded hash that resists keys chosen to collide,
+and a stable hash that places keys the same way in every process
 """
 
-def hash_function(string):
-    """
-    robin_hash.hash_function
+try:
+    from collections.abc import ItemsView, MutableMapping, ValuesView
+except ImportError:
+    from collections import ItemsView, MutableMapping, ValuesView
 
-    Hashing function for the hash map
-    By default uses Python's built in hash function
-    However, can be overwritten for testing purposes
+from robin_hash_functions import hash_function
+from robin_hash_snapshot import MappedRobinHash, write_snapshot
 
-    Parameters:
-        string (string): string to be hashed
-    Returns:
-        (int) hashed value
-    """
-    return hash(string)
+# Python 2's range builds a whole list, which the probing loops can't afford
+try:
+    range = xrange
+except NameError:
+    pass
+
+# Default of pop, which has to tell no default apart from a default of None
+_MISSING = object()
+
+# Counters kept by an instrumented map
+COUNTERS = ('gets', 'get_probes', 'sets', 'set_probes', 'deletes',
+            'delete_probes', 'insert_probes', 'swaps', 'shifts')
 
 # Entry into the hash map
 class RobinEntry():
@@ -39,16 +70,20 @@ class RobinEntry():
     Entries of the hash map
     """
 
-    def __init__(self, key, value):
+    def __init__(self, key, value, hash_value = None):
         """
         CONSTRUCTOR
 
         Parameters:
             key (string): dictionary key
             value (AnyType): dictionary value
+            hash_value (int): hash of the key
         Variables:
             key (string): dictionary key
             value (AnyType): dictionary value
+            hash_value (int):
+                The full hash of the key, kept so that probing can compare
+                hashes before keys and resizing never has to rehash the key
             bin_dist (int):
                 The offset between where the bin in which an entry should have been
                 inserted had there been no collision and where it actually is
@@ -58,22 +93,69 @@ class RobinEntry():
 
         self.key = key
         self.value = value
+        self.hash_value = hash_value
         self.bin_dist = -1
 
-class RobinHash():
+class RobinItemsView(ItemsView):
+    """
+    robin_hash.RobinItemsView
+
+    View of the (key, value) pairs of a RobinHash, read straight off the bins
+    """
+
+    def __iter__(self):
+        for entry in self._mapping._entries():
+            yield (entry.key, entry.value)
+
+class RobinValuesView(ValuesView):
+    """
+    robin_hash.RobinValuesView
+
+    View of the values of a RobinHash, read straight off the bins
+    """
+
+    def __iter__(self):
+        for entry in self._mapping._entries():
+            yield entry.value
+
+class RobinHash(MutableMapping):
     """
     robin_hash.RobinHash
 
     Main HashMap class
     Uses Robin Hood Linear Probing Open Addressing to handle collisions
+    Supports the whole MutableMapping protocol on top of get/set/delete
     """
 
-    def __init__(self, size = 128):
+    # Class of the entries made for new keys, for subclasses that keep more
+    #   in each entry
+    _entry_class = RobinEntry
+
+    def __init__(self, size = 128, max_load = None, min_load = None,
+                 rehash_step = 4, instrument = False, hash_fn = None):
         """
         CONSTRUCTOR
 
         Parameters:
             size: size of the hash map
+            max_load (float):
+                load factor above which the map doubles in size
+                None (default) keeps the map at a fixed size, in which case
+                set returns False once the map is full
+            min_load (float):
+                load factor below which the map halves in size
+                The map never shrinks below its initial size
+                None (default) disables shrinking
+            rehash_step (int):
+                number of old bins migrated on each get/set/delete while a
+                resize is in progress
+            instrument (bool):
+                count probes, swaps and shifts into counters
+                Off by default, when it costs one check per operation
+            hash_fn (function):
+                key -> int hash used to place keys in the bins
+                None (default) uses hash_function, Python's built in hash
+                See robin_hash_functions for seeded and stable hashes
         Variables:
             bins (list): array corresponding to the hash table
                 technically not fixed size, so Python will allocate some extra
@@ -85,13 +167,53 @@ class RobinHash():
                 keeps track of the max extra probing distiance required by the
                 linear probing
                 slightly optimizes searches and deletions
+                Kept exact, so it drops again once deletes shift entries back
+            dist_counts (list):
+                number of entries at each probe distance, from 0 to max_probe
+            min_size (int): initial size, the map never shrinks below this
+            old_table (RobinHash):
+                fixed size map holding the bins that still have to be
+                migrated during a resize
+                None if no resize is in progress
+            rehash_idx (int):
+                next bin of old_table to be migrated
+                Bins are migrated from the end of a cluster backwards
+            _version (int):
+                bumped by every change to which bins hold which entries
+                Iterators compare it to detect changes made under them
+            hash_fn (function): hash used to place keys in the bins
+            instrument (bool): whether counters are being kept
+            counters (dict):
+                running totals of the COUNTERS, zero unless instrumented
+                *_probes count the bins searched by each kind of call, and
+                insert_probes the bins walked placing new or migrated entries
         """
+        if max_load is not None and not 0 < max_load <= 1:
+            raise ValueError("max_load must be in (0, 1]")
+        if min_load is not None and not 0 <= min_load < (max_load or 1) / 2.0:
+            raise ValueError("min_load must be less than half of max_load")
+        if rehash_step < 1:
+            raise ValueError("rehash_step must be at least 1")
+
         self.bins = [None] * size
         self.num_bins = size
         self.used_bins = 0
         self.max_probe = 0
+        self.dist_counts = [0]
+
+        self.max_load = max_load
+        self.min_load = min_load
+        self.rehash_step = rehash_step
+        self.min_size = size
+        self.old_table = None
+        self.rehash_idx = 0
+        self._version = 0
+        self.hash_fn = hash_function if hash_fn is None else hash_fn
 
-    def get(self, key):
+        self.instrument = instrument
+        self.reset_counters()
+
+    def get(self, key, default = None):
         """
         RobinHash.get
 
@@ -99,16 +221,17 @@ class RobinHash():
 
         Parameters:
             key (string): the key to be searched for in the map
+            default (AnyType): value returned for keys not in the map
         Returns:
             (AnyType)
                 Value associated with the key if the pair has been inserted
-                None otherwise
-
-        Calls the function that gets both the hash index and the value, but
-        only returns the value
+                default (None) otherwise
         """
 
-        return self.__get_idx_and_value(key)[1]
+        entry = self._find_entry(key)
+        if entry is None:
+            return default
+        return entry.value
 
     def set(self, key, value):
         """
@@ -124,13 +247,37 @@ class RobinHash():
                 False if the set is not successful
                     This should only occur if the hash map is full
         """
+        if self.old_table is not None:
+            self.__rehash()
+
+        # Hash the key once for both the search and the insert
+        hash_value = self.hash_fn(key)
+
         # First search for the key and override it if it is found
 
-        idx = self.__get_idx_and_value(key)[0]
+        idx = self.__get_idx_and_value(key, hash_value)[0]
+        if self.instrument:
+            self.counters['sets'] += 1
+            self.__count_probes('set_probes', hash_value, idx)
         if idx != None:
             self.bins[idx].value = value
             return True
 
+        # The key may also be waiting to be migrated from the old bins
+        if self.old_table is not None:
+            old_idx = self.old_table.__get_idx_and_value(key, hash_value)[0]
+            if self.instrument:
+                self.old_table.__count_probes('set_probes', hash_value,
+                                              old_idx)
+            if old_idx != None:
+                self.old_table.bins[old_idx].value = value
+                return True
+
+        # Grow the map before the insert would push it past max_load
+        if (self.max_load is not None and
+                self.used_bins + 1 > self.max_load * self.num_bins):
+            self.__start_resize(self.num_bins * 2 + 1)
+
         # If map is full, return False
         if self.used_bins == self.num_bins:
             return False
@@ -138,13 +285,868 @@ class RobinHash():
         # Increment number of bins in use
         self.used_bins += 1
 
-        # Hash key and get a RobinEntry to be inserted
-        hash_value = hash_function(key)
-        entry = RobinEntry(key, value)
+        # Get a RobinEntry to be inserted
+        entry = self._entry_class(key, value, hash_value)
 
-        # Get the non-collision index, initialize probe distance for entry swaps
-        init_idx = hash_value % self.num_bins
+        return self.__insert_entry(entry)
+
+    def delete(self, key):
+        """
+        RobinHash.delete
+        Deletes a key: value pair in the map and backshifts affected entries
+
+        Parameters:
+            key (string): Key of the pair to delete
+        Returns:
+            (AnyType)
+                The value of the deleted pair if it is in the map
+                None if the value is not in the map
+        """
+
+        entry = self.__pop_entry(key)
+        if entry is None:
+            return None
+        return entry.value
+
+    def load(self):
+        """
+        RobinHash.load
+        Returns the load factor of the map
+
+        Returns:
+            (float) load factor of hash map
+        """
+
+        return float(self.used_bins) / self.num_bins
+
+    def __getitem__(self, key):
+        entry = self._find_entry(key)
+        if entry is None:
+            raise KeyError(key)
+        return entry.value
+
+    def __setitem__(self, key, value):
+        if not self.set(key, value):
+            raise OverflowError("RobinHash of {0:d} bins is full"
+                                .format(self.num_bins))
+
+    def __delitem__(self, key):
+        if self.__pop_entry(key) is None:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return self._find_entry(key) is not None
+
+    def __len__(self):
+        return self.used_bins
+
+    def __iter__(self):
+        """
+        RobinHash.__iter__
+        Generator over the keys of the map, walking the bins once
+
+        Any resize in progress is finished first, so that lookups made while
+            iterating don't migrate entries under the iterator
+
+        Raises:
+            RuntimeError if the map is changed during iteration
+        """
+
+        self.__finish_resize()
+        version = self._version
+        for entry in self.bins:
+            if entry:
+                yield entry.key
+                if self._version != version:
+                    raise RuntimeError("RobinHash changed during iteration")
+        if self._version != version:
+            raise RuntimeError("RobinHash changed during iteration")
+
+    def items(self):
+        """
+        RobinHash.items
+
+        Returns:
+            (RobinItemsView) view of the (key, value) pairs
+        """
+
+        return RobinItemsView(self)
+
+    def values(self):
+        """
+        RobinHash.values
+
+        Returns:
+            (RobinValuesView) view of the values
+        """
+
+        return RobinValuesView(self)
+
+    def pop(self, key, default = _MISSING):
+        """
+        RobinHash.pop
+        Deletes a key: value pair and returns its value
+
+        Parameters:
+            key (string): Key of the pair to delete
+            default (AnyType): value returned if the key is not in the map
+        Returns:
+            (AnyType) the value of the deleted pair, or default
+        Raises:
+            KeyError if the key is not in the map and no default was given
+        """
+
+        entry = self.__pop_entry(key)
+        if entry is not None:
+            return entry.value
+        if default is _MISSING:
+            raise KeyError(key)
+        return default
+
+    def clear(self):
+        """
+        RobinHash.clear
+        Deletes every pair, keeping the current number of bins
+        """
+
+        self.bins = [None] * self.num_bins
+        self.used_bins = 0
+        self.max_probe = 0
+        self.dist_counts = [0]
+        self.old_table = None
+        self._version += 1
+
+    def _find_entry(self, key):
+        """
+        RobinHash._find_entry
+        Finds the entry holding a key, for lookups and for subclasses
+
+        Migrates rehash_step bins first if a resize is in progress
+
+        Parameters:
+            key (string): the key to be searched for in the map
+        Returns:
+            (RobinEntry) the entry holding the key, None if it is not found
+        """
+
+        hash_value = self.hash_fn(key)
+        if self.instrument:
+            return self.__counted_find(key, hash_value)
+        if self.old_table is not None:
+            self.__rehash()
+            # Keys that have not been migrated yet are still in the old bins
+            entry = self.__find(key, hash_value)
+            if entry is None and self.old_table is not None:
+                return self.old_table.__find(key, hash_value)
+            return entry
+
+        return self.__find(key, hash_value)
+
+    def _probe(self, key, hash_value):
+        """
+        RobinHash._probe
+        Searches the current bins for a key, for subclasses that go on to
+            change the bin the search stopped at with _insert_at or
+            _remove_at instead of searching again
+        Only for maps with no resize in progress, as it doesn't look in
+            old_table
+
+        Parameters:
+            key (string): the key to be searched for in the map
+            hash_value (int): The hash of the key
+        Returns:
+            (int, int, RobinEntry)
+                The index of the bin the search stopped at, the probe
+                distance there, and the entry holding the key, None if it is
+                not found, in which case a new entry for the key belongs at
+                that index and distance
+        """
+
+        bins = self.bins
+        num_bins = self.num_bins
+        curr_idx = hash_value % num_bins
         probe_dist = 0
+        # Inline version of __get_idx_and_value
+        while probe_dist <= self.max_probe:
+            curr_bin = bins[curr_idx]
+            if not curr_bin or probe_dist > curr_bin.bin_dist:
+                break
+            if curr_bin.hash_value == hash_value and curr_bin.key == key:
+                return curr_idx, probe_dist, curr_bin
+            probe_dist += 1
+            curr_idx += 1
+            if curr_idx == num_bins:
+                curr_idx = 0
+        return curr_idx, probe_dist, None
+
+    def _insert_at(self, entry, idx = None, probe_dist = 0):
+        """
+        RobinHash._insert_at
+        Places a new entry from where _probe stopped, for subclasses
+
+        Parameters:
+            entry (RobinEntry): The entry to insert, with its hash_value set
+            idx (int): bin to start from, the entry's ideal bin by default
+            probe_dist (int): the entry's distance from its ideal bin at idx
+        Returns:
+            (Bool) True if the entry was placed, False if the map is full
+        """
+
+        if self.used_bins == self.num_bins:
+            return False
+        self.used_bins += 1
+        return self.__insert_entry(entry, idx, probe_dist)
+
+    def _remove_at(self, idx):
+        """
+        RobinHash._remove_at
+        Removes the entry in a bin and backshifts the entries after it, for
+            subclasses that already know where the entry is
+
+        Parameters:
+            idx (int): index of a bin holding an entry
+        Returns:
+            (RobinEntry) the removed entry
+        """
+
+        entry = self.bins[idx]
+        self.__remove(idx)
+        self.used_bins -= 1
+        return entry
+
+    def _entries(self):
+        """
+        RobinHash._entries
+        Generator over the entries of the map, as for __iter__
+        """
+
+        self.__finish_resize()
+        version = self._version
+        for entry in self.bins:
+            if entry:
+                yield entry
+                if self._version != version:
+                    raise RuntimeError("RobinHash changed during iteration")
+        if self._version != version:
+            raise RuntimeError("RobinHash changed during iteration")
+
+    def __pop_entry(self, key):
+        """
+        RobinHash.__pop_entry
+        Internal function behind delete, pop and del
+        Removes the entry of a key and backshifts affected entries
+
+        Parameters:
+            key (string): Key of the pair to delete
+        Returns:
+            (RobinEntry) the removed entry, None if the key is not in the map
+        """
+
+        if self.old_table is not None:
+            self.__rehash()
+
+        # Search for the key and get it's hash index
+        hash_value = self.hash_fn(key)
+        idx = self.__get_idx_and_value(key, hash_value)[0]
+        if self.instrument:
+            self.counters['deletes'] += 1
+            self.__count_probes('delete_probes', hash_value, idx)
+
+        if idx == None:
+            # Return None if the key is not found in the map
+            if self.old_table is None:
+                return None
+            # Otherwise the key may not have been migrated yet
+            old_idx = self.old_table.__get_idx_and_value(key, hash_value)[0]
+            if self.instrument:
+                self.old_table.__count_probes('delete_probes', hash_value,
+                                              old_idx)
+            if old_idx == None:
+                return None
+            entry = self.old_table.bins[old_idx]
+            self.old_table.__remove(old_idx)
+            self.old_table.used_bins -= 1
+            self.used_bins -= 1
+            if self.old_table.used_bins == 0:
+                self.old_table = None
+            return entry
+
+        entry = self.bins[idx]
+        self.__remove(idx)
+        self.used_bins -= 1
+
+        # Shrink the map once it drops below min_load
+        if (self.min_load is not None and self.num_bins > self.min_size and
+                self.used_bins < self.min_load * self.num_bins):
+            self.__start_resize(max(self.num_bins // 2, self.min_size))
+        return entry
+
+    def stats(self):
+        """
+        RobinHash.stats
+        Summarizes how well the keys are spread over the bins
+
+        Entries still waiting to be migrated by a resize are counted with
+            their distance in the old bins
+
+        Returns:
+            (dict)
+                entries (int): number of pairs in the map
+                load (float): load factor of the map
+                max_probe (int): current max_probe
+                mean (float): mean bin_dist of the entries
+                variance (float): variance of bin_dist
+                histogram (list): number of entries at each bin_dist
+                largest_cluster (int): longest run of consecutive full bins
+                counters (dict): copy of counters
+        """
+
+        histogram = [0]
+        largest_cluster = 0
+        for table in (self, self.old_table):
+            if table is None:
+                continue
+            for dist, count in enumerate(table.dist_counts):
+                if dist == len(histogram):
+                    histogram.append(0)
+                histogram[dist] += count
+            cluster = 0
+            for entry in table.bins:
+                if entry:
+                    cluster += 1
+                else:
+                    largest_cluster = max(cluster, largest_cluster)
+                    cluster = 0
+            # The last cluster of the bins carries on at the start of them
+            if cluster == table.num_bins:
+                largest_cluster = max(cluster, largest_cluster)
+            else:
+                idx = 0
+                while table.bins[idx]:
+                    cluster += 1
+                    idx += 1
+                largest_cluster = max(cluster, largest_cluster)
+
+        entries = sum(histogram)
+        mean = variance = 0.0
+        if entries:
+            mean = float(sum(dist * count for dist, count
+                             in enumerate(histogram))) / entries
+            variance = sum((dist - mean) ** 2 * count
+                           for dist, count in enumerate(histogram)) / entries
+        return {'entries': entries,
+                'load': self.load(),
+                'max_probe': self.max_probe,
+                'mean': mean,
+                'variance': variance,
+                'histogram': histogram,
+                'largest_cluster': largest_cluster,
+                'counters': dict(self.counters)}
+
+    def reset_counters(self):
+        """
+        RobinHash.reset_counters
+        Sets every counter back to zero
+        """
+
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        if self.old_table is not None:
+            self.old_table.counters = self.counters
+
+    def save(self, path):
+        """
+        RobinHash.save
+        Writes the map to a snapshot file that open_mmap can map
+
+        Parameters:
+            path (string): file to write
+                Keys must be bytes, text or integers
+                Values must be picklable
+        """
+
+        entries = [entry for entry in self.bins if entry]
+        if self.old_table is not None:
+            entries += [entry for entry in self.old_table.bins if entry]
+        write_snapshot(((entry.key, entry.value) for entry in entries), path)
+
+    @staticmethod
+    def open_mmap(path):
+        """
+        RobinHash.open_mmap
+        Opens a snapshot file written by save without deserializing it
+
+        Lookups read the bins and records straight from the mapped file, so
+            opening takes constant time and every process that opens the
+            same file shares one read-only copy of it
+
+        Parameters:
+            path (string): snapshot file to open
+        Returns:
+            (MappedRobinHash) read-only map supporting get and load
+        """
+
+        return MappedRobinHash(path)
+
+    @classmethod
+    def from_items(cls, items, size = None, **kwargs):
+        """
+        RobinHash.from_items
+        Builds a hash map from an iterable of key: value pairs
+
+        Parameters:
+            items (iterable): (key, value) pairs to insert
+            size (int):
+                size of the hash map
+                Defaults to enough bins for the pairs to stay under max_load,
+                or under a load factor of 0.9 for fixed size maps
+            kwargs: any other RobinHash constructor arguments
+        Returns:
+            (RobinHash) the hash map holding the pairs
+        """
+
+        items = list(items)
+        if size is None:
+            max_load = kwargs.get('max_load') or 0.9
+            size = max(int(len(items) / max_load) + 1, 1)
+        rh = cls(size, **kwargs)
+        rh.set_many(items)
+        return rh
+
+    def set_many(self, items):
+        """
+        RobinHash.set_many
+        Inserts many key: value pairs into the hash map
+
+        The map is grown once up front to fit every pair, rather than being
+            resized incrementally along the way, and each key is only hashed
+            once
+        A batch at least as large as the map is loaded by rebuilding the
+            bins in one sorted pass (see __bulk_load)
+        Otherwise the search for each key hands over to the insert where it
+            stopped, so a new key only walks its probe sequence once
+
+        Parameters:
+            items (iterable): (key, value) pairs to insert
+        Returns:
+            (int)
+                The number of pairs set
+                Less than the number of pairs only if the map filled up
+        """
+
+        items = list(items)
+        self.__finish_resize()
+
+        # Size the map for every pair being a new key
+        new_size = self.num_bins
+        if self.max_load is not None:
+            while self.used_bins + len(items) > self.max_load * new_size:
+                new_size = new_size * 2 + 1
+
+        hash_fn = self.hash_fn
+        if (len(items) >= self.used_bins and
+                self.used_bins + len(items) <= new_size):
+            entries = [entry for entry in self.bins if entry]
+            entries += [self._entry_class(key, value, hash_fn(key))
+                        for key, value in items]
+            self.num_bins = new_size
+            self.__bulk_load(entries)
+            if self.instrument:
+                self.counters['sets'] += len(items)
+            return len(items)
+
+        if new_size != self.num_bins:
+            self.__start_resize(new_size)
+            self.__finish_resize()
+
+        bins = self.bins
+        num_bins = self.num_bins
+        instrument = self.instrument
+        probes = 0
+        count = 0
+        for key, value in items:
+            hash_value = hash_fn(key)
+            curr_idx = hash_value % num_bins
+            probe_dist = 0
+            max_probe = self.max_probe
+            found = False
+            # Inline version of __get_idx_and_value
+            while probe_dist <= max_probe:
+                curr_bin = bins[curr_idx]
+                if not curr_bin or probe_dist > curr_bin.bin_dist:
+                    break
+                if curr_bin.hash_value == hash_value and curr_bin.key == key:
+                    curr_bin.value = value
+                    found = True
+                    break
+                probe_dist += 1
+                curr_idx += 1
+                if curr_idx == num_bins:
+                    curr_idx = 0
+            if instrument:
+                probes += min(probe_dist + 1, max_probe + 1)
+
+            if found:
+                count += 1
+            # Not found -> insert from where the search stopped
+            elif self.used_bins < num_bins:
+                self.used_bins += 1
+                entry = self._entry_class(key, value, hash_value)
+                self.__insert_entry(entry, curr_idx, probe_dist)
+                count += 1
+        if instrument:
+            self.counters['sets'] += len(items)
+            self.counters['set_probes'] += probes
+        return count
+
+    def get_many(self, keys):
+        """
+        RobinHash.get_many
+        Gets the values associated with many keys in the hash map
+
+        A batch of at least an eighth as many keys as the map holds is
+            answered by a hash join: the entries are indexed by key in a dict
+            in one pass over the bins, and each key is then looked up in
+            that index in C, so no key walks its probe sequence, which at
+            high load factors is most of the cost of a get
+        The join relies on hash_fn giving keys that compare equal the same
+            hash, as every hash in robin_hash_functions does
+        Smaller batches, instrumented maps, and keys that Python can't hash
+            are searched for one at a time, with the probe loop inlined and
+            every key hashed up front, in one pass that runs in C for the
+            default hash
+
+        Parameters:
+            keys (iterable): the keys to be searched for in the map
+        Returns:
+            (list)
+                The value associated with each key, in order
+                None for keys that are not in the map
+        """
+
+        keys = list(keys)
+        if self.old_table is not None:
+            # Migrate as much as the same number of get calls would
+            self.__rehash(self.rehash_step * len(keys))
+        old_table = self.old_table
+
+        instrument = self.instrument
+        if not instrument and len(keys) * 8 >= self.used_bins:
+            try:
+                index = {entry.key: entry.value
+                         for entry in self.bins if entry}
+                if old_table is not None:
+                    index.update((entry.key, entry.value)
+                                 for entry in old_table.bins if entry)
+                return list(map(index.get, keys))
+            except TypeError:
+                pass
+
+        bins = self.bins
+        num_bins = self.num_bins
+        max_probe = self.max_probe
+        probes = 0
+        values = []
+        append = values.append
+        for key, hash_value in zip(keys, self.__hash_all(keys)):
+            curr_idx = hash_value % num_bins
+            probe_dist = 0
+            value = None
+            # Inline version of __get_idx_and_value
+            while probe_dist <= max_probe:
+                curr_bin = bins[curr_idx]
+                if not curr_bin or probe_dist > curr_bin.bin_dist:
+                    break
+                if curr_bin.hash_value == hash_value and curr_bin.key == key:
+                    value = curr_bin.value
+                    break
+                probe_dist += 1
+                curr_idx += 1
+                if curr_idx == num_bins:
+                    curr_idx = 0
+            if instrument:
+                probes += min(probe_dist + 1, max_probe + 1)
+            # Keys that have not been migrated yet are still in the old bins
+            if value is None and old_table is not None:
+                old_idx, value = old_table.__get_idx_and_value(key, hash_value)
+                if instrument:
+                    old_table.__count_probes('get_probes', hash_value, old_idx)
+            append(value)
+        if instrument:
+            self.counters['gets'] += len(keys)
+            self.counters['get_probes'] += probes
+        return values
+
+    def delete_many(self, keys):
+        """
+        RobinHash.delete_many
+        Deletes many key: value pairs from the map
+
+        Every key is found and its bin emptied first, without shifting
+            anything back, and then each cluster that lost entries is
+            compacted in a single pass (see __compact). An entry behind
+            several deleted keys moves once instead of once per key
+        As in get_many, a batch of at least an eighth as many keys as the
+            map holds finds its entries through a dict indexing the bins by
+            key rather than by probing, and one that removes at least a
+            quarter of the entries packs the rest afresh (see __bulk_load)
+            instead of compacting
+        Any resize in progress is finished first, and the map is only
+            checked against min_load once, after every delete
+
+        Parameters:
+            keys (iterable): Keys of the pairs to delete
+        Returns:
+            (list)
+                The value of each deleted pair, in order
+                None for keys that are not in the map
+        """
+
+        keys = list(keys)
+        self.__finish_resize()
+
+        bins = self.bins
+        num_bins = self.num_bins
+        dist_counts = self.dist_counts
+        instrument = self.instrument
+        probes = 0
+        holes = set()
+
+        removed = None
+        if not instrument and len(keys) * 8 >= self.used_bins:
+            try:
+                index = {entry.key: entry for entry in bins if entry}
+                # A key repeated in the batch pops None the second time
+                removed = [index.pop(key, None) for key in keys]
+            except TypeError:
+                pass
+        if removed is not None:
+            values = [entry.value if entry else None for entry in removed]
+            removed = [entry for entry in removed if entry]
+            # Once a good part of the map is gone, packing the entries left
+            #   afresh moves fewer of them than compacting every cluster
+            if len(removed) * 4 >= self.used_bins:
+                # Walk the bins from the first one that begins a cluster, so
+                #   a cluster wrapping round the end keeps its order and
+                #   __bulk_load keeps entries with the same home in it
+                start = next((idx for idx, entry in enumerate(bins)
+                              if not entry or not entry.bin_dist), 0)
+                doomed = set(id(entry) for entry in removed)
+                kept = [entry for entry in bins[start:] + bins[:start]
+                        if entry and id(entry) not in doomed]
+                self.__bulk_load(kept, repeats = False)
+            else:
+                for entry in removed:
+                    idx = (entry.hash_value + entry.bin_dist) % num_bins
+                    dist_counts[entry.bin_dist] -= 1
+                    bins[idx] = None
+                    holes.add(idx)
+        else:
+            max_probe = self.max_probe
+            values = []
+            append = values.append
+            for key, hash_value in zip(keys, self.__hash_all(keys)):
+                curr_idx = hash_value % num_bins
+                probe_dist = 0
+                value = None
+                # Inline version of __get_idx_and_value, which steps over the
+                #   bins emptied so far since their entries may be further on
+                while probe_dist <= max_probe:
+                    curr_bin = bins[curr_idx]
+                    if not curr_bin:
+                        if curr_idx not in holes:
+                            break
+                    elif probe_dist > curr_bin.bin_dist:
+                        break
+                    elif (curr_bin.hash_value == hash_value and
+                            curr_bin.key == key):
+                        value = curr_bin.value
+                        dist_counts[curr_bin.bin_dist] -= 1
+                        bins[curr_idx] = None
+                        holes.add(curr_idx)
+                        break
+                    probe_dist += 1
+                    curr_idx += 1
+                    if curr_idx == num_bins:
+                        curr_idx = 0
+                if instrument:
+                    probes += min(probe_dist + 1, max_probe + 1)
+                append(value)
+        if holes:
+            self.used_bins -= len(holes)
+            self.__compact(holes)
+        if instrument:
+            self.counters['deletes'] += len(keys)
+            self.counters['delete_probes'] += probes
+
+        # Shrink the map straight to the size the remaining pairs need
+        if (self.min_load is not None and self.num_bins > self.min_size and
+                self.used_bins < self.min_load * self.num_bins):
+            new_size = self.num_bins
+            while (new_size > self.min_size and
+                    self.used_bins < self.min_load * new_size):
+                new_size = max(new_size // 2, self.min_size)
+            self.__start_resize(new_size)
+        return values
+
+    def __hash_all(self, keys):
+        """
+        RobinHash.__hash_all
+        Internal function to hash a batch of keys in one pass
+        The default hash_function only wraps Python's hash, so the builtin is
+            mapped over the keys directly and the loop never leaves C
+
+        Parameters:
+            keys (list): the keys to hash
+        Returns:
+            (list) the hash of each key, in order
+        """
+
+        hash_fn = self.hash_fn
+        if hash_fn is hash_function:
+            hash_fn = hash
+        return list(map(hash_fn, keys))
+
+    def __get_idx_and_value(self, key, hash_value):
+        """
+        RobinHash.__get_idx_and_value
+        Internal function to search for a key and return both the hash index
+            and the value associated with the key
+
+        Parameters:
+            key (string): The key to search for
+            hash_value (int): The hash of the key
+        Returns:
+            (int, AnyType)
+                tuple corresponding to the array index of the entry
+                and the value corresponding to the key
+        """
+
+        # Get ideal no-collision bin
+        init_idx = hash_value % self.num_bins
+        # Linear probing
+        #   Search until an empty bin, a bin where the entry would have been
+        #   inserted, or until the max probing distance of the table is
+        #   exceeded
+        for i in range(self.max_probe + 1):
+            curr_idx = (init_idx + i) % self.num_bins
+            curr_bin = self.bins[curr_idx]
+            # Key cannot be in map -> return (None, None)
+            if not curr_bin or i > curr_bin.bin_dist:
+                return (None, None)
+            # Key found -> return (index, value)
+            # Comparing the stored hashes first skips most key comparisons
+            elif curr_bin.hash_value == hash_value and curr_bin.key == key:
+                return (curr_idx, curr_bin.value)
+        # Max probe distance exceeded -> return (None, None)
+        return (None, None)
+
+    def __find(self, key, hash_value):
+        """
+        RobinHash.__find
+        Internal function to search this table only for the entry of a key
+        Unlike __get_idx_and_value it builds no tuple, which matters for the
+            lookups behind get, [] and in
+
+        Parameters:
+            key (string): The key to search for
+            hash_value (int): The hash of the key
+        Returns:
+            (RobinEntry) the entry holding the key, None if it is not found
+        """
+
+        bins = self.bins
+        num_bins = self.num_bins
+        curr_idx = hash_value % num_bins
+        for i in range(self.max_probe + 1):
+            curr_bin = bins[curr_idx]
+            # Key cannot be in map
+            if not curr_bin or i > curr_bin.bin_dist:
+                return None
+            if curr_bin.hash_value == hash_value and curr_bin.key == key:
+                return curr_bin
+            curr_idx += 1
+            if curr_idx == num_bins:
+                curr_idx = 0
+        return None
+
+    def __counted_find(self, key, hash_value):
+        """
+        RobinHash.__counted_find
+        Internal function behind _find_entry for instrumented maps
+
+        Parameters:
+            key (string): the key to be searched for in the map
+            hash_value (int): The hash of the key
+        Returns:
+            (RobinEntry) as for _find_entry
+        """
+
+        self.counters['gets'] += 1
+        if self.old_table is not None:
+            self.__rehash()
+        idx = self.__get_idx_and_value(key, hash_value)[0]
+        self.__count_probes('get_probes', hash_value, idx)
+        if idx != None:
+            return self.bins[idx]
+        # Keys that have not been migrated yet are still in the old bins
+        if self.old_table is not None:
+            old_idx = self.old_table.__get_idx_and_value(key, hash_value)[0]
+            self.old_table.__count_probes('get_probes', hash_value, old_idx)
+            if old_idx != None:
+                return self.old_table.bins[old_idx]
+        return None
+
+    def __count_probes(self, counter, hash_value, idx):
+        """
+        RobinHash.__count_probes
+        Internal function to add the number of bins a search probed to one
+            of the counters
+
+        A hit always probes bin_dist + 1 bins, only a miss is walked again
+
+        Parameters:
+            counter (string): name of the counter to add to
+            hash_value (int): The hash of the key searched for
+            idx (int): index found by the search, None for a miss
+        """
+
+        if idx != None:
+            probes = self.bins[idx].bin_dist + 1
+        else:
+            init_idx = hash_value % self.num_bins
+            probes = self.max_probe + 1
+            for i in range(self.max_probe + 1):
+                curr_bin = self.bins[(init_idx + i) % self.num_bins]
+                if not curr_bin or i > curr_bin.bin_dist:
+                    probes = i + 1
+                    break
+        self.counters[counter] += probes
+
+    def __insert_entry(self, entry, init_idx = None, probe_dist = 0):
+        """
+        RobinHash.__insert_entry
+        Internal function to place an entry into the bins using Robin Hood
+            linear probing
+        Does not update used_bins, which is up to the caller
+
+        Parameters:
+            entry (RobinEntry): The entry to insert, with its hash_value set
+            init_idx (int):
+                The bin to start probing from
+                Defaults to the entry's ideal bin
+            probe_dist (int):
+                The entry's distance from its ideal bin at init_idx
+                Lets a search that already walked part of the probe sequence
+                hand over to the insert where it stopped
+        Returns:
+            (Bool)
+                True if the entry was placed
+                False if no empty bin was found
+        """
+
+        # Get the non-collision index if no starting point was given
+        if init_idx is None:
+            init_idx = entry.hash_value % self.num_bins
 
         # Linear probe search
         for i in range(self.num_bins):
@@ -158,7 +1160,12 @@ class RobinHash():
                 entry.bin_dist = probe_dist
                 self.bins[curr_idx] = entry
                 # Keep track of the maximum probing distance
-                self.max_probe = max(probe_dist, self.max_probe)
+                if probe_dist > self.max_probe:
+                    self.__raise_max_probe(probe_dist)
+                self.dist_counts[probe_dist] += 1
+                self._version += 1
+                if self.instrument:
+                    self.counters['insert_probes'] += i + 1
                 return True
             # Current probe distance longer than that of the current entry
             # Swap the two entries, now trying to insert the entry that was
@@ -166,8 +1173,13 @@ class RobinHash():
             elif probe_dist > curr_bin.bin_dist:
                 old_entry = curr_bin
                 entry.bin_dist = probe_dist
-                self.max_probe = max(probe_dist, self.max_probe)
+                if probe_dist > self.max_probe:
+                    self.__raise_max_probe(probe_dist)
+                self.dist_counts[probe_dist] += 1
+                self.dist_counts[old_entry.bin_dist] -= 1
                 self.bins[curr_idx] = entry
+                if self.instrument:
+                    self.counters['swaps'] += 1
 
                 entry = old_entry
                 probe_dist = entry.bin_dist
@@ -177,86 +1189,297 @@ class RobinHash():
         #   isn't full
         return False
 
-    def delete(self, key):
+    def __raise_max_probe(self, probe_dist):
         """
-        RobinHash.delete
-        Deletes a key: value pair in the map and backshifts affected entries
+        RobinHash.__raise_max_probe
+        Internal function to raise max_probe to a new longest probe distance
 
         Parameters:
-            key (string): Key of the pair to delete
-        Returns:
-            (AnyType)
-                The value of the deleted pair if it is in the map
-                None if the value is not in the map
+            probe_dist (int): The probe distance about to be used
         """
 
-        # Search for the key and get it's hash index and value
-        idx, val = self.__get_idx_and_value(key)
+        self.dist_counts.extend([0] * (probe_dist - self.max_probe))
+        self.max_probe = probe_dist
 
-        # Return None if the key is not found in the map
-        if idx == None:
-            return None
+    def __bulk_load(self, entries, repeats = True):
+        """
+        RobinHash.__bulk_load
+        Internal function to replace the bins with a batch of entries
+
+        Robin Hood insertion leaves every cluster sorted by ideal bin, so
+            sorting the entries by ideal bin and packing them in that order
+            gives the same table without any probing or swapping
+        Does not resize, the caller has to make sure num_bins is large
+            enough for every entry
+
+        Parameters:
+            entries (list):
+                RobinEntry objects with their hash_value set
+                If a key appears more than once, the last value wins
+            repeats (bool):
+                whether a key may appear more than once
+                False skips the search for repeated keys
+        """
+
+        num_bins = self.num_bins
+        homes = [entry.hash_value % num_bins for entry in entries]
+        # Sorting is stable, so repeated keys stay in the order they were set
+        order = sorted(range(len(entries)), key = homes.__getitem__)
+
+        if not repeats:
+            unique = [entries[i] for i in order]
+            unique_homes = [homes[i] for i in order]
+        # Drop repeated keys, which can only sit in the same run of homes
+        else:
+            unique = []
+            unique_homes = []
+            run_start = 0
+            last_home = -1
+            for i in order:
+                entry = entries[i]
+                home = homes[i]
+                if home != last_home:
+                    run_start = len(unique)
+                    last_home = home
+                else:
+                    for j in range(run_start, len(unique)):
+                        if (unique[j].hash_value == entry.hash_value and
+                                unique[j].key == entry.key):
+                            unique[j].value = entry.value
+                            break
+                    else:
+                        unique.append(entry)
+                        unique_homes.append(home)
+                    continue
+                unique.append(entry)
+                unique_homes.append(home)
+
+        # Entries packed past the last bin wrap round to the front, which
+        #   pushes back the entries there
+        # Repeat the packing until the number of wrapped entries settles
+        start = -1
+        while True:
+            pos = start
+            for home in unique_homes:
+                pos = home if home > pos else pos + 1
+            if pos - num_bins <= start:
+                break
+            start = pos - num_bins
+
+        bins = [None] * num_bins
+        dist_counts = [0]
+        pos = start
+        for entry, home in zip(unique, unique_homes):
+            if home > pos:
+                pos = home
+                entry.bin_dist = 0
+                dist_counts[0] += 1
+            else:
+                pos += 1
+                dist = entry.bin_dist = pos - home
+                while dist >= len(dist_counts):
+                    dist_counts.append(0)
+                dist_counts[dist] += 1
+            bins[pos % num_bins] = entry
 
-        # initialize indices
-        curr_idx = idx
-        next_idx = (idx + 1) % self.num_bins
+        self.bins = bins
+        self.used_bins = len(unique)
+        self.dist_counts = dist_counts
+        self.max_probe = len(dist_counts) - 1
+        self._version += 1
+
+    def __remove(self, idx):
+        """
+        RobinHash.__remove
+        Internal function to empty a bin and backshift the entries after it
+        Does not update used_bins, which is up to the caller
+
+        Parameters:
+            idx (int): The index of the bin to empty
+        """
+
+        bins = self.bins
+        num_bins = self.num_bins
+        dist_counts = self.dist_counts
+        dist_counts[bins[idx].bin_dist] -= 1
+        start_idx = idx
+        next_idx = (idx + 1) % num_bins
+        next_bin = bins[next_idx]
 
         # Backwards shift algorithm
         # Shift entries back one until either an entry is in it's correct spot
         #   or an empty bin is found
         # Intuitively, make it as if the key was never inserted
-        while self.bins[next_idx] and self.bins[next_idx].bin_dist != 0:
+        while next_bin and next_bin.bin_dist != 0:
             # Shift entry backwards
-            self.bins[idx] = self.bins[next_idx]
+            bins[idx] = next_bin
             # Decrement relative distance if it was not an empty bin
-            self.bins[idx].bin_dist -= 1
+            dist_counts[next_bin.bin_dist] -= 1
+            next_bin.bin_dist -= 1
+            dist_counts[next_bin.bin_dist] += 1
             idx = next_idx
-            next_idx = (idx + 1) % self.num_bins
-        # Return the value of the original key: value pair
-        self.bins[idx] = None
-        self.used_bins -= 1
-        return val
+            next_idx = (idx + 1) % num_bins
+            next_bin = bins[next_idx]
+        bins[idx] = None
+        self._version += 1
+        if self.instrument:
+            self.counters['shifts'] += (idx - start_idx) % num_bins
 
-    def load(self):
+        # Lower max_probe past any distances no entry uses anymore
+        while self.max_probe and not dist_counts[self.max_probe]:
+            dist_counts.pop()
+            self.max_probe -= 1
+
+    def __compact(self, holes):
         """
-        RobinHash.load
-        Returns the load factor of the map
+        RobinHash.__compact
+        Internal function to backshift every cluster with emptied bins in it
+            at once, after delete_many has emptied them
 
-        Returns:
-            (float) load factor of hash map
+        From each emptied bin, the entries after it are packed back as far
+            as they can go, no further back than their ideal bin nor than the
+            bin after the last entry placed, which is where backward shifts
+            one delete at a time would leave them too. A pass stops at a truly
+            empty bin or at the first entry that stays put, as nothing after
+            that can move until the next emptied bin
+
+        Parameters:
+            holes (set): indexes of the bins emptied, which is emptied too
         """
 
-        return float(self.used_bins) / self.num_bins
+        bins = self.bins
+        num_bins = self.num_bins
+        dist_counts = self.dist_counts
+        shifts = 0
+        for hole in sorted(holes):
+            # Already passed over by the pass from an earlier hole
+            if hole not in holes:
+                continue
+            holes.discard(hole)
+            # Positions count on past the last bin rather than wrapping, so
+            #   write and an entry's ideal bin compare directly
+            # A pass that started inside a cluster wrapping round the end
+            #   comes back round to the entries before the hole, which the
+            #   shifts behind them may let move back too, so it can run on
+            #   past a full turn
+            write = hole
+            pos = hole + 1
+            while pos < hole + 2 * num_bins:
+                idx = pos % num_bins
+                entry = bins[idx]
+                if not entry:
+                    if idx not in holes:
+                        break
+                    holes.discard(idx)
+                else:
+                    new_pos = max(write, pos - entry.bin_dist)
+                    if new_pos == pos:
+                        break
+                    bins[idx] = None
+                    bins[new_pos % num_bins] = entry
+                    dist_counts[entry.bin_dist] -= 1
+                    entry.bin_dist -= pos - new_pos
+                    dist_counts[entry.bin_dist] += 1
+                    shifts += pos - new_pos
+                    write = new_pos + 1
+                pos += 1
+        self._version += 1
+        if self.instrument:
+            self.counters['shifts'] += shifts
+
+        # Lower max_probe past any distances no entry uses anymore
+        while self.max_probe and not dist_counts[self.max_probe]:
+            dist_counts.pop()
+            self.max_probe -= 1
 
-    def __get_idx_and_value(self, key):
+    def __start_resize(self, new_size):
         """
-        RobinHash.__get_idx_and_value
-        Internal function to search for a key and return both the hash index
-            and the value associated with the key
+        RobinHash.__start_resize
+        Internal function to swap in a new set of bins of a different size
+        The current bins are moved into old_table, from where they are
+            migrated a few at a time by __rehash
 
         Parameters:
-            key (string): The key to search for
-        Returns:
-            (int, AnyType)
-                tuple corresponding to the array index of the entry
-                and the value corresponding to the key
+            new_size (int): The number of bins after the resize
         """
 
-        # Hash and get ideal no-collision bin
-        hash_value = hash_function(key)
-        init_idx = hash_value % self.num_bins
-        # Linear probing
-        #   Search until an empty bin, a bin where the entry would have been
-        #   inserted, or until the max probing distance of the table is
-        #   exceeded
-        for i in range(self.max_probe + 1):
-            curr_idx = (init_idx + i) % self.num_bins
-            curr_bin = self.bins[curr_idx]
-            # Key cannot be in map -> return (None, None)
-            if not curr_bin or i > curr_bin.bin_dist:
-                return (None, None)
-            # Key found -> return (index, value)
-            elif curr_bin.key == key:
-                return (curr_idx, curr_bin.value)
-        # Max probe distance exceeded -> return (None, None)
-        return (None, None)
+        # Only one resize can be in flight at a time
+        if self.old_table is not None:
+            self.__finish_resize()
+
+        # Wrap the current bins in a fixed size map so they can still be
+        #   searched and deleted from while they are being migrated
+        old_table = RobinHash(0)
+        old_table.bins = self.bins
+        old_table.num_bins = self.num_bins
+        old_table.used_bins = self.used_bins
+        old_table.max_probe = self.max_probe
+        old_table.dist_counts = self.dist_counts
+        # Swaps and shifts in the old bins count towards this map
+        old_table.instrument = self.instrument
+        old_table.counters = self.counters
+        old_table.hash_fn = self.hash_fn
+
+        # Migrate backwards from the end of a cluster, so the bin after the
+        #   one being migrated is always empty and nothing has to backshift
+        boundary = 0
+        while (boundary < old_table.num_bins and old_table.bins[boundary] and
+                old_table.bins[boundary].bin_dist != 0):
+            boundary += 1
+
+        self.old_table = old_table
+        self.rehash_idx = (boundary - 1) % max(old_table.num_bins, 1)
+        self.bins = [None] * new_size
+        self.num_bins = new_size
+        self.max_probe = 0
+        self.dist_counts = [0]
+        self._version += 1
+
+    def __rehash(self, steps = None):
+        """
+        RobinHash.__rehash
+        Internal function to migrate up to rehash_step bins from old_table
+            into the current bins
+
+        Parameters:
+            steps (int): number of bins to migrate instead of rehash_step
+
+        Entries are removed from the old bins with the backward shift
+            algorithm, so old_table stays a valid Robin Hood table
+        Bins are visited backwards starting from the end of a cluster, so
+            every bin already visited is empty and removing the entry at
+            rehash_idx never has to shift anything back
+        """
+
+        old_table = self.old_table
+        for _ in range(steps or self.rehash_step):
+            # Everything has been migrated -> drop the old bins
+            if old_table.used_bins == 0:
+                self.old_table = None
+                return
+            entry = old_table.bins[self.rehash_idx]
+            if not entry:
+                self.rehash_idx = (self.rehash_idx - 1) % old_table.num_bins
+            else:
+                old_table.__remove(self.rehash_idx)
+                old_table.used_bins -= 1
+                self.__insert_entry(entry)
+        if old_table.used_bins == 0:
+            self.old_table = None
+
+    def __finish_resize(self):
+        """
+        RobinHash.__finish_resize
+        Internal function to migrate everything left in old_table at once
+
+        The old bins are dropped afterwards, so entries are copied over
+            without being removed from them
+        """
+
+        old_table = self.old_table
+        if old_table is None:
+            return
+        for entry in old_table.bins:
+            if entry:
+                self.__insert_entry(entry)
+        self.old_table = None
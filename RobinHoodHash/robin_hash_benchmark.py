@@ -0,0 +1,453 @@
+"""
+robin_hash_benchmark.py
+
+This program times the RobinHash batch operations against a plain loop over
+the single key operations they replace, and the vectorized IntRobinHash
+lookups against RobinHash for integer keys, opening a memory mapped
+snapshot against rebuilding the map, the throughput of a shared
+ConcurrentRobinHash from 1 to N threads, lookups on a map that has been
+through heavy insert/delete churn with an exact max_probe against the high
+water mark max_probe used to be, a RobinCache against a RobinHash with an
+external recency list on a skewed stream of lookups, and the total lookup
+throughput of 1 to P processes reading one ShardedRobinHash in shared memory
+
+Every timing is the best of a few runs, in operations per second
+
+Usage:
+    python robin_hash_benchmark.py [--entries N] [--repeat R] [--threads T]
+                                   [--processes P]
+"""
+
+from __future__ import print_function
+import argparse
+import collections
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+import timeit
+
+from concurrent_robin_hash import ConcurrentRobinHash
+from robin_cache import RobinCache
+from robin_hash import RobinHash
+from shared_robin_hash import ShardedRobinHash
+
+def _random_keys(num_keys):
+    """
+    Unique random string keys
+    Python 2's string hash clusters sequential keys, so they aren't used
+    """
+    keys = set()
+    while len(keys) < num_keys:
+        keys.add('{0:016x}'.format(random.getrandbits(64)))
+    return list(keys)
+
+def _best(func, repeat):
+    """
+    Best time of repeat runs of func, in seconds
+    """
+    return min(timeit.repeat(func, number = 1, repeat = repeat))
+
+def batch_benchmark(num_entries, repeat):
+    """
+    Times set/get/delete loops against set_many/get_many/delete_many on a
+    map that grows from empty
+
+    Returns:
+        (list) (operation, loop ops/s, batch ops/s) tuples
+    """
+    keys = _random_keys(num_entries)
+    items = [(key, i) for i, key in enumerate(keys)]
+    misses = _random_keys(num_entries)
+
+    def set_loop():
+        rh = RobinHash(max_load = 0.9)
+        for key, value in items:
+            rh.set(key, value)
+    def set_many():
+        RobinHash(max_load = 0.9).set_many(items)
+    def from_items():
+        RobinHash.from_items(items, max_load = 0.9)
+
+    rh = RobinHash.from_items(items, max_load = 0.9)
+    def get_loop():
+        for key in keys:
+            rh.get(key)
+    def get_many():
+        rh.get_many(keys)
+    def miss_loop():
+        for key in misses:
+            rh.get(key)
+    def miss_many():
+        rh.get_many(misses)
+
+    def delete_loop():
+        rh = RobinHash.from_items(items, max_load = 0.9)
+        for key in keys:
+            rh.delete(key)
+    def delete_many():
+        rh = RobinHash.from_items(items, max_load = 0.9)
+        rh.delete_many(keys)
+    build = _best(lambda: RobinHash.from_items(items, max_load = 0.9), repeat)
+
+    results = []
+    for name, loop, batch, setup in (("set", set_loop, set_many, 0),
+                                     ("from_items", set_loop, from_items, 0),
+                                     ("get hit", get_loop, get_many, 0),
+                                     ("get miss", miss_loop, miss_many, 0),
+                                     ("delete", delete_loop, delete_many,
+                                      build)):
+        loop_time = _best(loop, repeat) - setup
+        batch_time = _best(batch, repeat) - setup
+        results.append((name, num_entries / loop_time,
+                        num_entries / batch_time))
+    return results
+
+def int_benchmark(num_entries, repeat):
+    """
+    Times integer key lookups: a loop over RobinHash.get, RobinHash.get_many,
+    and the vectorized IntRobinHash.get_many and contains
+
+    Returns:
+        (list) (operation, ops/s) tuples
+    """
+    # Only this benchmark needs NumPy
+    import numpy as np
+    from int_robin_hash import IntRobinHash
+
+    keys = set()
+    while len(keys) < num_entries:
+        keys.add(random.getrandbits(62))
+    keys = list(keys)
+    num_bins = int(num_entries / 0.9) + 1
+    rh = RobinHash.from_items((key, key) for key in keys)
+    irh = IntRobinHash(num_bins, value_dtype = np.int64)
+    for key in keys:
+        irh.set(key, key)
+    key_array = np.array(keys, dtype = np.int64)
+
+    def get_loop():
+        for key in keys:
+            rh.get(key)
+    results = []
+    for name, func in (("RobinHash get loop", get_loop),
+                       ("RobinHash get_many", lambda: rh.get_many(keys)),
+                       ("IntRobinHash get_many",
+                        lambda: irh.get_many(key_array)),
+                       ("IntRobinHash contains",
+                        lambda: irh.contains(key_array))):
+        results.append((name, num_entries / _best(func, repeat)))
+    return results
+
+def snapshot_benchmark(num_entries, repeat):
+    """
+    Times getting a map ready to serve: a loop over set, from_items, and
+    opening a saved snapshot with open_mmap, then the lookup rate of the
+    mapped snapshot
+
+    Returns:
+        (list) (operation, seconds or ops/s, unit) tuples
+    """
+    keys = _random_keys(num_entries)
+    items = [(key, i) for i, key in enumerate(keys)]
+    tmpdir = tempfile.mkdtemp()
+    path = os.path.join(tmpdir, 'benchmark.snapshot')
+
+    def set_loop():
+        rh = RobinHash(max_load = 0.9)
+        for key, value in items:
+            rh.set(key, value)
+    def open_mmap():
+        RobinHash.open_mmap(path).close()
+    def mapped_get():
+        for key in keys:
+            mapped.get(key)
+
+    mapped = None
+    try:
+        RobinHash.from_items(items).save(path)
+        mapped = RobinHash.open_mmap(path)
+        return [("build with set", _best(set_loop, repeat), "s"),
+                ("build with from_items",
+                 _best(lambda: RobinHash.from_items(items), repeat), "s"),
+                ("open_mmap", _best(open_mmap, repeat), "s"),
+                ("mapped get", num_entries / _best(mapped_get, repeat),
+                 "ops/s")]
+    finally:
+        if mapped is not None:
+            mapped.close()
+        shutil.rmtree(tmpdir)
+
+def churn_benchmark(num_entries, repeat, rounds = 10):
+    """
+    Fills a fixed size map to a load factor of 0.9, then deletes a random key
+    and inserts a new one rounds * num_entries times, noting the highest
+    max_probe reached along the way
+    Times hits and misses with the exact max_probe the map ends up with, and
+    again with max_probe held at that high water mark, which is what it used
+    to stay at
+
+    Returns:
+        (list) (operation, exact ops/s, high water ops/s) tuples
+        (int, int) the exact and the high water max_probe
+    """
+    keys = _random_keys(num_entries)
+    rh = RobinHash(int(num_entries / 0.9) + 1)
+    for key in keys:
+        rh.set(key, key)
+    peak = rh.max_probe
+    for key in _random_keys(rounds * num_entries):
+        idx = random.randrange(num_entries)
+        rh.delete(keys[idx])
+        keys[idx] = key
+        rh.set(key, key)
+        peak = max(rh.max_probe, peak)
+    misses = _random_keys(num_entries)
+
+    def get_hits():
+        for key in keys:
+            rh.get(key)
+    def get_misses():
+        for key in misses:
+            rh.get(key)
+
+    exact = rh.max_probe
+    results = []
+    for name, func in (("get hit", get_hits), ("get miss", get_misses)):
+        exact_time = _best(func, repeat)
+        # Lookups only read max_probe, so it can be raised for a while
+        rh.max_probe = peak
+        high_water_time = _best(func, repeat)
+        rh.max_probe = exact
+        results.append((name, num_entries / exact_time,
+                        num_entries / high_water_time))
+    return results, (exact, peak)
+
+class _LockedRobinHash():
+    """
+    A RobinHash behind one lock, the simplest way to share it between threads
+    """
+    def __init__(self, size):
+        self.map = RobinHash(size)
+        self.lock = threading.Lock()
+    def get(self, key):
+        with self.lock:
+            return self.map.get(key)
+    def set(self, key, value):
+        with self.lock:
+            return self.map.set(key, value)
+
+def concurrent_benchmark(num_entries, repeat, max_threads):
+    """
+    Times a mix of 90% get and 10% set on one shared map, split between 1 to
+    max_threads threads, for a ConcurrentRobinHash and a RobinHash behind a
+    single lock
+
+    Returns:
+        (list) (threads, single lock ops/s, concurrent ops/s) tuples
+    """
+    keys = _random_keys(num_entries)
+    num_bins = int(num_entries / 0.8) + 1
+    ops = [(random.random() < 0.1, random.choice(keys))
+           for _ in range(num_entries)]
+
+    def run(shared, num_threads):
+        def work(chunk):
+            for is_set, key in chunk:
+                if is_set:
+                    shared.set(key, key)
+                else:
+                    shared.get(key)
+        threads = [threading.Thread(target = work,
+                                    args = (ops[i::num_threads],))
+                   for i in range(num_threads)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    results = []
+    for num_threads in range(1, max_threads + 1):
+        rates = []
+        for cls in (_LockedRobinHash, ConcurrentRobinHash):
+            shared = cls(num_bins)
+            for key in keys:
+                shared.set(key, key)
+            rates.append(num_entries / _best(lambda: run(shared, num_threads),
+                                             repeat))
+        results.append((num_threads, rates[0], rates[1]))
+    return results
+
+class _LruRobinHash():
+    """
+    A RobinHash with an OrderedDict recency list beside it, the way a cache
+    was put in front of a slow store before RobinCache
+    """
+    def __init__(self, capacity):
+        self.map = RobinHash(int(capacity / 0.8) + 1)
+        self.recency = collections.OrderedDict()
+        self.capacity = capacity
+    def get(self, key):
+        value = self.map.get(key)
+        if value is not None:
+            # Python 2's OrderedDict has no move_to_end
+            del self.recency[key]
+            self.recency[key] = None
+        return value
+    def set(self, key, value):
+        if key in self.recency:
+            del self.recency[key]
+        elif len(self.recency) >= self.capacity:
+            self.map.delete(self.recency.popitem(last = False)[0])
+        self.recency[key] = None
+        return self.map.set(key, value)
+
+def cache_benchmark(num_entries, repeat):
+    """
+    Times a read-through cache of num_entries / 10 pairs over a stream of
+    lookups where 80% go to 20% of the keys, filling the cache on every miss
+
+    Returns:
+        (list) (name, ops/s, hit rate) tuples
+    """
+    keys = _random_keys(num_entries)
+    hot = keys[:num_entries // 5]
+    stream = [random.choice(hot) if random.random() < 0.8 else
+              random.choice(keys) for _ in range(num_entries)]
+    capacity = max(num_entries // 10, 1)
+
+    def run(cache):
+        hits = 0
+        for key in stream:
+            if cache.get(key) is None:
+                cache.set(key, key)
+            else:
+                hits += 1
+        return hits
+
+    results = []
+    for name, cls in (("recency list", _LruRobinHash),
+                      ("RobinCache", RobinCache)):
+        hits = []
+        rate = num_entries / _best(lambda: hits.append(run(cls(capacity))),
+                                   repeat)
+        results.append((name, rate, float(hits[-1]) / num_entries))
+    return results
+
+def _shared_reader(names, keys, start):
+    """
+    Looks every key up in a ShardedRobinHash attached by name, once start is
+    set
+    """
+    sharded = ShardedRobinHash(names = names)
+    start.wait()
+    for key in keys:
+        sharded.get(key)
+    sharded.close()
+
+def shared_benchmark(num_entries, repeat, max_processes):
+    """
+    Times 1 to max_processes processes each looking up num_entries keys in
+    one ShardedRobinHash, which they read straight from shared memory
+
+    Every process does the same work, so with enough cores the total
+    throughput should grow with the number of processes
+
+    Returns:
+        (list) (processes, total ops/s) tuples
+    """
+    keys = _random_keys(num_entries)
+    results = []
+    with ShardedRobinHash(num_shards = 8,
+                          shard_size = int(num_entries / 8 / 0.8) + 1,
+                          key_size = 32, value_size = 64) as sharded:
+        for key in keys:
+            sharded.set(key, key)
+        for num_processes in range(1, max_processes + 1):
+            def run():
+                start = multiprocessing.Event()
+                processes = [multiprocessing.Process(target = _shared_reader,
+                                                     args = (sharded.names,
+                                                             keys, start))
+                             for _ in range(num_processes)]
+                for p in processes:
+                    p.start()
+                # Give the processes time to start and attach before timing
+                time.sleep(0.5)
+                begin = timeit.default_timer()
+                start.set()
+                for p in processes:
+                    p.join()
+                return timeit.default_timer() - begin
+            elapsed = min(run() for _ in range(repeat))
+            results.append((num_processes,
+                            num_processes * num_entries / elapsed))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--entries', type=int, default=50000,
+                        help='number of pairs in each batch')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='number of runs to take the best of')
+    parser.add_argument('--threads', type=int, default=4,
+                        help='max number of threads sharing one map')
+    parser.add_argument('--processes', type=int,
+                        default=multiprocessing.cpu_count(),
+                        help='max number of processes reading a shared map')
+    args = parser.parse_args()
+
+    print("{0:d} pairs, best of {1:d}".format(args.entries, args.repeat))
+    print("{0:<12}{1:>14}{2:>14}{3:>10}".format("operation", "loop ops/s",
+                                                "batch ops/s", "speedup"))
+    for name, loop_rate, batch_rate in batch_benchmark(args.entries,
+                                                       args.repeat):
+        print("{0:<12}{1:>14.0f}{2:>14.0f}{3:>9.2f}x".format(
+            name, loop_rate, batch_rate, batch_rate / loop_rate))
+
+    print("\nInteger keys")
+    print("{0:<24}{1:>14}".format("operation", "ops/s"))
+    for name, rate in int_benchmark(args.entries, args.repeat):
+        print("{0:<24}{1:>14.0f}".format(name, rate))
+
+    print("\nSnapshots")
+    for name, result, unit in snapshot_benchmark(args.entries, args.repeat):
+        print("{0:<24}{1:>14.6f} {2}".format(name, result, unit))
+
+    print("\nAfter insert/delete churn")
+    results, (exact, peak) = churn_benchmark(args.entries, args.repeat)
+    print("max_probe {0:d}, high water mark {1:d}".format(exact, peak))
+    print("{0:<12}{1:>14}{2:>18}".format("operation", "exact ops/s",
+                                         "high water ops/s"))
+    for name, exact_rate, high_water_rate in results:
+        print("{0:<12}{1:>14.0f}{2:>18.0f}".format(name, exact_rate,
+                                                   high_water_rate))
+
+    print("\nThreads sharing one map, 90% get / 10% set")
+    print("{0:<12}{1:>18}{2:>18}".format("threads", "single lock ops/s",
+                                         "concurrent ops/s"))
+    for num_threads, locked_rate, concurrent_rate in concurrent_benchmark(
+            args.entries, args.repeat, args.threads):
+        print("{0:<12d}{1:>18.0f}{2:>18.0f}".format(num_threads, locked_rate,
+                                                     concurrent_rate))
+
+    print("\nProcesses reading one ShardedRobinHash in shared memory, "
+          "{0:d} cores".format(multiprocessing.cpu_count()))
+    print("{0:<12}{1:>14}{2:>10}".format("processes", "total ops/s",
+                                         "speedup"))
+    results = shared_benchmark(args.entries, args.repeat, args.processes)
+    for num_processes, rate in results:
+        print("{0:<12d}{1:>14.0f}{2:>9.2f}x".format(num_processes, rate,
+                                                    rate / results[0][1]))
+
+    print("\nRead-through cache of {0:d} pairs, 80% of lookups on 20% of "
+          "keys".format(max(args.entries // 10, 1)))
+    print("{0:<14}{1:>14}{2:>10}".format("cache", "ops/s", "hit rate"))
+    for name, rate, hit_rate in cache_benchmark(args.entries, args.repeat):
+        print("{0:<14}{1:>14.0f}{2:>10.3f}".format(name, rate, hit_rate))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+"""
+robin_hash_functions.py
+
+This module contains the hash functions a map can be created with, passed as
+the hash_fn of RobinHash, CompactRobinHash, ConcurrentRobinHash or RobinCache
+
+    hash_function:
+        Python's built in hash, the default
+        Fastest, but string hashes change from one process to the next and
+        integer hashes are easy to make collide on purpose
+    SeededHash:
+        a 64-bit keyed hash with a random seed of its own, so a map made with
+        one can't be filled with keys chosen to pile up in one cluster
+        Bytes, text and integer keys are encoded by encode_key and hashed
+        with the seed as the key of a keyed blake2b, or, where hashlib has
+        no blake2b (Python 2), by an md5 that has been fed the seed first.
+        Other keys fall back to hashing the digits of Python's hash of the
+        key, so keys that collide under Python's hash still collide
+        Keys that compare equal hash the same: encode_key turns bools and
+        integral numbers into ints, and on Python 2 ASCII str into unicode,
+        before encoding them
+    stable_hash / stable_key_hash:
+        a 64-bit hash that is the same in every process and on every
+        machine, so maps built by different workers place their keys in the
+        same bins, and snapshot files can be shared between them
+        stable_hash hashes bytes; stable_key_hash encodes bytes, text and
+        integer keys first, the same way snapshot files do, so keys that
+        compare equal hash the same
+
+Only SeededHash is meant to resist keys chosen to collide, and only as long
+as the seed stays secret. Its outputs are never shown to whoever picks the
+keys, so md5's known collisions, which need an attacker to know the whole
+input, don't help them
+"""
+
+import hashlib
+import numbers
+import os
+import struct
+import zlib
+
+try:
+    from hashlib import blake2b
+except ImportError:
+    blake2b = None
+
+_unpack_64 = struct.Struct('<Q').unpack
+
+try:
+    text_type = unicode
+    integer_types = (int, long)
+except NameError:
+    text_type = str
+    integer_types = (int,)
+
+def hash_function(string):
+    """
+    robin_hash_functions.hash_function
+
+    Hashing function for the hash map
+    By default uses Python's built in hash function
+
+    Parameters:
+        string (string): string to be hashed
+    Returns:
+        (int) hashed value
+    """
+    return hash(string)
+
+class SeededHash():
+    """
+    robin_hash_functions.SeededHash
+
+    Hash function randomized by a seed, for maps whose keys come from
+        untrusted input
+    Every SeededHash() gets a fresh random seed, so two maps never share one
+    """
+
+    def __init__(self, seed = None):
+        """
+        CONSTRUCTOR
+
+        Parameters:
+            seed (bytes):
+                seed to hash keys with
+                None (default) draws 16 random bytes from os.urandom
+        Variables:
+            seed (bytes): seed keys are hashed with
+        """
+        if seed is None:
+            seed = os.urandom(16)
+        self.seed = seed
+        # Hashing starts from a copy of a hasher that already holds the seed
+        if blake2b is not None:
+            if len(seed) > 64:
+                seed = hashlib.sha512(seed).digest()
+            self._hasher = blake2b(digest_size = 8, key = seed)
+        else:
+            self._hasher = hashlib.md5(seed)
+
+    def __call__(self, key):
+        """
+        SeededHash.__call__
+
+        Hashes a key together with the seed
+        Integers are hashed by their digits, since Python hashes integers
+            that are equal modulo a fixed prime to the same value
+        Keys that compare equal, like 1, True and 1.0, hash the same
+
+        Parameters:
+            key (hashable): key to be hashed
+        Returns:
+            (int) hashed value, 64 bits
+        """
+        hasher = self._hasher.copy()
+        # Python 2's str can equal a unicode key, so only Python 3's bytes
+        #   skip encode_key
+        if type(key) is bytes and bytes is not str:
+            hasher.update(b'b' + key)
+        else:
+            try:
+                hasher.update(encode_key(key))
+            except TypeError:
+                hasher.update(b'h' + str(hash(key)).encode('ascii'))
+        return _unpack_64(hasher.digest()[:8])[0]
+
+def canonical_key(key):
+    """
+    robin_hash_functions.canonical_key
+
+    Maps keys that compare equal to one form, so they encode the same
+    Bools and numbers equal to an integer, like True and 1.0, become ints
+    On Python 2, str that is ASCII becomes unicode, which it compares equal
+        to; other str stays bytes
+
+    Parameters:
+        key (hashable): the key
+    Returns:
+        (hashable) the key's canonical form, or the key itself
+    """
+    key_type = type(key)
+    if key_type is text_type or key_type in integer_types:
+        return key
+    if isinstance(key, bytes):
+        if bytes is str:
+            try:
+                return key.decode('ascii')
+            except UnicodeDecodeError:
+                pass
+        return key
+    if isinstance(key, bool):
+        return int(key)
+    if isinstance(key, numbers.Number):
+        try:
+            as_int = int(key)
+        except (TypeError, ValueError, OverflowError):
+            return key
+        if as_int == key:
+            return as_int
+    return key
+
+def encode_key(key):
+    """
+    robin_hash_functions.encode_key
+
+    Encodes a key as bytes that are the same in every process
+    Keys are put in their canonical_key form first, so keys that compare
+        equal encode the same
+
+    Parameters:
+        key (bytes, text or int): the key to encode
+    Returns:
+        (bytes)
+            a type tag followed by the key's bytes, so that bytes, text and
+            integer keys that don't compare equal never encode the same
+    """
+    key = canonical_key(key)
+    if isinstance(key, text_type):
+        return b'u' + key.encode('utf-8')
+    if isinstance(key, bytes):
+        return b'b' + key
+    if isinstance(key, integer_types):
+        return b'i' + str(key).encode('ascii')
+    raise TypeError("stable hash keys must be bytes, text or integers")
+
+def stable_hash(data):
+    """
+    robin_hash_functions.stable_hash
+
+    64-bit hash of bytes that is the same in every process
+    Both halves are checksums computed by zlib in C, so it costs a fraction
+        of a hash written in Python
+
+    Parameters:
+        data (bytes): bytes to be hashed
+    Returns:
+        (int) hashed value
+    """
+    return ((zlib.crc32(data) & 0xffffffff) |
+            (zlib.adler32(data) & 0xffffffff) << 32)
+
+def stable_key_hash(key):
+    """
+    robin_hash_functions.stable_key_hash
+
+    stable_hash of a bytes, text or integer key, encoded by encode_key
+
+    Parameters:
+        key (bytes, text or int): key to be hashed
+    Returns:
+        (int) hashed value
+    """
+    return stable_hash(encode_key(key))
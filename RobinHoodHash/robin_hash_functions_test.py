@@ -0,0 +1,145 @@
+"""
+robin_hash_functions_test.py
+
+This program tests that every map can be given its own hash function, that
+seeded hashes spread keys made to collide under Python's hash, and that the
+stable hash places keys the same way in a process with a different hash seed
+"""
+
+from robin_hash import RobinHash
+from compact_robin_hash import CompactRobinHash
+from concurrent_robin_hash import ConcurrentRobinHash
+from robin_cache import RobinCache
+from robin_hash_functions import (SeededHash, encode_key, hash_function,
+                                  stable_hash, stable_key_hash)
+import os
+import random
+import string
+import subprocess
+import sys
+
+def _get_random_string():
+    valid_chars = string.ascii_letters + string.digits
+    r_str = ""
+    length = random.randint(1, 20)
+    for i in range(length):
+        r_str += random.choice(valid_chars)
+    return r_str
+
+# Integers that all have the same built in hash
+if hasattr(sys, 'hash_info'):
+    modulus = sys.hash_info.modulus
+else:
+    modulus = 2 * sys.maxsize + 1
+colliding = [1 + i * modulus for i in range(500)]
+
+print "Defaulting to Python's hash"
+rh = RobinHash(10)
+assert rh.hash_fn is hash_function
+rh.set('one', 1)
+assert rh.bins[hash('one') % 10].key == 'one'
+
+print "Passing a hash function to every map"
+for make_map in (lambda fn: RobinHash(8, max_load = 0.75, hash_fn = fn),
+                 lambda fn: CompactRobinHash(8, max_load = 0.75, hash_fn = fn),
+                 lambda fn: ConcurrentRobinHash(1024, hash_fn = fn),
+                 lambda fn: RobinCache(500, hash_fn = fn)):
+    for hash_fn in (SeededHash(), stable_key_hash, lambda _: 3):
+        rh = make_map(hash_fn)
+        keys = [_get_random_string() + str(i) for i in range(300)]
+        for key in keys:
+            assert rh.set(key, key) == True
+        for key in keys:
+            assert rh.get(key) == key
+        for key in keys[::2]:
+            assert rh.delete(key) == key
+        for key in keys:
+            assert rh.get(key) == (None if key in keys[::2] else key)
+rh = RobinHash.from_items([(key, 0) for key in colliding],
+                          hash_fn = SeededHash())
+assert all(rh[key] == 0 for key in colliding)
+
+print "Seeding hashes"
+first, second = SeededHash(), SeededHash()
+assert first.seed != second.seed
+for key in ('key', u'key', b'key', 12345, 2 ** 80, 1.5, ('a', 1)):
+    assert first(key) == first(key)
+    assert first(key) == SeededHash(first.seed)(key)
+assert first('key') != second('key')
+assert first(b'key') != second(b'key')
+assert len(set(first(key) for key in colliding)) == len(colliding)
+assert first(u'key') != first(1)
+if bytes is not str:
+    assert first(b'key') != first(u'key')
+assert all(0 <= first(key) < 2 ** 64 for key in ('key', b'key', -1, 1.5))
+assert SeededHash(b'x' * 100)('key') != SeededHash(b'x' * 99)('key')
+# Keys are hashed by a keyed digest, never by Python's string hash, so the
+#   same seed gives the same hash in a process with another hash seed
+assert first(b'key') == int(subprocess.check_output(
+    [sys.executable, '-c',
+     "import sys\n"
+     "from robin_hash_functions import SeededHash\n"
+     "print(SeededHash(sys.argv[1].decode('hex'))(b'key'))",
+     first.seed.encode('hex')],
+    env = dict(os.environ, PYTHONHASHSEED = '12345')))
+
+print "Spreading keys that collide under Python's hash"
+plain = RobinHash(1000)
+seeded = RobinHash(1000, hash_fn = SeededHash())
+for key in colliding:
+    assert plain.set(key, key) == True
+    assert seeded.set(key, key) == True
+assert plain.max_probe == len(colliding) - 1
+assert seeded.max_probe < 50
+assert all(seeded.get(key) == key for key in colliding)
+
+print "Hashing keys that compare equal the same"
+for hash_fn in (SeededHash(), stable_key_hash):
+    for equal in ((1, True, 1.0), (0, False, 0.0, -0.0), (2 ** 70, 2.0 ** 70),
+                  ('k', u'k'), (u'k', 'k')):
+        assert len(set(hash_fn(key) for key in equal)) == 1
+        rh = RobinHash(64, hash_fn = hash_fn)
+        rh[equal[0]] = 'x'
+        for key in equal:
+            assert rh.get(key) == 'x'
+            assert key in rh
+    # Python 3's bytes never equal text, Python 2's str does if it's ASCII
+    assert (hash_fn(b'k') == hash_fn(u'k')) == (b'k' == u'k')
+assert SeededHash(b'seed')(1.5) == SeededHash(b'seed')(1.5)
+assert SeededHash(b'seed')(1.5) != SeededHash(b'seed')(1)
+
+print "Hashing keys the same way in every process"
+assert stable_hash(b'') == 1 << 32
+assert stable_key_hash(b'key') == stable_hash(encode_key(b'key'))
+assert len(set(stable_key_hash(key) for key in
+               (b'\xff', u'\xff', 1, b'one', 2))) == 5
+try:
+    stable_key_hash(1.5)
+    assert False
+except TypeError:
+    pass
+
+keys = [_get_random_string() + str(i) for i in range(200)]
+rh = RobinHash(256, hash_fn = stable_key_hash)
+for key in keys:
+    rh.set(key, None)
+layout = [entry and entry.key for entry in rh.bins]
+
+# Build the same map in a process with a different hash seed
+script = ("import sys\n"
+          "from robin_hash import RobinHash\n"
+          "from robin_hash_functions import stable_key_hash\n"
+          "rh = RobinHash(256, hash_fn = stable_key_hash)\n"
+          "for key in sys.argv[1:]:\n"
+          "    rh.set(key, None)\n"
+          "sys.stdout.write(repr([entry and entry.key for entry in rh.bins]))\n")
+env = dict(os.environ, PYTHONHASHSEED = '12345')
+output = subprocess.check_output([sys.executable, '-c', script] + keys,
+                                 env = env)
+assert output.decode('ascii') == repr(layout)
+assert stable_key_hash('key') == int(subprocess.check_output(
+    [sys.executable, '-c',
+     "from robin_hash_functions import stable_key_hash\n"
+     "print(stable_key_hash('key'))"], env = env))
+
+print "All tests successful!"
@@ -0,0 +1,72 @@
+"""
+robin_hash_memory.py
+
+This program reports how much memory each hash map layout spends per entry,
+comparing RobinHash, CompactRobinHash and Python's dict
+
+Only the memory of the containers themselves is counted. The keys and values
+are the same objects in every layout, so they are left out
+
+Usage:
+    python robin_hash_memory.py [--entries N] [--load LOAD]
+"""
+
+from __future__ import print_function
+import argparse
+import random
+import sys
+
+from robin_hash import RobinHash
+from compact_robin_hash import CompactRobinHash
+
+def robin_hash_bytes(rh):
+    """
+    Bytes used by a RobinHash: the bins list plus every RobinEntry and its
+    __dict__
+    """
+    total = sys.getsizeof(rh.bins)
+    for entry in rh.bins:
+        if entry:
+            total += sys.getsizeof(entry) + sys.getsizeof(entry.__dict__)
+    return total
+
+def compact_robin_hash_bytes(rh):
+    """
+    Bytes used by a CompactRobinHash: its four parallel arrays
+    """
+    return (sys.getsizeof(rh.bin_hashes) + sys.getsizeof(rh.bin_dists) +
+            sys.getsizeof(rh.bin_keys) + sys.getsizeof(rh.bin_values))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--entries', type=int, default=100000,
+                        help='number of entries to insert')
+    parser.add_argument('--load', type=float, default=0.9,
+                        help='load factor of the Robin Hood maps')
+    args = parser.parse_args()
+
+    num_bins = int(args.entries / args.load) + 1
+    # Random keys, since Python 2's string hash clusters sequential ones
+    keys = set()
+    while len(keys) < args.entries:
+        keys.add('{0:016x}'.format(random.getrandbits(64)))
+    items = [(key, i) for i, key in enumerate(keys)]
+
+    rh = RobinHash(num_bins)
+    compact = CompactRobinHash(num_bins)
+    d = {}
+    for key, value in items:
+        rh.set(key, value)
+        compact.set(key, value)
+        d[key] = value
+
+    print("{0:d} entries, load factor {1:f}".format(args.entries, rh.load()))
+    print("{0:<18}{1:>16}{2:>12}".format("layout", "bytes", "per entry"))
+    for name, size in (("RobinHash", robin_hash_bytes(rh)),
+                       ("CompactRobinHash", compact_robin_hash_bytes(compact)),
+                       ("dict", sys.getsizeof(d))):
+        print("{0:<18}{1:>16d}{2:>12.1f}".format(name, size,
+                                                float(size) / args.entries))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+"""
+robin_hash_snapshot.py
+
+This module saves a Robin Hood hash map to a fixed binary file layout and
+answers lookups straight out of a memory mapped copy of that file
+
+Rebuilding a large map with millions of set calls in every worker process is
+slow, and leaves every process with its own copy. A snapshot is instead laid
+out on disk exactly as the lookups need it, so opening one only maps the file,
+and every process that opens the same file shares the same read-only pages
+
+File layout (all integers little endian):
+    header (HEADER_SIZE bytes):
+        magic (8 bytes): MAGIC
+        version (uint32): VERSION
+        reserved (uint32)
+        num_bins (uint64): number of bins
+        used_bins (uint64): number of key: value pairs
+        max_probe (uint64): max extra probing distance used by any entry
+        bins_offset (uint64): file offset of the bins array
+        blob_offset (uint64): file offset of the key/value blob
+    bins (num_bins * BIN_SIZE bytes), one per bin:
+        hash (uint64): stable hash of the key
+        dist (int64): probe distance, -1 for empty bins
+        offset (uint64): file offset of the bin's record in the blob
+    blob, one record per pair:
+        key_len (uint32), value_len (uint32), key bytes, value bytes
+
+Python's hash is randomized per process, so bins are placed with
+robin_hash_functions.stable_hash of the encoded key, which is the same in
+every process. Keys are encoded with a one byte type tag by encode_key so
+that bytes, text and integer keys only match keys they compare equal to, and
+values are pickled
+"""
+
+import mmap
+import pickle
+import struct
+
+from robin_hash_functions import encode_key, stable_hash
+
+# Python 2's range builds a whole list, which the probing loops can't afford
+try:
+    range = xrange
+except NameError:
+    pass
+
+MAGIC = b'ROBINMAP'
+# Version 2 encodes keys that compare equal, like 1 and True, the same
+VERSION = 2
+
+HEADER = struct.Struct('<8sIIQQQQQ')
+HEADER_SIZE = 64
+BIN = struct.Struct('<QqQ')
+BIN_SIZE = BIN.size
+RECORD = struct.Struct('<II')
+
+# Probe distance of an empty bin
+EMPTY = -1
+
+def write_snapshot(items, path, max_load = 0.8):
+    """
+    robin_hash_snapshot.write_snapshot
+
+    Writes key: value pairs to a snapshot file
+
+    The bins are laid out the way Robin Hood insertion would leave them, by
+        packing the entries in order of ideal bin
+
+    Parameters:
+        items (iterable): (key, value) pairs with unique keys
+        path (string): file to write
+        max_load (float): load factor of the bins in the file
+    """
+    records = []
+    for key, value in items:
+        key_bytes = encode_key(key)
+        records.append((stable_hash(key_bytes), key_bytes,
+                        pickle.dumps(value, 2)))
+
+    num_bins = max(int(len(records) / max_load) + 1, 1)
+    homes = [record[0] % num_bins for record in records]
+    order = sorted(range(len(records)), key = homes.__getitem__)
+
+    # Entries packed past the last bin wrap round to the front, which pushes
+    #   back the entries there
+    # Repeat the packing until the number of wrapped entries settles
+    start = -1
+    while True:
+        pos = start
+        for i in order:
+            pos = homes[i] if homes[i] > pos else pos + 1
+        if pos - num_bins <= start:
+            break
+        start = pos - num_bins
+
+    bins_offset = HEADER_SIZE
+    blob_offset = bins_offset + num_bins * BIN_SIZE
+    bins = [(0, EMPTY, 0)] * num_bins
+    max_probe = 0
+    offset = blob_offset
+    pos = start
+    for i in order:
+        hash_value, key_bytes, value_bytes = records[i]
+        pos = homes[i] if homes[i] > pos else pos + 1
+        dist = pos - homes[i]
+        max_probe = max(dist, max_probe)
+        bins[pos % num_bins] = (hash_value, dist, offset)
+        offset += RECORD.size + len(key_bytes) + len(value_bytes)
+
+    with open(path, 'wb') as f:
+        header = HEADER.pack(MAGIC, VERSION, 0, num_bins, len(records),
+                             max_probe, bins_offset, blob_offset)
+        f.write(header.ljust(HEADER_SIZE, b'\0'))
+        for hash_value, dist, record_offset in bins:
+            f.write(BIN.pack(hash_value, dist, record_offset))
+        # Records go in the same order as their offsets were handed out
+        for i in order:
+            _, key_bytes, value_bytes = records[i]
+            f.write(RECORD.pack(len(key_bytes), len(value_bytes)))
+            f.write(key_bytes)
+            f.write(value_bytes)
+
+class MappedRobinHash():
+    """
+    robin_hash_snapshot.MappedRobinHash
+
+    Read-only HashMap answering lookups from a memory mapped snapshot
+    """
+
+    def __init__(self, path):
+        """
+        CONSTRUCTOR
+
+        Maps the file and reads its header, nothing else is read until a
+            lookup needs it
+
+        Parameters:
+            path (string): snapshot file written by write_snapshot
+        Variables:
+            buffer (mmap): read-only mapping of the whole file
+            num_bins (int): number of bins in the hash table/hash map size
+            used_bins (int): number of bins in use
+            max_probe (int): max extra probing distance used by any entry
+            bins_offset (int): file offset of the bins array
+            blob_offset (int): file offset of the key/value blob
+        """
+        with open(path, 'rb') as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+        (magic, version, _, self.num_bins, self.used_bins, self.max_probe,
+         self.bins_offset, self.blob_offset) = HEADER.unpack_from(self.buffer)
+        if magic != MAGIC or version != VERSION:
+            self.buffer.close()
+            raise ValueError("{0} is not a version {1} RobinHash snapshot"
+                             .format(path, VERSION))
+
+    def get(self, key):
+        """
+        MappedRobinHash.get
+
+        Gets the value associated with a key in the hash map
+
+        Parameters:
+            key (bytes, text or int): the key to be searched for in the map
+        Returns:
+            (AnyType)
+                Value associated with the key if the pair was saved
+                None otherwise
+        """
+
+        key_bytes = encode_key(key)
+        hash_value = stable_hash(key_bytes)
+        buf = self.buffer
+        num_bins = self.num_bins
+        init_idx = hash_value % num_bins
+        for i in range(self.max_probe + 1):
+            curr_idx = (init_idx + i) % num_bins
+            bin_hash, bin_dist, offset = BIN.unpack_from(
+                buf, self.bins_offset + curr_idx * BIN_SIZE)
+            # Empty bins have a distance of -1, so they also end the search
+            if i > bin_dist:
+                return None
+            if bin_hash == hash_value:
+                key_len, value_len = RECORD.unpack_from(buf, offset)
+                key_start = offset + RECORD.size
+                if buf[key_start:key_start + key_len] == key_bytes:
+                    value_start = key_start + key_len
+                    return pickle.loads(
+                        buf[value_start:value_start + value_len])
+        return None
+
+    def load(self):
+        """
+        MappedRobinHash.load
+        Returns the load factor of the map
+
+        Returns:
+            (float) load factor of hash map
+        """
+
+        return float(self.used_bins) / self.num_bins
+
+    def close(self):
+        """
+        MappedRobinHash.close
+        Unmaps the file
+        """
+
+        self.buffer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,101 @@
+"""
+robin_hash_snapshot_test.py
+
+This program tests that a RobinHash saved to a snapshot file answers the same
+lookups once it is memory mapped, including from another process
+"""
+
+from robin_hash import RobinHash
+from robin_hash_snapshot import MappedRobinHash
+import multiprocessing
+import os
+import random
+import shutil
+import string
+import tempfile
+
+def _get_random_string():
+    valid_chars = string.ascii_letters + string.digits
+    r_str = ""
+    length = random.randint(1, 20)
+    for i in range(length):
+        r_str += random.choice(valid_chars)
+    return r_str
+
+def _lookup(args):
+    path, keys = args
+    with RobinHash.open_mmap(path) as mapped:
+        return [mapped.get(key) for key in keys]
+
+tmpdir = tempfile.mkdtemp()
+path = os.path.join(tmpdir, 'map.snapshot')
+
+try:
+    print "Saving an empty map"
+    RobinHash(10).save(path)
+    with RobinHash.open_mmap(path) as mapped:
+        assert mapped.get('one') == None
+        assert mapped.load() == 0
+
+    print "Saving mixed keys and values"
+    rh = RobinHash(10)
+    rh.set('one', 1)
+    rh.set(u'two', [2, 'two'])
+    rh.set(3, {'three': 3.0})
+    rh.set(b'four', None)
+    rh.save(path)
+    with RobinHash.open_mmap(path) as mapped:
+        assert mapped.used_bins == 4
+        assert mapped.get('one') == 1
+        assert mapped.get(u'two') == [2, 'two']
+        assert mapped.get(3) == {'three': 3.0}
+        assert mapped.get(b'four') == None
+        assert mapped.get('3') == None
+        assert mapped.get(4) == None
+
+    print "Rejecting keys that can't be saved"
+    rh.set(('a', 'tuple'), 5)
+    try:
+        rh.save(path)
+        assert False
+    except TypeError:
+        pass
+
+    print "Rejecting files that aren't snapshots"
+    with open(path, 'wb') as f:
+        f.write(b'\0' * 128)
+    try:
+        MappedRobinHash(path)
+        assert False
+    except ValueError:
+        pass
+
+    print "Saving a large map while it is being resized"
+    rh = RobinHash(8, max_load=0.9, rehash_step=1)
+    pairs = {}
+    for i in range(20000):
+        key = _get_random_string() + str(i)
+        rh.set(key, i)
+        pairs[key] = i
+    assert rh.old_table is not None
+    rh.save(path)
+    missing = [_get_random_string() + 'x' for _ in range(1000)]
+    with RobinHash.open_mmap(path) as mapped:
+        assert mapped.used_bins == len(pairs)
+        for key, value in pairs.items():
+            assert mapped.get(key) == value
+        for key in missing:
+            assert mapped.get(key) == None
+
+    print "Reading the snapshot from other processes"
+    keys = list(pairs)
+    pool = multiprocessing.Pool(4)
+    chunks = [(path, keys[i::4]) for i in range(4)]
+    for (_, chunk), values in zip(chunks, pool.map(_lookup, chunks)):
+        assert values == [pairs[key] for key in chunk]
+    pool.close()
+    pool.join()
+finally:
+    shutil.rmtree(tmpdir)
+
+print "All tests successful!"
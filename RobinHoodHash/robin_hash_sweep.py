@@ -0,0 +1,300 @@
+"""
+robin_hash_sweep.py
+
+This program benchmarks RobinHash against Python's dict over a sweep of table
+sizes, load factors and key types, and writes the results as JSON so that runs
+from different releases can be compared
+
+For every table size, load factor and key type, a fixed size RobinHash of
+that many bins, one hashing with a SeededHash, and a dict are each filled to
+the load factor, and timed on:
+    set: inserting every key into an empty map
+    get hit: looking up every key
+    get miss: looking up as many keys that aren't in the map
+    delete: deleting every key
+Throughput is the best of a few runs, in operations per second. Latency is
+measured by timing a sample of single operations on a map at the same load,
+and is reported as the median (p50) and 99th percentile (p99) in nanoseconds,
+including the cost of reading the timer
+
+Key types:
+    short: 8 character strings
+    long: 64 character strings
+    int: 62-bit integers
+    adversarial:
+        integers that all have the same built in hash, so every key lands in
+        the same bin of a RobinHash and collides in a dict too
+        Every operation is linear in the number of keys, except in the
+        seeded RobinHash, so these runs are capped at --max-adversarial keys
+
+Usage:
+    python robin_hash_sweep.py [--sizes 1e3,1e4,1e5] [--loads 0.5,0.75,0.9]
+                               [--keys short,long,int,adversarial]
+                               [--output results.json]
+                               [--compare baseline.json]
+
+Sizes up to 1e7 work but need several GB of memory and a long time
+With --compare, any throughput that dropped below --tolerance of the baseline
+is reported and the program exits with status 1
+"""
+
+from __future__ import division, print_function
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import timeit
+
+from robin_hash import RobinHash
+from robin_hash_functions import SeededHash
+
+# Python 2's range builds a whole list, which the timing loops can't afford
+try:
+    range = xrange
+except NameError:
+    pass
+
+timer = timeit.default_timer
+
+KEY_TYPES = ('short', 'long', 'int', 'adversarial')
+OPERATIONS = ('set', 'get hit', 'get miss', 'delete')
+
+def _hash_modulus():
+    """
+    Integers that are equal modulo this number have the same hash
+    """
+    hash_info = getattr(sys, 'hash_info', None)
+    if hash_info is not None:
+        return hash_info.modulus
+    # Python 2 folds longs into an unsigned C long
+    return 2 * sys.maxsize + 1
+
+def make_keys(key_type, count):
+    """
+    Unique keys of one of the KEY_TYPES
+
+    Returns:
+        (list) count keys
+    """
+    if key_type == 'adversarial':
+        modulus = _hash_modulus()
+        return [1 + i * modulus for i in range(count)]
+
+    if key_type == 'short':
+        new_key = lambda: '{0:08x}'.format(random.getrandbits(32))
+    elif key_type == 'long':
+        new_key = lambda: '{0:064x}'.format(random.getrandbits(256))
+    elif key_type == 'int':
+        new_key = lambda: random.getrandbits(62)
+    else:
+        raise ValueError("unknown key type {0!r}".format(key_type))
+    keys = set()
+    while len(keys) < count:
+        keys.add(new_key())
+    return list(keys)
+
+def _robin_hash(size):
+    rh = RobinHash(size)
+    return rh.set, rh.get, rh.delete
+
+def _seeded_robin_hash(size):
+    rh = RobinHash(size, hash_fn = SeededHash())
+    return rh.set, rh.get, rh.delete
+
+def _dict(size):
+    d = {}
+    return d.__setitem__, d.get, d.pop
+
+IMPLEMENTATIONS = (('RobinHash', _robin_hash), ('seeded', _seeded_robin_hash),
+                   ('dict', _dict))
+
+def _percentile(sorted_times, percent):
+    """
+    Nearest rank percentile of a sorted list, in nanoseconds
+    """
+    idx = int(round(percent / 100 * (len(sorted_times) - 1)))
+    return sorted_times[idx] * 1e9
+
+def run_case(make_map, size, keys, misses, repeat, samples):
+    """
+    Times every operation on one implementation for one set of keys
+
+    Parameters:
+        make_map (function): size -> (set, get, delete) of a new, empty map
+        size (int): number of bins to give the map
+        keys (list): keys to insert
+        misses (list): keys that are never inserted
+        repeat (int): number of runs to take the best throughput of
+        samples (int): number of single operations timed for latency
+    Returns:
+        (dict) operation -> (ops/s, p50 ns, p99 ns)
+    """
+    best = dict.fromkeys(OPERATIONS, float('inf'))
+    for _ in range(repeat):
+        set_, get, delete = make_map(size)
+        start = timer()
+        for key in keys:
+            set_(key, key)
+        best['set'] = min(timer() - start, best['set'])
+        for name, func, args in (("get hit", get, keys),
+                                 ("get miss", get, misses),
+                                 ("delete", delete, keys)):
+            start = timer()
+            for key in args:
+                func(key)
+            best[name] = min(timer() - start, best[name])
+
+    # Time single operations on a map filled with everything but the sample
+    sample = random.sample(keys, min(samples, len(keys)))
+    sampled = set(sample)
+    set_, get, delete = make_map(size)
+    for key in keys:
+        if key not in sampled:
+            set_(key, key)
+    times = []
+    for key in sample:
+        start = timer()
+        set_(key, key)
+        times.append(timer() - start)
+    latencies = {'set': sorted(times)}
+    for name, func, args in (("get hit", get, sample),
+                             ("get miss", get, misses[:len(sample)]),
+                             ("delete", delete, sample)):
+        times = []
+        for key in args:
+            start = timer()
+            func(key)
+            times.append(timer() - start)
+        latencies[name] = sorted(times)
+
+    results = {}
+    for name in OPERATIONS:
+        count = len(misses) if name == "get miss" else len(keys)
+        times = latencies[name]
+        results[name] = (count / best[name], _percentile(times, 50),
+                         _percentile(times, 99))
+    return results
+
+def sweep(sizes, loads, key_types, repeat, samples, max_adversarial):
+    """
+    Runs every combination of table size, load factor, key type and
+    implementation
+
+    Returns:
+        (list) one dict per implementation, case and operation
+    """
+    results = []
+    for size in sizes:
+        for load in loads:
+            for key_type in key_types:
+                count = int(size * load)
+                if key_type == 'adversarial':
+                    count = min(count, max_adversarial)
+                all_keys = make_keys(key_type, 2 * count)
+                keys, misses = all_keys[:count], all_keys[count:]
+                for impl, make_map in IMPLEMENTATIONS:
+                    print("{0:>9d} bins | load {1:.2f} | {2:<11} | {3}".format(
+                        size, load, key_type, impl), file=sys.stderr)
+                    case = run_case(make_map, size, keys, misses, repeat,
+                                    samples)
+                    for name in OPERATIONS:
+                        ops, p50, p99 = case[name]
+                        results.append({'implementation': impl,
+                                        'size': size,
+                                        'load': load,
+                                        'key_type': key_type,
+                                        'entries': count,
+                                        'operation': name,
+                                        'ops_per_sec': ops,
+                                        'p50_ns': p50,
+                                        'p99_ns': p99})
+    return results
+
+def _case_key(result):
+    return (result['implementation'], result['size'], result['load'],
+            result['key_type'], result['operation'])
+
+def compare(results, baseline, tolerance):
+    """
+    Finds the throughputs that dropped below tolerance times the baseline
+
+    Returns:
+        (list) (result, baseline ops/s) tuples
+    """
+    before = dict((_case_key(result), result['ops_per_sec'])
+                  for result in baseline['results'])
+    return [(result, before[_case_key(result)]) for result in results
+            if _case_key(result) in before and
+            result['ops_per_sec'] < tolerance * before[_case_key(result)]]
+
+def _floats(text):
+    return [float(value) for value in text.split(',')]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--sizes', type=_floats, default=[1e3, 1e4, 1e5],
+                        help='comma separated table sizes, in bins')
+    parser.add_argument('--loads', type=_floats,
+                        default=[0.5, 0.75, 0.9, 0.95],
+                        help='comma separated load factors')
+    parser.add_argument('--keys', type=lambda text: text.split(','),
+                        default=list(KEY_TYPES),
+                        help='comma separated key types, from ' +
+                             ', '.join(KEY_TYPES))
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='number of runs to take the best of')
+    parser.add_argument('--samples', type=int, default=2000,
+                        help='number of single operations timed for latency')
+    parser.add_argument('--max-adversarial', type=int, default=2000,
+                        help='most keys used for the adversarial key type')
+    parser.add_argument('--output', help='file to write the JSON results to')
+    parser.add_argument('--compare',
+                        help='JSON results of an earlier run to compare to')
+    parser.add_argument('--tolerance', type=float, default=0.9,
+                        help='fraction of the baseline throughput below '
+                             'which a result counts as a regression')
+    args = parser.parse_args()
+    for key_type in args.keys:
+        if key_type not in KEY_TYPES:
+            parser.error("unknown key type {0!r}".format(key_type))
+
+    results = sweep([int(size) for size in args.sizes], args.loads,
+                    args.keys, args.repeat, args.samples,
+                    args.max_adversarial)
+
+    print("{0:<10}{1:>9}{2:>6}  {3:<12}{4:<10}{5:>12}{6:>10}{7:>10}".format(
+        "impl", "bins", "load", "keys", "operation", "ops/s", "p50 ns",
+        "p99 ns"))
+    for result in results:
+        print("{implementation:<10}{size:>9d}{load:>6.2f}  {key_type:<12}"
+              "{operation:<10}{ops_per_sec:>12.0f}{p50_ns:>10.0f}"
+              "{p99_ns:>10.0f}".format(**result))
+
+    if args.output:
+        # Enough about the run to tell whether two files are comparable
+        meta = {'python': platform.python_version(),
+                'implementation': platform.python_implementation(),
+                'platform': platform.platform(),
+                'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'repeat': args.repeat,
+                'samples': args.samples}
+        with open(args.output, 'w') as f:
+            json.dump({'meta': meta, 'results': results}, f, indent=1,
+                      sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for result, before in regressions:
+            print("REGRESSION {implementation} {size:d} bins load {load:.2f} "
+                  "{key_type} {operation}: ".format(**result) +
+                  "{0:.0f} -> {1:.0f} ops/s".format(before,
+                                                    result['ops_per_sec']))
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -7,49 +7,10 @@ map are working. Maybe I'll implement unit tests later.
 
 from __future__ import division
 from robin_hash import RobinHash
+from compact_robin_hash import CompactRobinHash, EMPTY
 import random
 import string
 
-# Initialization
-print "Initializing Hash Map"
-rh = RobinHash(10)
-
-# set and get
-print "Inserting first entry"
-assert rh.set('one', 1) == True
-assert rh.get('one') == 1
-assert rh.load() == 0.1
-
-# another set and get
-print "Inserting second entry"
-assert rh.set('two', 2) == True
-assert rh.get('two') == 2
-assert rh.load() == 0.2
-
-# override a key: value pair, test multiple data types
-print "Overriding first entry"
-assert rh.set('one', 'one') == True
-assert rh.get('one') == 'one'
-
-# deletion
-print "Deleting first entry"
-assert rh.delete('one') == 'one'
-assert rh.load() == 0.1
-print "Deleting second entry"
-assert rh.delete('two') == 2
-assert rh.load() == 0
-
-print "Inserting to fill map"
-hash_function = lambda _: 8
-for i in range(10):
-    assert rh.set(str(i), i) == True
-    assert rh.load() == (i + 1) / 10
-assert rh.set('11', 11) == False
-assert rh.set('7', 'seven') == True
-
-# Run a bunch of sort of random functions to hopefully catch any bugs, edge
-#   cases, or obscure failures
-
 def _get_random_string():
     valid_chars = string.ascii_letters + string.digits
     r_str = ""
@@ -58,39 +19,339 @@ def _get_random_string():
         r_str += random.choice(valid_chars)
     return r_str
 
-print "\nRunning randomized experiments\n"
-NUM_EXPERIMENTS = 100
-for j in range(NUM_EXPERIMENTS):
-    rh = RobinHash(512)
-    random_keys = set()
-    for i in range(1000):
-        key = _get_random_string()
-        value = _get_random_string()
-        success = rh.set(key, value)
-        assert success or rh.load() == 1
-        if random.random() < 0.3 and success:
-            random_keys.add(key)
-        if random.random() < 0.05:
-            for key in random_keys:
-                assert rh.get(key)
-                if random.random() < 0.5:
-                    assert rh.set(key, _get_random_string())
+# Check that every entry's bin_dist matches its position, and that max_probe
+#   and the count of entries at each distance are exact
+def _check_invariants(table):
+    dist_counts = [0] * (table.max_probe + 1)
+    if isinstance(table, CompactRobinHash):
+        for idx, dist in enumerate(table.bin_dists):
+            if dist != EMPTY:
+                init_idx = table.bin_hashes[idx] % table.num_bins
+                assert (init_idx + dist) % table.num_bins == idx
+                assert dist <= table.max_probe
+                dist_counts[dist] += 1
+    else:
+        for idx, entry in enumerate(table.bins):
+            if entry:
+                assert entry.hash_value == table.hash_fn(entry.key)
+                init_idx = entry.hash_value % table.num_bins
+                assert (init_idx + entry.bin_dist) % table.num_bins == idx
+                assert entry.bin_dist <= table.max_probe
+                dist_counts[entry.bin_dist] += 1
+    assert table.dist_counts == dist_counts
+    assert table.max_probe == 0 or dist_counts[-1] > 0
+
+# Run every scenario against each storage layout
+def _run_tests(HashMap):
+    # Initialization
+    print "Initializing Hash Map"
+    rh = HashMap(10)
+
+    # set and get
+    print "Inserting first entry"
+    assert rh.set('one', 1) == True
+    assert rh.get('one') == 1
+    assert rh.load() == 0.1
+
+    # another set and get
+    print "Inserting second entry"
+    assert rh.set('two', 2) == True
+    assert rh.get('two') == 2
+    assert rh.load() == 0.2
+
+    # override a key: value pair, test multiple data types
+    print "Overriding first entry"
+    assert rh.set('one', 'one') == True
+    assert rh.get('one') == 'one'
+
+    # deletion
+    print "Deleting first entry"
+    assert rh.delete('one') == 'one'
+    assert rh.load() == 0.1
+    print "Deleting second entry"
+    assert rh.delete('two') == 2
+    assert rh.load() == 0
+
+    # Every key hashes to the same bin, so the map fills as one long cluster
+    print "Inserting to fill map"
+    rh = HashMap(10, hash_fn = lambda _: 8)
+    for i in range(10):
+        assert rh.set(str(i), i) == True
+        assert rh.load() == (i + 1) / 10
+    assert rh.set('11', 11) == False
+    assert rh.set('7', 'seven') == True
+    assert rh.max_probe == 9
+
+    # max_probe falls back as entries are deleted
+    _check_invariants(rh)
+    for i in range(10):
+        assert rh.delete(str(i)) is not None
+        _check_invariants(rh)
+    assert rh.max_probe == 0
+
+    # Run a bunch of sort of random functions to hopefully catch any bugs, edge
+    #   cases, or obscure failures
+
+    print "\nRunning randomized experiments\n"
+    NUM_EXPERIMENTS = 100
+    for j in range(NUM_EXPERIMENTS):
+        rh = HashMap(512)
+        random_keys = set()
+        for i in range(1000):
+            key = _get_random_string()
+            value = _get_random_string()
+            success = rh.set(key, value)
+            assert success or rh.load() == 1
+            if random.random() < 0.3 and success:
+                random_keys.add(key)
+            if random.random() < 0.05:
+                for key in random_keys:
                     assert rh.get(key)
-                else:
-                    rh.delete(key)
-                    assert not rh.get(key)
-            random_keys = set()
-        if random.random() < .05:
-            rh.get(_get_random_string())
-        if random.random() < 0.1:
-            new_key = _get_random_string()
-            rh.delete(new_key)
-            if new_key in random_keys:
-                random_keys.remove(new_key)
-    print "{0:03d}/{1:d} | Max Probe: {2:03d} | Load Factor: {3:f}".format(
-                                                            j + 1,
-                                                            NUM_EXPERIMENTS,
-                                                            rh.max_probe,
-                                                            rh.load())
+                    if random.random() < 0.5:
+                        assert rh.set(key, _get_random_string())
+                        assert rh.get(key)
+                    else:
+                        rh.delete(key)
+                        assert not rh.get(key)
+                random_keys = set()
+            if random.random() < .05:
+                rh.get(_get_random_string())
+            if random.random() < 0.1:
+                new_key = _get_random_string()
+                rh.delete(new_key)
+                if new_key in random_keys:
+                    random_keys.remove(new_key)
+        _check_invariants(rh)
+        print "{0:03d}/{1:d} | Max Probe: {2:03d} | Load Factor: {3:f}".format(
+                                                                j + 1,
+                                                                NUM_EXPERIMENTS,
+                                                                rh.max_probe,
+                                                                rh.load())
+
+    print "\nTesting incremental resizing"
+    rh = HashMap(8, max_load=0.75, min_load=0.2)
+    keys = [_get_random_string() + str(i) for i in range(5000)]
+    for i, key in enumerate(keys):
+        assert rh.set(key, i) == True
+        assert rh.load() <= 0.75
+        if i % 100 == 0:
+            _check_invariants(rh)
+            if rh.old_table is not None:
+                _check_invariants(rh.old_table)
+    print "Grew to {0:d} bins | Max Probe: {1:03d} | Load Factor: {2:f}".format(
+                                                                rh.num_bins,
+                                                                rh.max_probe,
+                                                                rh.load())
+    assert rh.num_bins > 5000
+    for i, key in enumerate(keys):
+        assert rh.get(key) == i
+    assert rh.get('not a key') == None
+
+    for i, key in enumerate(keys[:4900]):
+        assert rh.delete(key) == i
+        assert rh.get(key) == None
+        if i % 100 == 0:
+            _check_invariants(rh)
+            if rh.old_table is not None:
+                _check_invariants(rh.old_table)
+    for i, key in enumerate(keys[4900:], start=4900):
+        assert rh.get(key) == i
+    print "Shrank to {0:d} bins | Max Probe: {1:03d} | Load Factor: {2:f}".format(
+                                                                rh.num_bins,
+                                                                rh.max_probe,
+                                                                rh.load())
+    assert rh.num_bins < 1024
+    assert rh.used_bins == 100
+
+for HashMap in (RobinHash, CompactRobinHash):
+    print "Testing {0}\n".format(HashMap.__name__)
+    _run_tests(HashMap)
+    print ""
+
+print "Testing batch operations"
+items = [(_get_random_string() + str(i), i) for i in range(3000)]
+keys = [key for key, _ in items]
+# Repeated keys keep the last value
+rh = RobinHash.from_items(items + [(keys[0], 'first')], max_load=0.9)
+_check_invariants(rh)
+assert rh.get(keys[0]) == 'first'
+assert rh.used_bins == 3000
+assert rh.load() <= 0.9
+assert rh.get_many(keys[1:]) == list(range(1, 3000))
+assert rh.get_many(['not a key', keys[1]]) == [None, 1]
+
+# Small batches go through the inline search and insert
+rh = RobinHash(8, max_load=0.75, min_load=0.2)
+for start in range(0, 3000, 100):
+    assert rh.set_many(items[start:start + 100]) == 100
+    _check_invariants(rh)
+    assert rh.get_many(keys[:start + 100]) == list(range(start + 100))
+assert rh.set_many((key, -value) for key, value in items[:10]) == 10
+assert rh.get_many(keys[:10]) == [-i for i in range(10)]
+
+# Deleting while a resize is in progress
+rh = RobinHash(8, max_load=0.75, min_load=0.2, rehash_step=1)
+for key, value in items:
+    rh.set(key, value)
+assert rh.old_table is not None
+assert rh.delete_many(keys[:2900] + ['not a key']) == list(range(2900)) + [None]
+assert rh.get_many(keys) == [None] * 2900 + list(range(2900, 3000))
+assert rh.num_bins < 1024
+assert rh.used_bins == 100
+
+# Batched deletes leave the same bins as deleting one key at a time, in
+#   full fixed size maps whose clusters wrap round the end
+# Batches of under an eighth of the map search for each key, larger ones
+#   go through the index and, past a quarter, pack the bins afresh
+for trial in range(400):
+    num_bins = random.randint(1, 60) if trial % 2 else random.randint(200, 400)
+    pairs = items[:random.randint(0, num_bins)]
+    max_doomed = len(pairs) if trial % 2 else len(pairs) // 10
+    doomed = random.sample(keys[:len(pairs)], random.randint(0, max_doomed))
+    doomed += ['not a key', doomed[0] if doomed else 'also not a key']
+    one_by_one = RobinHash(num_bins)
+    batched = RobinHash(num_bins)
+    for key, value in pairs:
+        one_by_one.set(key, value)
+        batched.set(key, value)
+    expected = [one_by_one.delete(key) for key in doomed]
+    assert batched.delete_many(doomed) == expected
+    _check_invariants(batched)
+    assert ([(e.key, e.bin_dist) if e else None for e in batched.bins] ==
+            [(e.key, e.bin_dist) if e else None for e in one_by_one.bins])
+    assert batched.used_bins == one_by_one.used_bins
+    assert batched.max_probe == one_by_one.max_probe
+
+# A fixed size map fills up
+rh = RobinHash(10)
+assert rh.set_many(items[:15]) == 10
+assert rh.load() == 1
+
+# Keys Python can't hash are searched for one at a time
+rh = RobinHash(16, hash_fn = len)
+rh.set_many([([i] * i, i) for i in range(10)])
+assert rh.get_many([[3] * 3, [1] * 4]) == [3, None]
+assert rh.delete_many([[i] * i for i in range(8)]) == list(range(8))
+assert rh.get_many([[8] * 8, [9] * 9]) == [8, 9]
+print ""
+
+print "Testing the mapping protocol"
+rh = RobinHash(8, max_load=0.75, min_load=0.2, rehash_step=1)
+d = {}
+for key, value in items[:1000]:
+    rh[key] = value
+    d[key] = value
+rh['none'] = None
+d['none'] = None
+assert rh.old_table is not None
+assert len(rh) == len(d)
+assert 'none' in rh and rh['none'] is None
+assert 'not a key' not in rh
+assert rh.get('not a key', -1) == -1
+try:
+    rh['not a key']
+    assert False
+except KeyError:
+    pass
+# Iterating finishes the resize first
+assert sorted(rh) == sorted(d)
+assert rh.old_table is None
+assert set(rh.keys()) == set(d)
+assert dict(rh.items()) == d
+assert list(rh.values()) == [rh[key] for key in rh]
+assert rh == d
+assert rh.pop('none') is None
+assert rh.pop('none', 'gone') == 'gone'
+for delete in (lambda key: rh.pop(key), rh.__delitem__):
+    try:
+        delete('none')
+        assert False
+    except KeyError:
+        pass
+del rh[keys[0]]
+assert keys[0] not in rh
+rh.update({'a': 1}, b=2)
+assert rh.setdefault('a', 3) == 1 and rh['b'] == 2
+_check_invariants(rh)
+
+# Overwriting values while iterating is fine, adding or deleting keys isn't
+for key, value in rh.items():
+    rh[key] = value
+for change in (lambda key: rh.__setitem__('new ' + key, 1),
+               lambda key: rh.__delitem__(key)):
+    try:
+        for key in rh:
+            change(key)
+        assert False
+    except RuntimeError:
+        pass
+
+rh.clear()
+assert len(rh) == 0 and list(rh) == [] and rh.get('a') == None
+
+# A fixed size map can't take another key
+rh = RobinHash(2)
+rh['a'] = 1
+rh['b'] = 2
+try:
+    rh['c'] = 3
+    assert False
+except OverflowError:
+    pass
+rh['a'] = 3
+assert dict(rh.items()) == {'a': 3, 'b': 2}
+print ""
+
+print "Testing instrumentation"
+# Integers hash to themselves, so 8, 18, 28 and 38 all want bin 8
+rh = RobinHash(10, instrument=True)
+for key in (8, 18, 28, 9, 38):
+    assert rh.set(key, key)
+# 38 took 9's bin, pushing 9 from bin 1 to bin 2
+assert rh.counters['swaps'] == 1
+assert rh.counters['sets'] == 5
+assert rh.counters['insert_probes'] == 1 + 2 + 3 + 3 + 5
+assert rh.get(38) == 38 and rh.get(5) == None
+assert rh.counters['gets'] == 2
+assert rh.counters['get_probes'] == 4 + 1
+assert rh.max_probe == 3
+assert rh.delete(8) == 8
+assert rh.counters['shifts'] == 4
+# Every entry moved one closer to home
+assert rh.max_probe == 2
+stats = rh.stats()
+assert stats['entries'] == 4
+assert stats['histogram'] == [1, 1, 2]
+assert stats['mean'] == 1.25
+assert stats['variance'] == 0.6875
+# The cluster wraps round from bin 8 to bin 1
+assert stats['largest_cluster'] == 4
+rh.reset_counters()
+assert sum(rh.counters.values()) == 0
+
+# Nothing is counted unless asked for
+rh = RobinHash(8, max_load=0.75, rehash_step=1)
+for key, value in items:
+    rh.set(key, value)
+rh.get_many(keys)
+assert sum(rh.counters.values()) == 0
+assert rh.stats()['entries'] == 3000
+
+rh = RobinHash(8, max_load=0.75, min_load=0.2, rehash_step=1,
+               instrument=True)
+for key, value in items:
+    rh.set(key, value)
+assert rh.old_table is not None
+assert rh.stats()['entries'] == rh.used_bins
+rh.get_many(keys[:10])
+rh.delete_many(keys[:10])
+assert rh.counters['gets'] == 10 and rh.counters['deletes'] == 10
+assert rh.counters['get_probes'] >= 10
+stats = rh.stats()
+print "Mean: {0:f} | Variance: {1:f} | Largest Cluster: {2:d}".format(
+                                                    stats['mean'],
+                                                    stats['variance'],
+                                                    stats['largest_cluster'])
+print ""
 
 print "All tests successful!"
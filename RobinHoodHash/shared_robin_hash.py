@@ -0,0 +1,698 @@
+"""
+shared_robin_hash.py
+
+This module contains a Robin Hood hash map that lives in shared memory, and a
+front end that shards keys across several of them, so that any number of
+worker processes can look keys up at once without going through one
+process's GIL or any IPC
+
+A SharedRobinHash is a fixed size map laid out in one named shared memory
+segment as an array of fixed width bins, each with room for a key of up to
+key_size encoded bytes and a value of up to value_size pickled bytes. The
+process that creates a map owns it and is the only one that can write to it;
+any other process attaches to it by name and reads the bins straight out of
+the segment. Keys are placed with robin_hash_functions.stable_hash, since
+Python's hash differs from one process to the next, so like snapshot keys
+they must be bytes, text or integers
+
+Readers take no locks. The owner makes the sequence number in the header odd
+while it changes the bins and even again when it's done, and a reader retries
+any lookup that saw it odd or changed, so it never returns a pair that was
+half written or shifted out from under it
+
+A ShardedRobinHash splits keys between num_shards such maps by their stable
+hash. Each shard has its own sequence number, so a write only makes readers
+of that one shard retry. The process that creates it owns every shard; worker
+processes attach with ShardedRobinHash(names = owner.names) and send their
+writes to the owner, e.g. over a multiprocessing queue
+
+Shared memory layout (all integers little endian):
+    header (HEADER_SIZE bytes):
+        magic (8 bytes): MAGIC
+        version (uint32): VERSION
+        reserved (uint32)
+        num_bins (uint64): number of bins
+        key_size (uint64): max length of an encoded key
+        value_size (uint64): max length of a pickled value
+        used_bins (uint64): number of key: value pairs
+        max_probe (uint64): max extra probing distance used by any entry
+        sequence (uint64): number of writes started, odd during a write
+    bins (num_bins * bin_size bytes), one per bin:
+        hash (uint64): stable hash of the key
+        dist (int64): probe distance, -1 for empty bins
+        key_len (uint32), value_len (uint32)
+        key (key_size bytes), value (value_size bytes)
+
+Segments come from multiprocessing.shared_memory where it exists (Python 3.8
+and later), and otherwise from a file in /dev/shm mapped by every process
+"""
+
+import binascii
+import mmap
+import os
+import pickle
+import struct
+import tempfile
+
+try:
+    from multiprocessing.shared_memory import SharedMemory
+except ImportError:
+    SharedMemory = None
+
+from robin_hash_functions import encode_key, stable_hash
+
+# Python 2's range builds a whole list, which the probing loops can't afford
+try:
+    range = xrange
+except NameError:
+    pass
+
+MAGIC = b'ROBINSHM'
+VERSION = 1
+
+HEADER = struct.Struct('<8sIIQQQQQQ')
+HEADER_SIZE = HEADER.size
+# used_bins and max_probe, rewritten after every write
+COUNTS = struct.Struct('<QQ')
+COUNTS_OFFSET = 40
+SEQUENCE = struct.Struct('<Q')
+SEQUENCE_OFFSET = 56
+BIN = struct.Struct('<QqII')
+DIST = struct.Struct('<q')
+
+# Probe distance of an empty bin
+EMPTY = -1
+
+class _FileSegment():
+    """
+    shared_robin_hash._FileSegment
+
+    Named shared memory for Pythons without multiprocessing.shared_memory,
+        a file in /dev/shm (or the temp directory) mapped by every process
+    Has the name, buf, close and unlink of a SharedMemory
+    """
+
+    def __init__(self, name = None, create = False, size = 0):
+        if os.path.isdir('/dev/shm'):
+            directory = '/dev/shm'
+        else:
+            directory = tempfile.gettempdir()
+        if name is None:
+            name = 'robin_' + binascii.hexlify(os.urandom(8)).decode('ascii')
+        self.name = name
+        self.path = os.path.join(directory, name)
+        if create:
+            fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_RDWR, 0o600)
+            os.ftruncate(fd, size)
+        else:
+            fd = os.open(self.path, os.O_RDWR)
+        try:
+            self.buf = mmap.mmap(fd, 0)
+        finally:
+            os.close(fd)
+
+    def close(self):
+        self.buf.close()
+
+    def unlink(self):
+        os.unlink(self.path)
+
+def _open_segment(name, create, size):
+    if SharedMemory is not None:
+        return SharedMemory(name, create, size)
+    return _FileSegment(name, create, size)
+
+class SharedRobinHash():
+    """
+    shared_robin_hash.SharedRobinHash
+
+    Fixed size HashMap in a named shared memory segment
+    Has the same get/set/delete/load interface as robin_hash.RobinHash, but
+        only the process that created the map can set and delete
+    """
+
+    def __init__(self, size = 128, key_size = 32, value_size = 64,
+                 name = None, create = True):
+        """
+        CONSTRUCTOR
+
+        Parameters:
+            size: size of the hash map
+            key_size (int): max length of a key encoded by encode_key
+            value_size (int): max length of a pickled value
+            name (string):
+                name of the shared memory segment
+                None (default) picks an unused name when creating the map
+            create (bool):
+                True (default) creates a new, empty map owned by this process
+                False attaches to the existing map called name, read-only;
+                    size, key_size and value_size are read from its header
+        Variables:
+            segment (SharedMemory): the shared memory holding the map
+            buffer (buffer): the segment's memory
+            name (string): name other processes attach to the map by
+            num_bins (int): number of bins in the hash table/hash map size
+            key_size (int): max length of an encoded key
+            value_size (int): max length of a pickled value
+            bin_size (int): bytes taken by each bin
+            owner (bool):
+                whether this process created, and so can write to, the map
+            dist_counts (list):
+                number of entries at each probe distance, from 0 to max_probe
+                Only kept by the owner, None elsewhere
+        Raises:
+            ValueError: if the segment doesn't hold a SharedRobinHash
+        """
+        if create:
+            if size < 1:
+                raise ValueError("size must be at least 1")
+            bin_size = BIN.size + key_size + value_size
+            self.segment = _open_segment(name, True,
+                                         HEADER_SIZE + size * bin_size)
+            self.buffer = self.segment.buf
+            HEADER.pack_into(self.buffer, 0, MAGIC, VERSION, 0, size,
+                             key_size, value_size, 0, 0, 0)
+            empty_bin = BIN.pack(0, EMPTY, 0, 0) + b'\0' * (bin_size -
+                                                            BIN.size)
+            # Segments can be rounded up to a whole number of pages
+            self.buffer[HEADER_SIZE:HEADER_SIZE + size * bin_size] = \
+                empty_bin * size
+            self.dist_counts = [0]
+        else:
+            self.segment = _open_segment(name, False, 0)
+            self.buffer = self.segment.buf
+            (magic, version, _, size, key_size, value_size, _, _,
+             _) = HEADER.unpack_from(self.buffer)
+            if magic != MAGIC or version != VERSION:
+                self.close()
+                raise ValueError("{0} is not a version {1} SharedRobinHash"
+                                 .format(name, VERSION))
+            self.dist_counts = None
+        self.name = self.segment.name
+        self.num_bins = size
+        self.key_size = key_size
+        self.value_size = value_size
+        self.bin_size = BIN.size + key_size + value_size
+        self.owner = create
+
+    @property
+    def used_bins(self):
+        return COUNTS.unpack_from(self.buffer, COUNTS_OFFSET)[0]
+
+    @property
+    def max_probe(self):
+        return COUNTS.unpack_from(self.buffer, COUNTS_OFFSET)[1]
+
+    def get(self, key, default = None):
+        """
+        SharedRobinHash.get
+
+        Gets the value associated with a key in the hash map
+        Never blocks, but retries if the owner changed the map during the
+            lookup
+
+        Parameters:
+            key (bytes, text or int): the key to be searched for in the map
+            default (AnyType): value returned for keys not in the map
+        Returns:
+            (AnyType)
+                Value associated with the key if it is in the map
+                default (None) otherwise
+        """
+
+        key_bytes = encode_key(key)
+        return self._get(key_bytes, stable_hash(key_bytes), default)
+
+    def set(self, key, value):
+        """
+        SharedRobinHash.set
+        Inserts a key: value pair into the hash map, or overrides the value
+            of a key already in it
+
+        Parameters:
+            key (bytes, text or int): the key of the pair to be inserted
+            value (AnyType): the value of the pair to be inserted
+        Returns:
+            (Bool)
+                True if the pair was successfully set
+                False otherwise
+                    This should only occur if the hash map is full
+        Raises:
+            TypeError: if this process isn't the owner of the map
+            ValueError: if the key or pickled value is too long for a bin
+        """
+
+        key_bytes = encode_key(key)
+        return self._set(key_bytes, stable_hash(key_bytes), value)
+
+    def delete(self, key):
+        """
+        SharedRobinHash.delete
+        Deletes a key: value pair from the hash map
+
+        Parameters:
+            key (bytes, text or int): key of the pair to be deleted
+        Returns:
+            (AnyType)
+                value of the deleted pair
+                None if the key was not in the map
+        Raises:
+            TypeError: if this process isn't the owner of the map
+        """
+
+        key_bytes = encode_key(key)
+        return self._delete(key_bytes, stable_hash(key_bytes))
+
+    def load(self):
+        """
+        SharedRobinHash.load
+        Returns the load factor of the hash map
+
+        Returns:
+            (float) used_bins / num_bins
+        """
+
+        return float(self.used_bins) / self.num_bins
+
+    def close(self):
+        """
+        SharedRobinHash.close
+        Unmaps the shared memory from this process, the map can't be used
+            after this
+        The segment itself stays until the owner unlinks it
+        """
+
+        self.buffer = None
+        self.segment.close()
+
+    def unlink(self):
+        """
+        SharedRobinHash.unlink
+        Frees the shared memory segment once every process has closed it
+        Processes can no longer attach to the map after this
+        """
+
+        self.segment.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        if self.owner:
+            self.unlink()
+
+    # Versions of get, set and delete for a key that's already been encoded
+    #   and hashed, so ShardedRobinHash doesn't have to do it twice
+
+    def _get(self, key_bytes, hash_value, default = None):
+        buf = self.buffer
+        if self.owner:
+            # Nothing else writes to the map, so there's nothing to retry
+            value = self.__probe(key_bytes, hash_value, self.max_probe)
+        else:
+            while True:
+                sequence = SEQUENCE.unpack_from(buf, SEQUENCE_OFFSET)[0]
+                if sequence & 1:
+                    continue
+                value = self.__probe(key_bytes, hash_value, self.max_probe)
+                if SEQUENCE.unpack_from(buf, SEQUENCE_OFFSET)[0] == sequence:
+                    break
+        if value is None:
+            return default
+        return pickle.loads(value)
+
+    def _set(self, key_bytes, hash_value, value):
+        if not self.owner:
+            raise TypeError("only the process that created a "
+                            "SharedRobinHash can write to it")
+        value_bytes = pickle.dumps(value, 2)
+        if len(key_bytes) > self.key_size:
+            raise ValueError("encoded key is longer than key_size")
+        if len(value_bytes) > self.value_size:
+            raise ValueError("pickled value is longer than value_size")
+
+        offset = self.__find(key_bytes, hash_value)
+        if offset is None and self.used_bins == self.num_bins:
+            return False
+        self.__begin_write()
+        try:
+            if offset is not None:
+                value_offset = offset + BIN.size + self.key_size
+                struct.pack_into('<I', self.buffer, offset + 20,
+                                 len(value_bytes))
+                self.buffer[value_offset:value_offset +
+                            len(value_bytes)] = value_bytes
+            else:
+                self.__insert(hash_value, key_bytes, value_bytes)
+        finally:
+            self.__end_write()
+        return True
+
+    def _delete(self, key_bytes, hash_value):
+        if not self.owner:
+            raise TypeError("only the process that created a "
+                            "SharedRobinHash can write to it")
+        offset = self.__find(key_bytes, hash_value)
+        if offset is None:
+            return None
+        value = pickle.loads(self.__value(offset))
+        self.__begin_write()
+        try:
+            self.__remove((offset - HEADER_SIZE) // self.bin_size)
+        finally:
+            self.__end_write()
+        return value
+
+    def __probe(self, key_bytes, hash_value, max_probe):
+        """
+        SharedRobinHash.__probe
+        Internal function to search the bins for a key
+
+        A reader can see the bins mid write, so every length read from
+            them is bounded before it's used, and the caller throws the
+            result away if the sequence number changed
+
+        Parameters:
+            key_bytes (bytes): encoded key
+            hash_value (int): stable hash of the encoded key
+            max_probe (int): max_probe read from the header
+        Returns:
+            (bytes) the pickled value, None if the key is not in the map
+        """
+
+        buf = self.buffer
+        num_bins = self.num_bins
+        bin_size = self.bin_size
+        key_len = len(key_bytes)
+        curr_idx = hash_value % num_bins
+        for probe_dist in range(min(max_probe, num_bins - 1) + 1):
+            offset = HEADER_SIZE + curr_idx * bin_size
+            bin_hash, bin_dist, bin_key_len, value_len = BIN.unpack_from(
+                buf, offset)
+            # An empty bin, or one closer to home than this key would be,
+            #   ends the search
+            if bin_dist < probe_dist:
+                return None
+            if bin_hash == hash_value and bin_key_len == key_len:
+                key_offset = offset + BIN.size
+                if buf[key_offset:key_offset + key_len] == key_bytes:
+                    value_offset = key_offset + self.key_size
+                    return bytes(buf[value_offset:value_offset +
+                                     min(value_len, self.value_size)])
+            curr_idx += 1
+            if curr_idx == num_bins:
+                curr_idx = 0
+        return None
+
+    def __find(self, key_bytes, hash_value):
+        """
+        SharedRobinHash.__find
+        Internal function for the owner to find the bin holding a key
+
+        Returns:
+            (int) offset of the key's bin, None if the key is not in the map
+        """
+
+        buf = self.buffer
+        num_bins = self.num_bins
+        bin_size = self.bin_size
+        key_len = len(key_bytes)
+        curr_idx = hash_value % num_bins
+        for probe_dist in range(len(self.dist_counts)):
+            offset = HEADER_SIZE + curr_idx * bin_size
+            bin_hash, bin_dist, bin_key_len, _ = BIN.unpack_from(buf, offset)
+            if bin_dist < probe_dist:
+                return None
+            if (bin_hash == hash_value and bin_key_len == key_len and
+                    buf[offset + BIN.size:offset + BIN.size + key_len] ==
+                    key_bytes):
+                return offset
+            curr_idx = (curr_idx + 1) % num_bins
+        return None
+
+    def __value(self, offset):
+        value_len = BIN.unpack_from(self.buffer, offset)[3]
+        value_offset = offset + BIN.size + self.key_size
+        return bytes(self.buffer[value_offset:value_offset + value_len])
+
+    def __insert(self, hash_value, key_bytes, value_bytes):
+        """
+        SharedRobinHash.__insert
+        Internal function to place a key that isn't in the map yet, swapping
+            with any entry closer to its ideal bin on the way
+
+        Parameters:
+            hash_value (int): stable hash of the encoded key
+            key_bytes (bytes): encoded key
+            value_bytes (bytes): pickled value
+        """
+
+        buf = self.buffer
+        num_bins = self.num_bins
+        bin_size = self.bin_size
+        key_size = self.key_size
+        dist_counts = self.dist_counts
+        curr_idx = hash_value % num_bins
+        probe_dist = 0
+        while True:
+            offset = HEADER_SIZE + curr_idx * bin_size
+            bin_hash, bin_dist, key_len, value_len = BIN.unpack_from(buf,
+                                                                     offset)
+            if bin_dist == EMPTY or bin_dist < probe_dist:
+                if probe_dist >= len(dist_counts):
+                    dist_counts.extend([0] * (probe_dist - len(dist_counts) +
+                                              1))
+                dist_counts[probe_dist] += 1
+                if bin_dist != EMPTY:
+                    # Keep the displaced entry before overwriting its bin
+                    displaced = (bin_hash, bytes(buf[offset + BIN.size:offset +
+                                                     BIN.size + key_len]),
+                                 self.__value(offset))
+                    dist_counts[bin_dist] -= 1
+
+                BIN.pack_into(buf, offset, hash_value, probe_dist,
+                              len(key_bytes), len(value_bytes))
+                key_offset = offset + BIN.size
+                buf[key_offset:key_offset + len(key_bytes)] = key_bytes
+                buf[key_offset + key_size:key_offset + key_size +
+                    len(value_bytes)] = value_bytes
+
+                if bin_dist == EMPTY:
+                    return
+                hash_value, key_bytes, value_bytes = displaced
+                probe_dist = bin_dist
+            probe_dist += 1
+            curr_idx += 1
+            if curr_idx == num_bins:
+                curr_idx = 0
+
+    def __remove(self, idx):
+        """
+        SharedRobinHash.__remove
+        Internal function to empty a bin, shifting the rest of its cluster
+            back one bin
+
+        Parameters:
+            idx (int): index of the bin to empty
+        """
+
+        buf = self.buffer
+        num_bins = self.num_bins
+        bin_size = self.bin_size
+        dist_counts = self.dist_counts
+        offset = HEADER_SIZE + idx * bin_size
+        dist_counts[DIST.unpack_from(buf, offset + 8)[0]] -= 1
+        while True:
+            idx = (idx + 1) % num_bins
+            next_offset = HEADER_SIZE + idx * bin_size
+            next_dist = DIST.unpack_from(buf, next_offset + 8)[0]
+            if next_dist <= 0:
+                break
+            buf[offset:offset + bin_size] = buf[next_offset:next_offset +
+                                                bin_size]
+            DIST.pack_into(buf, offset + 8, next_dist - 1)
+            dist_counts[next_dist] -= 1
+            dist_counts[next_dist - 1] += 1
+            offset = next_offset
+        DIST.pack_into(buf, offset + 8, EMPTY)
+
+        while len(dist_counts) > 1 and not dist_counts[-1]:
+            dist_counts.pop()
+
+    def __begin_write(self):
+        sequence = SEQUENCE.unpack_from(self.buffer, SEQUENCE_OFFSET)[0]
+        SEQUENCE.pack_into(self.buffer, SEQUENCE_OFFSET, sequence + 1)
+
+    def __end_write(self):
+        # Every entry is counted at its probe distance, so the counts give
+        #   both used_bins and max_probe
+        COUNTS.pack_into(self.buffer, COUNTS_OFFSET, sum(self.dist_counts),
+                         len(self.dist_counts) - 1)
+        sequence = SEQUENCE.unpack_from(self.buffer, SEQUENCE_OFFSET)[0]
+        SEQUENCE.pack_into(self.buffer, SEQUENCE_OFFSET, sequence + 1)
+
+class ShardedRobinHash():
+    """
+    shared_robin_hash.ShardedRobinHash
+
+    HashMap split by key hash across several SharedRobinHash shards
+    Has the same get/set/delete/load interface as robin_hash.RobinHash, but
+        only the process that created the map can set and delete
+    """
+
+    def __init__(self, num_shards = 4, shard_size = 1024, key_size = 32,
+                 value_size = 64, names = None):
+        """
+        CONSTRUCTOR
+
+        Parameters:
+            num_shards (int): number of shards to split the keys between
+            shard_size (int): size of each shard
+            key_size (int): max length of a key encoded by encode_key
+            value_size (int): max length of a pickled value
+            names (list):
+                None (default) creates new, empty shards owned by this process
+                Otherwise the names of the shards of an existing map to
+                    attach to, read-only, as in owner.names
+        Variables:
+            shards (list): SharedRobinHash holding each share of the keys
+            names (list): names other processes attach to the shards by
+            num_shards (int): number of shards
+            owner (bool):
+                whether this process created, and so can write to, the map
+        """
+        if names is None:
+            if num_shards < 1:
+                raise ValueError("num_shards must be at least 1")
+            self.shards = []
+            try:
+                for _ in range(num_shards):
+                    self.shards.append(SharedRobinHash(shard_size, key_size,
+                                                       value_size))
+            except Exception:
+                for shard in self.shards:
+                    shard.close()
+                    shard.unlink()
+                raise
+            self.owner = True
+        else:
+            self.shards = [SharedRobinHash(name = name, create = False)
+                           for name in names]
+            self.owner = False
+        self.names = [shard.name for shard in self.shards]
+        self.num_shards = len(self.shards)
+
+    def __shard(self, key):
+        """
+        ShardedRobinHash.__shard
+        Internal function to pick the shard of a key
+
+        The shard is chosen by the hash modulo num_shards and the bin by
+            what's left of the hash, so the keys of a shard don't all share
+            the same remainder inside it
+
+        Returns:
+            (tuple) shard, encoded key and hash within the shard
+        """
+        key_bytes = encode_key(key)
+        hash_value, shard_idx = divmod(stable_hash(key_bytes),
+                                       self.num_shards)
+        return self.shards[shard_idx], key_bytes, hash_value
+
+    def get(self, key, default = None):
+        """
+        ShardedRobinHash.get
+
+        Gets the value associated with a key in the hash map
+        Never blocks, but retries if the owner changed the key's shard during
+            the lookup
+
+        Parameters:
+            key (bytes, text or int): the key to be searched for in the map
+            default (AnyType): value returned for keys not in the map
+        Returns:
+            (AnyType)
+                Value associated with the key if it is in the map
+                default (None) otherwise
+        """
+
+        shard, key_bytes, hash_value = self.__shard(key)
+        return shard._get(key_bytes, hash_value, default)
+
+    def set(self, key, value):
+        """
+        ShardedRobinHash.set
+        Inserts a key: value pair into the hash map, or overrides the value
+            of a key already in it
+
+        Parameters:
+            key (bytes, text or int): the key of the pair to be inserted
+            value (AnyType): the value of the pair to be inserted
+        Returns:
+            (Bool)
+                True if the pair was successfully set
+                False if the key's shard is full
+        Raises:
+            TypeError: if this process isn't the owner of the map
+            ValueError: if the key or pickled value is too long for a bin
+        """
+
+        shard, key_bytes, hash_value = self.__shard(key)
+        return shard._set(key_bytes, hash_value, value)
+
+    def delete(self, key):
+        """
+        ShardedRobinHash.delete
+        Deletes a key: value pair from the hash map
+
+        Parameters:
+            key (bytes, text or int): key of the pair to be deleted
+        Returns:
+            (AnyType)
+                value of the deleted pair
+                None if the key was not in the map
+        Raises:
+            TypeError: if this process isn't the owner of the map
+        """
+
+        shard, key_bytes, hash_value = self.__shard(key)
+        return shard._delete(key_bytes, hash_value)
+
+    def load(self):
+        """
+        ShardedRobinHash.load
+        Returns the load factor of the hash map
+
+        Returns:
+            (float) pairs in every shard / bins in every shard
+        """
+
+        return (float(sum(shard.used_bins for shard in self.shards)) /
+                sum(shard.num_bins for shard in self.shards))
+
+    def close(self):
+        """
+        ShardedRobinHash.close
+        Unmaps every shard from this process
+        """
+
+        for shard in self.shards:
+            shard.close()
+
+    def unlink(self):
+        """
+        ShardedRobinHash.unlink
+        Frees the shards' shared memory once every process has closed it
+        """
+
+        for shard in self.shards:
+            shard.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        if self.owner:
+            self.unlink()
@@ -0,0 +1,202 @@
+"""
+shared_robin_hash_test.py
+
+This program tests that a SharedRobinHash agrees with a dict, that other
+processes can read it by name while its owner writes to it, and that a
+ShardedRobinHash spreads its keys over shards that other processes can read
+"""
+
+from shared_robin_hash import (BIN, HEADER_SIZE, EMPTY, SharedRobinHash,
+                               ShardedRobinHash)
+import multiprocessing
+import random
+import string
+
+def _get_random_string():
+    valid_chars = string.ascii_letters + string.digits
+    r_str = ""
+    length = random.randint(1, 20)
+    for i in range(length):
+        r_str += random.choice(valid_chars)
+    return r_str
+
+# Check that every entry's dist matches its position, and that the header's
+#   used_bins and max_probe are exact
+def _check_invariants(rh):
+    used = 0
+    dist_counts = [0] * (rh.max_probe + 1)
+    for idx in range(rh.num_bins):
+        hash_value, dist, _, _ = BIN.unpack_from(rh.buffer,
+                                                 HEADER_SIZE +
+                                                 idx * rh.bin_size)
+        if dist == EMPTY:
+            continue
+        used += 1
+        assert (hash_value % rh.num_bins + dist) % rh.num_bins == idx
+        dist_counts[dist] += 1
+    assert used == rh.used_bins
+    assert dist_counts == rh.dist_counts
+    assert rh.max_probe == 0 or dist_counts[-1] > 0
+
+def _reader(name, stable, churn, done, errors):
+    rh = SharedRobinHash(name = name, create = False)
+    try:
+        reads = 0
+        while not done.is_set() or reads < 1000:
+            key = random.choice(churn)
+            value = rh.get(key)
+            assert value is None or value[0] == key, value
+            # Keys the owner never touches must always be found
+            key = random.choice(stable)
+            assert rh.get(key) == (key, 0)
+            reads += 1
+    except Exception as e:
+        errors.put(repr(e))
+    finally:
+        rh.close()
+
+def _sharded_reader(names, keys, results):
+    with ShardedRobinHash(names = names) as sharded:
+        results.put([sharded.get(key) for key in keys])
+
+print "Initializing Hash Map"
+rh = SharedRobinHash(10, key_size = 16, value_size = 32)
+
+print "Setting, overriding and deleting"
+assert rh.set('one', 1) == True
+assert rh.get('one') == 1
+assert rh.set('one', 'uno') == True
+assert rh.get('one') == 'uno'
+assert rh.load() == 0.1
+assert rh.delete('one') == 'uno'
+assert rh.get('one') == None
+assert rh.get('one', 1) == 1
+assert rh.delete('one') == None
+
+print "Filling map"
+for i in range(10):
+    assert rh.set(i, str(i)) == True
+assert rh.set(10, '10') == False
+assert rh.set(9, 'nine') == True
+_check_invariants(rh)
+assert rh.get(u'9') == None
+
+print "Rejecting keys and values too long for a bin"
+for key, value in (('k' * 16, 1), ('k', 'v' * 32)):
+    try:
+        rh.set(key, value)
+        assert False
+    except ValueError:
+        pass
+
+print "Attaching from this process"
+attached = SharedRobinHash(name = rh.name, create = False)
+assert attached.num_bins == 10 and attached.used_bins == 10
+assert attached.get(9) == 'nine'
+for write in (lambda: attached.set(1, 1), lambda: attached.delete(1)):
+    try:
+        write()
+        assert False
+    except TypeError:
+        pass
+attached.close()
+for i in range(10):
+    assert rh.delete(i) is not None
+    _check_invariants(rh)
+assert rh.max_probe == 0
+rh.close()
+rh.unlink()
+
+print "\nRunning randomized experiments\n"
+NUM_EXPERIMENTS = 10
+for j in range(NUM_EXPERIMENTS):
+    size = random.randint(1, 300)
+    rh = SharedRobinHash(size, key_size = 32, value_size = 48)
+    pairs = {}
+    keys = [_get_random_string() for _ in range(size + 20)]
+    for i in range(3000):
+        key = random.choice(keys)
+        if random.random() < 0.6:
+            result = rh.set(key, (key, i))
+            assert result == (key in pairs or len(pairs) < size)
+            if result:
+                pairs[key] = (key, i)
+        else:
+            assert rh.delete(key) == pairs.pop(key, None)
+    _check_invariants(rh)
+    for key in keys:
+        assert rh.get(key) == pairs.get(key)
+
+    print "{0:03d}/{1:d} | Max Probe: {2:03d} | Load Factor: {3:f}".format(
+                                                            j + 1,
+                                                            NUM_EXPERIMENTS,
+                                                            rh.max_probe,
+                                                            rh.load())
+    rh.close()
+    rh.unlink()
+
+print "\nReading from other processes while the owner writes\n"
+NUM_READERS = 3
+rh = SharedRobinHash(600, key_size = 32, value_size = 48)
+stable = [_get_random_string() + 's' + str(i) for i in range(300)]
+churn = [_get_random_string() + 'c' + str(i) for i in range(300)]
+for key in stable:
+    assert rh.set(key, (key, 0))
+done = multiprocessing.Event()
+errors = multiprocessing.Queue()
+readers = [multiprocessing.Process(target = _reader,
+                                   args = (rh.name, stable, churn, done,
+                                           errors))
+           for _ in range(NUM_READERS)]
+for p in readers:
+    p.start()
+pairs = {}
+for i in range(50000):
+    key = random.choice(churn)
+    if random.random() < 0.6:
+        assert rh.set(key, (key, i))
+        pairs[key] = (key, i)
+    else:
+        assert rh.delete(key) == pairs.pop(key, None)
+done.set()
+for p in readers:
+    p.join()
+    assert p.exitcode == 0
+assert errors.empty(), errors.get()
+_check_invariants(rh)
+for key in churn:
+    assert rh.get(key) == pairs.get(key)
+rh.close()
+rh.unlink()
+
+print "Sharding keys"
+with ShardedRobinHash(num_shards = 4, shard_size = 300, key_size = 32,
+                      value_size = 48) as sharded:
+    assert sharded.owner and len(sharded.names) == 4
+    keys = [_get_random_string() + str(i) for i in range(800)]
+    for i, key in enumerate(keys):
+        assert sharded.set(key, i) == True
+    assert sharded.load() == 800 / 1200.0
+    # The shards of a ShardedRobinHash share out the keys evenly, and a key's
+    #   bin only uses what's left of its hash after picking the shard
+    for shard in sharded.shards:
+        assert 100 < shard.used_bins < 300
+        _check_invariants(shard)
+    for key in keys[::2]:
+        assert sharded.delete(key) is not None
+    results = multiprocessing.Queue()
+    p = multiprocessing.Process(target = _sharded_reader,
+                                args = (sharded.names, keys, results))
+    p.start()
+    values = results.get()
+    p.join()
+    assert values == [None if i % 2 == 0 else i for i in range(len(keys))]
+    attached = ShardedRobinHash(names = sharded.names)
+    try:
+        attached.set(keys[0], 0)
+        assert False
+    except TypeError:
+        pass
+    attached.close()
+
+print "All tests successful!"
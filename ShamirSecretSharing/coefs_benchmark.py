@@ -0,0 +1,60 @@
+"""
+Times drawing random polynomial coefficients, in coefficients per second:
+the old random.sample(xrange(p), t - 1) per polynomial, get_random_coefs per
+polynomial, and get_random_coefs_batch for a whole batch at once, which
+reads os.urandom once and rejects values not below p
+random.sample can't take a p that doesn't fit in a C long, so it's only run
+for the smaller fields
+
+Usage:
+    python coefs_benchmark.py [--polynomials N] [--t T] [--repeat R]
+"""
+
+from __future__ import division, print_function
+import argparse
+import random
+import timeit
+
+from polynomials import get_random_coefs, get_random_coefs_batch
+
+FIELDS = [("13-bit", 2**13 - 1), ("31-bit", 2**31 - 1),
+          ("61-bit", 2**61 - 1), ("2^62 + 135", 2**62 + 135),
+          ("127-bit", 2**127 - 1), ("521-bit", 2**521 - 1),
+          ("1279-bit", 2**1279 - 1)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--polynomials', type=int, default=100000,
+                        help='number of polynomials drawn per run')
+    parser.add_argument('--t', type=int, default=5,
+                        help='threshold, so t - 1 coefficients per polynomial')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='number of runs to take the best of')
+    args = parser.parse_args()
+
+    count = args.polynomials * (args.t - 1)
+    def rate(func):
+        return count / min(timeit.repeat(func, number=1, repeat=args.repeat))
+
+    print("{0:d} polynomials of {1:d} random coefficients".format(
+        args.polynomials, args.t - 1))
+    print("{0:>12}{1:>20}{2:>22}{3:>28}".format(
+        "field", "random.sample /s", "get_random_coefs /s",
+        "get_random_coefs_batch /s"))
+    for name, p in FIELDS:
+        if p < 2**63:
+            sample = "{0:.0f}".format(rate(
+                lambda: [random.sample(xrange(p), args.t - 1)
+                         for _ in range(args.polynomials)]))
+        else:
+            sample = "-"
+        single = rate(lambda: [get_random_coefs(args.t, p)
+                               for _ in range(args.polynomials)])
+        batch = rate(lambda: get_random_coefs_batch(args.polynomials, args.t,
+                                                    p))
+        print("{0:>12}{1:>20}{2:>22.0f}{3:>28.0f}".format(name, sample,
+                                                          single, batch))
+
+
+if __name__ == '__main__':
+    main()
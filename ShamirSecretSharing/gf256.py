@@ -0,0 +1,156 @@
+from prime import GF256
+import numpy as np
+import os
+
+# GF(2^8) with the AES polynomial x^8 + x^4 + x^3 + x + 1, generated by 3
+# EXP is doubled in length so that EXP[LOG[a] + LOG[b]] needs no reduction
+EXP = np.zeros(510, dtype=np.uint8)
+LOG = np.zeros(256, dtype=np.int64)
+_a = 1
+for _i in range(255):
+    EXP[_i] = _a
+    LOG[_a] = _i
+    _a ^= (_a << 1) ^ (0x11b if _a & 0x80 else 0)
+EXP[255:] = EXP[:255]
+
+# MUL[a] is the table of a * b for every byte b, so that multiplying a whole
+# array by a is one lookup
+MUL = EXP[LOG.reshape(256, 1) + LOG.reshape(1, 256)]
+MUL[0, :] = 0
+MUL[:, 0] = 0
+
+# Byte pairs worked on at a time, so that arrays stay in cache
+BLOCK_PAIRS = 32768
+
+_wide_tables = {}
+
+"""
+Gets the table of a * b for every pair of bytes b, each byte multiplied
+separately, as an array of 65536 uint16
+Multiplying byte arrays viewed as uint16 by a with one of these is a third
+of the time of looking up each byte in MUL[a]. Each table is 128 KB and is
+kept once made
+Parameters:
+    a: integer in [0, 256)
+Returns:
+    table: uint16 array, table[b] is the product of a and the pair b
+"""
+
+def wide_table(a):
+    table = _wide_tables.get(a)
+    if table is None:
+        pairs = np.arange(65536)
+        table = (MUL[a][pairs >> 8].astype(np.uint16) << 8 |
+                 MUL[a][pairs & 255])
+        _wide_tables[a] = table
+    return table
+
+"""
+Multiplies two elements of GF(2^8)
+Parameters:
+    a, b: integers in [0, 256)
+Returns:
+    product: a * b in GF(2^8)
+"""
+
+def gf_mul(a, b):
+    return int(MUL[a, b])
+
+"""
+Inverts a nonzero element of GF(2^8)
+Parameters:
+    a: integer in [1, 256)
+Returns:
+    inverse: the b with gf_mul(a, b) == 1
+"""
+
+def gf_inverse(a):
+    if a == 0:
+        raise ValueError("0 has no inverse")
+    return int(EXP[255 - LOG[a]])
+
+"""
+Shares a byte string in a t-out-of-n shamir sharing scheme over GF(2^8)
+Every byte is the constant term of its own random polynomial of degree t-1,
+with coefficients that are uniform random bytes straight from os.urandom.
+The polynomials are evaluated with Horner's rule on arrays of byte pairs,
+BLOCK_PAIRS at a time, with the tables of wide_table
+Parameters:
+    message: The byte string to be shared
+    t:       The threshold of reconstruction
+    n:       The number of shares to produce, at most 255
+Returns:
+    shares: list of tuples (x, s) where
+        x is the x value of the share, from 1 to n
+        s is a byte string as long as the message
+"""
+
+def share_bytes(message, t, n):
+    if not 1 <= t <= n <= 255:
+        raise ValueError("need 1 <= t <= n <= 255")
+    message = bytes(message)
+    pairs = np.frombuffer(message + b'\0' * (len(message) % 2),
+                          dtype=np.uint16)
+    tables = [wide_table(x) for x in range(1, n + 1)]
+    outputs = [np.empty_like(pairs) for _ in range(n)]
+    for start in range(0, len(pairs), BLOCK_PAIRS):
+        m = pairs[start:start + BLOCK_PAIRS]
+        coefs = np.frombuffer(os.urandom(2 * (t - 1) * len(m)),
+                              dtype=np.uint16).reshape(t - 1, len(m))
+        for table, output in zip(tables, outputs):
+            y = output[start:start + len(m)]
+            if t == 1:
+                y[:] = m
+                continue
+            y[:] = coefs[t - 2]
+            for j in range(t - 3, -1, -1):
+                np.bitwise_xor(table.take(y), coefs[j], out=y)
+            np.bitwise_xor(table.take(y), m, out=y)
+    return [(x, output.tobytes()[:len(message)])
+            for x, output in enumerate(outputs, 1)]
+
+"""
+Computes the Lagrange basis polynomials of the x values at zero in GF(2^8)
+Subtraction is xor, so the weight of x_i is the product over j != i of
+x_j / (x_j ^ x_i)
+Parameters:
+    x: list of distinct x values in [1, 256)
+Returns:
+    weights: list of weights, one per x value
+"""
+
+def gf_lagrange_weights(x):
+    if len(set(x)) != len(x) or not all(0 < x_i < 256 for x_i in x):
+        raise ValueError("share x values must be distinct and in [1, 256)")
+    weights = []
+    for x_i in x:
+        w = 1
+        for x_j in x:
+            if x_j != x_i:
+                w = gf_mul(w, gf_mul(x_j, gf_inverse(x_j ^ x_i)))
+        weights.append(w)
+    return weights
+
+"""
+Reconstructs a byte string shared with share_bytes
+Parameters:
+    shares: list of at least t shares (x, s) as produced by share_bytes
+Returns:
+    message: the byte string
+"""
+
+def reconstruct_bytes(shares):
+    x, y = zip(*shares)
+    length = len(y[0])
+    if any(len(y_i) != length for y_i in y):
+        raise ValueError("shares must all be the same length")
+    weights = gf_lagrange_weights([int(x_i) for x_i in x])
+    tables = [wide_table(w) for w in weights]
+    pairs = [np.frombuffer(bytes(y_i) + b'\0' * (length % 2), dtype=np.uint16)
+             for y_i in y]
+    message = np.zeros((length + 1) // 2, dtype=np.uint16)
+    for start in range(0, len(message), BLOCK_PAIRS):
+        m = message[start:start + BLOCK_PAIRS]
+        for table, y_i in zip(tables, pairs):
+            m ^= table.take(y_i[start:start + BLOCK_PAIRS])
+    return message.tobytes()[:length]
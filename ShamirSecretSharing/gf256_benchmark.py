@@ -0,0 +1,77 @@
+"""
+Times sharing and reconstructing a random payload byte by byte in GF(2^8)
+with share_bytes and reconstruct_bytes, against sharing it in the 521-bit
+Mersenne prime field with share_stream and reconstruct_stream, and reports
+the throughput in MB/s of payload
+The prime field is much slower, so it gets a smaller payload
+
+Usage:
+    python gf256_benchmark.py [--megabytes M] [--prime-megabytes P]
+                              [--repeat R]
+"""
+
+from __future__ import division, print_function
+import argparse
+import os
+import timeit
+from io import BytesIO
+
+from gf256 import share_bytes, reconstruct_bytes
+from stream_share import share_stream, reconstruct_stream
+
+def gf256_rates(payload, t, n, repeat):
+    shares = []
+    def run_share():
+        shares[:] = share_bytes(payload, t, n)
+    share_time = min(timeit.repeat(run_share, number=1, repeat=repeat))
+    sample = shares[-t:]
+    reconstruct_time = min(timeit.repeat(lambda: reconstruct_bytes(sample),
+                                         number=1, repeat=repeat))
+    assert reconstruct_bytes(sample) == payload
+    return share_time, reconstruct_time
+
+def prime_rates(payload, t, n, repeat):
+    shares = []
+    def run_share():
+        outputs = [BytesIO() for _ in range(n)]
+        share_stream(BytesIO(payload), t, n, outputs)
+        shares[:] = [output.getvalue() for output in outputs]
+    share_time = min(timeit.repeat(run_share, number=1, repeat=repeat))
+    def run_reconstruct():
+        output = BytesIO()
+        reconstruct_stream([BytesIO(s) for s in shares[-t:]], output)
+        return output.getvalue()
+    reconstruct_time = min(timeit.repeat(run_reconstruct, number=1,
+                                         repeat=repeat))
+    assert run_reconstruct() == payload
+    return share_time, reconstruct_time
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--megabytes', type=float, default=64,
+                        help='size of the payload shared in GF(2^8)')
+    parser.add_argument('--prime-megabytes', type=float, default=1,
+                        help='size of the payload shared in the prime field')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='number of runs to take the best of')
+    args = parser.parse_args()
+
+    payload = os.urandom(int(args.megabytes * 2**20))
+    prime_payload = payload[:int(args.prime_megabytes * 2**20)]
+    print("{0:>9}{1:>18}{2:>24}{3:>18}{4:>24}".format(
+        "(t, n)", "GF(2^8) share", "GF(2^8) reconstruct", "prime share",
+        "prime reconstruct"))
+    for t, n in ((2, 3), (3, 5), (5, 10), (10, 20)):
+        gf_share, gf_reconstruct = gf256_rates(payload, t, n, args.repeat)
+        prime_share, prime_reconstruct = prime_rates(prime_payload, t, n, 1)
+        print("{0:>9}{1:>13.1f} MB/s{2:>19.1f} MB/s{3:>13.1f} MB/s"
+              "{4:>19.1f} MB/s".format(
+                  "({0}, {1})".format(t, n),
+                  len(payload) / 2**20 / gf_share,
+                  len(payload) / 2**20 / gf_reconstruct,
+                  len(prime_payload) / 2**20 / prime_share,
+                  len(prime_payload) / 2**20 / prime_reconstruct))
+
+
+if __name__ == '__main__':
+    main()
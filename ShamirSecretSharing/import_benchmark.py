@@ -0,0 +1,75 @@
+"""
+Times starting a fresh Python process that shares or reconstructs one secret,
+with the lazy imports of shamir_share against importing what it used to at
+load time (NumPy, gf256 and multiprocessing), and checks which of those the
+lazy path ends up loading
+
+Usage:
+    python import_benchmark.py [--repeat R]
+"""
+
+from __future__ import division, print_function
+import argparse
+import os
+import subprocess
+import sys
+import timeit
+
+EAGER = 'import numpy, gf256, multiprocessing\n'
+
+ONE_SECRET = ('from shamir_share import share, reconstruct\n'
+              'shares, p = share(1234, 3, 5)\n'
+              'assert reconstruct(shares[:3], p) == 1234\n')
+
+CASES = [
+    ('python alone', 'pass'),
+    ('import shamir_share', 'import shamir_share'),
+    ('import shamir_share, eager', EAGER + 'import shamir_share'),
+    ('one secret', ONE_SECRET),
+    ('one secret, eager', EAGER + ONE_SECRET),
+    ('share_many', 'from shamir_share import share_many\n'
+                   'share_many(range(100), 3, 5)'),
+]
+
+HEAVY = ('numpy', 'gf256', 'multiprocessing')
+
+def start_time(code, repeat):
+    """
+    Best time of repeat fresh interpreters running code, in ms
+    """
+    command = [sys.executable, '-c', code]
+    return 1e3 * min(timeit.repeat(lambda: subprocess.check_call(command),
+                                   number=1, repeat=repeat))
+
+def loaded(code):
+    """
+    Which of HEAVY are imported after running code
+    """
+    check = code + ('\nimport sys\nprint(" ".join(m for m in {0!r} '
+                    'if m in sys.modules))'.format(HEAVY))
+    output = subprocess.check_output([sys.executable, '-c', check])
+    return output.decode().strip() or '-'
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--repeat', type=int, default=20,
+                        help='number of processes to take the best of')
+    args = parser.parse_args()
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    print("{0:<28}{1:>10}  {2}".format("case", "ms", "loaded"))
+    for name, code in CASES:
+        print("{0:<28}{1:>10.1f}  {2}".format(
+            name, start_time(code, args.repeat), loaded(code)))
+    shares = subprocess.check_output([sys.executable, 'shamir_cli.py',
+                                      'share', '1234', '-t', '3', '-n', '5'])
+    command = [sys.executable, 'shamir_cli.py', 'reconstruct'] + \
+        shares.decode().split()[:4]
+    cli_time = 1e3 * min(timeit.repeat(
+        lambda: subprocess.check_output(command), number=1,
+        repeat=args.repeat))
+    print("{0:<28}{1:>10.1f}".format("shamir_cli.py reconstruct", cli_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""
+Times reconstruction with the exact GF(p) interpolation in polynomials.py
+against the old path, scipy's floating point lagrange followed by lag(0) % p,
+over a range of thresholds and field sizes, and reports how often each gets
+the message back
+scipy's lagrange builds the whole polynomial, so it's only run up to
+--max-scipy-t shares
+
+It then times reconstructing many secrets from the same share holders:
+working the Lagrange weights out every time, with them cached, and with
+reconstruct_many
+
+Usage:
+    python interpolation_benchmark.py [--repeat R] [--samples S]
+                                      [--max-scipy-t T] [--secrets N]
+"""
+
+from __future__ import division, print_function
+import argparse
+import random
+import timeit
+
+from polynomials import interpolate, lagrange_weights, clear_weight_cache
+from shamir_share import reconstruct, reconstruct_many
+
+try:
+    from scipy.interpolate import lagrange
+except ImportError:
+    lagrange = None
+
+def scipy_interpolate(shares, p):
+    x, y = zip(*shares)
+    lag = lagrange(x, y)
+    return lag(0) % p
+
+def make_shares(t, p):
+    """
+    t shares at x = 1..t of a random polynomial of degree t-1, evaluated
+    exactly
+    Returns:
+        (message, shares)
+    """
+    coefs = [random.randrange(p) for _ in range(t)]
+    shares = []
+    for x in range(1, t + 1):
+        y = 0
+        for c in reversed(coefs):
+            y = (y * x + c) % p
+        shares.append((x, y))
+    return coefs[0], shares
+
+def run(func, cases, p, repeat):
+    """
+    Best time per reconstruction over repeat runs through every case, and
+    the fraction of cases that gave back the message
+    Returns:
+        (time, fraction), with a time of None if func couldn't handle the
+        field at all
+    """
+    correct = 0
+    for message, shares in cases:
+        try:
+            correct += int(func(shares, p)) == message
+        except OverflowError:
+            return None, 0.0
+    best = min(timeit.repeat(lambda: [func(shares, p) for _, shares in cases],
+                             number=1, repeat=repeat))
+    return best / len(cases), correct / len(cases)
+
+def uncached_interpolate(shares, p):
+    x, y = zip(*shares)
+    weights = lagrange_weights(x, p)
+    return sum(w * y_i for w, y_i in zip(weights, y)) % p
+
+def repeated_benchmark(num_secrets, repeat):
+    """
+    Times reconstructing num_secrets secrets shared in a 521-bit field, all
+    from shares held by the same t holders
+    Returns:
+        (list) (t, uncached, cached, reconstruct_many) secrets per second
+    """
+    p = 2**521 - 1
+    results = []
+    for t in (3, 10, 50, 200):
+        batch = [make_shares(t, p)[1] for _ in range(num_secrets)]
+        def time_it(func):
+            clear_weight_cache()
+            return num_secrets / min(timeit.repeat(func, number=1,
+                                                   repeat=repeat))
+        uncached = time_it(lambda: [uncached_interpolate(shares, p)
+                                    for shares in batch])
+        cached = time_it(lambda: [reconstruct(shares, p) for shares in batch])
+        many = time_it(lambda: reconstruct_many(batch, p))
+        results.append((t, uncached, cached, many))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='number of runs to take the best of')
+    parser.add_argument('--samples', type=int, default=20,
+                        help='number of secrets reconstructed per case')
+    parser.add_argument('--max-scipy-t', type=int, default=50,
+                        help='largest threshold to run scipy on')
+    parser.add_argument('--secrets', type=int, default=200,
+                        help='number of secrets reconstructed from the same '
+                             'share holders')
+    args = parser.parse_args()
+
+    print("{0:>6}{1:>7}{2:>14}{3:>10}{4:>14}{5:>10}{6:>10}".format(
+        "bits", "t", "scipy us", "correct", "exact us", "correct",
+        "speedup"))
+    for bits in (13, 31, 61, 127, 521, 1279):
+        p = 2**bits - 1
+        for t in (2, 3, 5, 10, 20, 50, 100, 300, 1000):
+            cases = [make_shares(t, p) for _ in range(args.samples)]
+            exact_time, exact_ok = run(interpolate, cases, p, args.repeat)
+            if lagrange is not None and t <= args.max_scipy_t:
+                scipy_time, scipy_ok = run(scipy_interpolate, cases, p,
+                                           args.repeat)
+            else:
+                scipy_time = scipy_ok = None
+            if scipy_time is not None:
+                print("{0:>6}{1:>7}{2:>14.1f}{3:>10.2f}{4:>14.1f}{5:>10.2f}"
+                      "{6:>9.1f}x".format(bits, t, scipy_time * 1e6, scipy_ok,
+                                          exact_time * 1e6, exact_ok,
+                                          scipy_time / exact_time))
+            else:
+                # scipy skipped, or it overflowed converting to floats
+                print("{0:>6}{1:>7}{2:>14}{3:>10}{4:>14.1f}{5:>10.2f}".format(
+                    bits, t, "-" if scipy_ok is None else "overflow", "-",
+                    exact_time * 1e6, exact_ok))
+
+    print("\n{0:d} secrets from the same holders, 521-bit field".format(
+        args.secrets))
+    print("{0:>7}{1:>16}{2:>16}{3:>20}".format("t", "uncached /s",
+                                               "cached /s",
+                                               "reconstruct_many /s"))
+    for t, uncached, cached, many in repeated_benchmark(args.secrets,
+                                                        args.repeat):
+        print("{0:>7}{1:>16.0f}{2:>16.0f}{3:>20.0f}".format(t, uncached,
+                                                            cached, many))
+
+
+if __name__ == '__main__':
+    main()
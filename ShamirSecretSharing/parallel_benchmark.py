@@ -0,0 +1,58 @@
+"""
+Times share_many and reconstruct_many on a batch of secrets in this process
+and split over process pools of a few sizes, and reports secrets per second
+and the speedup over doing it here
+
+Usage:
+    python parallel_benchmark.py [--secrets N] [--repeat R] [--workers W ...]
+"""
+
+from __future__ import division, print_function
+import argparse
+import multiprocessing
+import random
+import timeit
+
+from shamir_share import share_many, reconstruct_many
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--secrets', type=int, default=200000,
+                        help='number of secrets in the batch')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='number of runs to take the best of')
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=[2, 4, multiprocessing.cpu_count()],
+                        help='process pool sizes to try')
+    args = parser.parse_args()
+
+    messages = [random.randrange(10**6) for _ in range(args.secrets)]
+    print("{0:d} secrets on {1:d} cores".format(args.secrets,
+                                                multiprocessing.cpu_count()))
+    print("{0:>9}{1:>8}{2:>14}{3:>10}{4:>20}{5:>10}".format(
+        "(t, n)", "workers", "share /s", "speedup", "reconstruct /s",
+        "speedup"))
+    for t, n in ((3, 5), (10, 20)):
+        shares_batch, p = share_many(messages, t, n)
+        samples = [shares[-t:] for shares in shares_batch]
+        expected = reconstruct_many(samples, p)
+        assert expected == messages
+        serial = None
+        for workers in [None] + sorted(set(args.workers)):
+            share_rate = args.secrets / min(timeit.repeat(
+                lambda: share_many(messages, t, n, workers=workers),
+                number=1, repeat=args.repeat))
+            reconstruct_rate = args.secrets / min(timeit.repeat(
+                lambda: reconstruct_many(samples, p, workers=workers),
+                number=1, repeat=args.repeat))
+            assert reconstruct_many(samples, p, workers=workers) == expected
+            if serial is None:
+                serial = share_rate, reconstruct_rate
+            print("{0:>9}{1:>8}{2:>14.0f}{3:>9.2f}x{4:>20.0f}{5:>9.2f}x".format(
+                "({0}, {1})".format(t, n), workers or "-", share_rate,
+                share_rate / serial[0], reconstruct_rate,
+                reconstruct_rate / serial[1]))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,40 @@
-import numpy as np
-import random
-from scipy.interpolate import lagrange
+from binascii import hexlify
+from prime import get_field
+import os
+from collections import OrderedDict
+
+# NumPy is only imported by the functions that work on batches, so that
+# sharing and reconstructing one secret needs nothing but the standard library
+
+# Most weights kept by cached_lagrange_weights, least recently used go first
+WEIGHT_CACHE_SIZE = 256
+_weight_cache = OrderedDict()
+
+"""
+Draws uniformly random integers in [0, p) from os.urandom
+All the random bytes are read at once. Each value takes the low bits of its
+bytes, as many bits as p has, and is thrown away and drawn again if it isn't
+below p, so that no value is more likely than another. For a Mersenne prime
+that only happens when all its bits are set
+Parameters:
+    count: number of integers to draw
+    p:     the prime to be used as the field size
+Returns:
+    values: list of count integers
+"""
+
+def random_field_elements(count, p):
+    bits = p.bit_length()
+    mask = 2**bits - 1
+    width = (bits + 7) // 8
+    values = []
+    while len(values) < count:
+        data = hexlify(os.urandom(width * (count - len(values))))
+        for i in range(0, len(data), 2 * width):
+            value = int(data[i:i + 2 * width], 16) & mask
+            if value < p:
+                values.append(value)
+    return values
 
 """
 Gets the coefficients for a random polynomial of degree t-1
@@ -8,14 +42,79 @@ Parameters:
     t: threshold of reconstruction
     p: the prime to be used as the field size
 Returns:
-    coefs: random sample of (t-1) integers to be used as coefficients
+    coefs: list of (t-1) uniformly random integers in [0, p) to be used as
+        coefficients
 """
 
 def get_random_coefs(t, p):
-    return random.sample(xrange(p), t - 1)
+    return random_field_elements(t - 1, p)
+
+"""
+Gets the coefficients for count random polynomials of degree t-1
+When p fits in an int64 the values are drawn straight into an array, 4 or 8
+bytes each from one os.urandom read, masked to the bits of p, with the ones
+not below p drawn again as in random_field_elements
+Parameters:
+    count: number of polynomials
+    t:     threshold of reconstruction
+    p:     the prime to be used as the field size
+Returns:
+    coefs: array of shape (count, t-1), int64 if p fits in an int64 and of
+        Python integers otherwise
+"""
+
+def get_random_coefs_batch(count, t, p):
+    import numpy as np
+    size = count * (t - 1)
+    bits = p.bit_length()
+    if bits > 63:
+        return np.array(random_field_elements(size, p),
+                        dtype=object).reshape(count, t - 1)
+    # The bound is the same unsigned type as the values, as comparing uint64
+    # with a Python integer goes through float64
+    dtype = np.uint32 if bits <= 32 else np.uint64
+    mask, bound = dtype(2**bits - 1), dtype(p)
+    parts = []
+    remaining = size
+    while remaining > 0:
+        # Draw enough that one read almost always covers what's left
+        draw = remaining * 2**bits // p + 64
+        raw = np.frombuffer(os.urandom(draw * dtype().itemsize), dtype=dtype)
+        raw = raw & mask
+        raw = raw[raw < bound][:remaining]
+        parts.append(raw)
+        remaining -= len(raw)
+    coefs = np.concatenate(parts) if parts else np.zeros(0, dtype=dtype)
+    return coefs.astype(np.int64).reshape(count, t - 1)
+
+"""
+Gets the coefficients of random polynomials of degree t-1 with the given
+constant terms
+Parameters:
+    messages: list of the constant terms, each below p
+    t:        threshold of reconstruction
+    p:        the prime to be used as the field size
+Returns:
+    coefs: array of shape (len(messages), t), whose rows are coefficient lists
+        as in produce_shares, in the dtype of get_random_coefs_batch
+"""
+
+def random_polynomials(messages, t, p):
+    import numpy as np
+    random_coefs = get_random_coefs_batch(len(messages), t, p)
+    coefs = np.empty((len(messages), t), dtype=random_coefs.dtype)
+    coefs[:, 0] = messages
+    coefs[:, 1:] = random_coefs
+    return coefs
 
 """
 Produces n shares by evaluating the polynomial determined by the coefficients
+The polynomial is evaluated with Horner's rule on Python integers, so the
+shares are exact however large p is. The value is reduced once at the end
+rather than at every step. It grows by about log2(x) bits per coefficient, so
+it ends near p * n^(t-1), some (t-1) * log2(n) bits longer than p: around 500
+bits more at t = 50, n = 1000. Multiplying that by a small x and taking one %
+at the end still takes about half the time of a % at every step
 Parameters:
     coefs: list of coefficients of the polynomial, with coefs[0] being the message
     n:     number of shares to be produced
@@ -27,18 +126,182 @@ Returns:
 """
 
 def produce_shares(coefs, n, p):
-    t = len(coefs)
-    arr = np.zeros((n, t), dtype=int)
+    coefs = [int(c) for c in reversed(coefs)]
+    shares = []
+    for x in range(1, n + 1):
+        y = 0
+        for c in coefs:
+            y = y * x + c
+        shares.append((x, y % p))
+    return shares
+
+"""
+Evaluates many polynomials in the same field at x = 1..n
+All the polynomials are evaluated at every x value at once with Horner's rule
+on an (n, number of polynomials) array. If p * (n + 1) fits in an int64, the
+array is int64 and reduced mod p at every step, which keeps every value below
+p * (n + 1). Otherwise it holds Python integers, reduced once at the end as in
+produce_shares. The values are exact either way
+Parameters:
+    coefs_batch: list of coefficient lists as in produce_shares, all with the
+                 same number of coefficients
+    n:           number of x values to evaluate at
+    p:           the prime to be used as the field size
+Returns:
+    y: array of shape (n, number of polynomials), where y[i][j] is the jth
+        polynomial at x = i + 1
+"""
+
+def evaluate_many(coefs_batch, n, p):
+    import numpy as np
+    coefs = None
+    if p * (n + 1) < 2**63:
+        dtype = np.int64
+        try:
+            coefs = np.array(coefs_batch, dtype=dtype) % p
+        except OverflowError:
+            pass
+    if coefs is None:
+        dtype = object
+        coefs = np.array([[int(c) % p for c in coefs_i]
+                          for coefs_i in coefs_batch], dtype=dtype)
+    x = np.arange(1, n + 1).astype(dtype).reshape(n, 1)
+    y = np.empty((n, len(coefs)), dtype=dtype)
+    y[:] = coefs[:, -1]
+    for j in range(coefs.shape[1] - 2, -1, -1):
+        y *= x
+        y += coefs[:, j]
+        if dtype is not object:
+            y %= p
+    if dtype is object:
+        y %= p
+    return y
+
+"""
+Produces n shares of each of many polynomials in the same field
+Parameters:
+    coefs_batch: see evaluate_many
+    n:           number of shares to be produced for each polynomial
+    p:           the prime to be used as the field size
+Returns:
+    shares_batch: list of share lists as in produce_shares, one per polynomial
+"""
+
+def produce_shares_many(coefs_batch, n, p):
+    if len(coefs_batch) == 0:
+        return []
+    y = evaluate_many(coefs_batch, n, p)
     x_range = range(1, n + 1)
-    for i in x_range:
-        for j in range(t):
-            arr[i-1][j] = pow(i, j)
-    raw_shares = np.dot(arr, coefs)
-    modular_shares = map(lambda x: x % p, raw_shares)
-    return zip(x_range, modular_shares)
+    return [zip(x_range, row) for row in y.T.tolist()]
+
+"""
+Computes the inverse of a modulo p with the extended Euclidean algorithm
+Parameters:
+    a: integer to invert, must not be a multiple of p
+    p: the prime used as the field size
+Returns:
+    inverse: the integer b in [0, p) with a * b % p == 1
+"""
+
+def mod_inverse(a, p):
+    r0, r1 = a % p, p
+    s0, s1 = 1, 0
+    while r1:
+        q = r0 // r1
+        r0, r1 = r1, r0 - q * r1
+        s0, s1 = s1, s0 - q * s1
+    if r0 != 1:
+        raise ValueError("{} has no inverse modulo {}".format(a, p))
+    return s0 % p
+
+"""
+Computes the Lagrange basis polynomials of the x values at zero, in GF(p)
+The weight of x_i is the product over j != i of x_j / (x_j - x_i), so that
+f(0) = sum(w_i * y_i) for any polynomial f of degree below len(x)
+The numerators come from prefix and suffix products, and all the denominators
+are inverted at once by inverting their product, so the only modular inverse
+is a single one however many shares there are
+Parameters:
+    x: list of distinct x values of the shares
+    p: the prime used as the field size
+Returns:
+    weights: list of weights, one per x value
+"""
+
+def lagrange_weights(x, p):
+    reduce = get_field(p).reduce
+    t = len(x)
+    x = [int(x_i) % p for x_i in x]
+    if len(set(x)) != t:
+        raise ValueError("share x values must be distinct modulo p")
+
+    # numerators[i] = product of every x but x[i]
+    # Share x values are small, so products by them and by their differences
+    # are only a little over p, where % is quicker than the field's reduce
+    numerators = [1] * t
+    acc = 1
+    for i in range(t):
+        numerators[i] = acc
+        acc = acc * x[i] % p
+    acc = 1
+    for i in range(t - 1, -1, -1):
+        numerators[i] = numerators[i] * acc % p
+        acc = acc * x[i] % p
+
+    # The differences are small when the x values are, so the products are
+    # only reduced once, which is quicker than reducing after every step
+    denominators = []
+    for x_i in x:
+        d = 1
+        for x_j in x:
+            if x_j != x_i:
+                d *= x_j - x_i
+        denominators.append(d % p)
+
+    # Montgomery's trick: invert the product of the denominators, then peel
+    # off each inverse with the prefix products
+    prefix = [1] * (t + 1)
+    for i in range(t):
+        prefix[i + 1] = reduce(prefix[i] * denominators[i])
+    inv = mod_inverse(prefix[t], p)
+    weights = [0] * t
+    for i in range(t - 1, -1, -1):
+        weights[i] = reduce(numerators[i] * inv * prefix[i])
+        inv = reduce(inv * denominators[i])
+    return weights
 
 """
-Interpolates the k-1 degree polynomial produced by k shares
+lagrange_weights with the results of the last WEIGHT_CACHE_SIZE distinct
+(x values, p) pairs kept, since the same share holders tend to reconstruct
+many secrets
+Parameters:
+    x: list of distinct x values of the shares
+    p: the prime used as the field size
+Returns:
+    weights: tuple of weights, one per x value
+"""
+
+def cached_lagrange_weights(x, p):
+    key = (tuple(int(x_i) for x_i in x), p)
+    weights = _weight_cache.pop(key, None)
+    if weights is None:
+        weights = tuple(lagrange_weights(key[0], p))
+        while len(_weight_cache) >= WEIGHT_CACHE_SIZE > 0:
+            _weight_cache.popitem(last=False)
+    if WEIGHT_CACHE_SIZE > 0:
+        _weight_cache[key] = weights
+    return weights
+
+"""
+Empties the cache of cached_lagrange_weights
+"""
+
+def clear_weight_cache():
+    _weight_cache.clear()
+
+"""
+Interpolates the k-1 degree polynomial produced by k shares at zero, exactly
+in GF(p), without building the polynomial itself
 Parameters:
     shares: see produce_shares
     p:      the prime used as the field size
@@ -49,5 +312,31 @@ Returns:
 
 def interpolate(shares, p):
     x, y = zip(*shares)
-    lag = lagrange(x, y)
-    return lag(0) % p
+    weights = cached_lagrange_weights(x, p)
+    return get_field(p).reduce(sum(w * int(y_i)
+                                   for w, y_i in zip(weights, y)))
+
+"""
+Interpolates many sets of shares at zero in the same field
+The weights are worked out once for every distinct list of x values in the
+batch, so a batch from the same share holders costs one set of weights and
+then a dot product per secret
+Parameters:
+    shares_batch: list of share lists, each as in interpolate
+    p:            the prime used as the field size
+Returns:
+    messages: f(0) for each share list, in order
+"""
+
+def interpolate_many(shares_batch, p):
+    reduce = get_field(p).reduce
+    batch_weights = {}
+    messages = []
+    for shares in shares_batch:
+        x, y = zip(*shares)
+        weights = batch_weights.get(x)
+        if weights is None:
+            weights = batch_weights[x] = cached_lagrange_weights(x, p)
+        messages.append(reduce(sum(w * int(y_i)
+                                   for w, y_i in zip(weights, y))))
+    return messages
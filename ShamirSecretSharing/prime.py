@@ -1,12 +1,132 @@
-MERSENNE_EXPONENTS = [2, 3, 5, 7, 13, 17, 19, 31, 61, 89, 107, 127, 521, 607, 1279]
-pow_arr = [3]
+from bisect import bisect_right
+import random
+
+MERSENNE_EXPONENTS = (2, 3, 5, 7, 13, 17, 19, 31, 61, 89, 107, 127, 521, 607,
+                      1279, 2203, 2281, 3217, 4253, 4423)
+MERSENNE_PRIMES = tuple(2**ex - 1 for ex in MERSENNE_EXPONENTS)
+
+# Passed to shamir_share's share and reconstruct in place of a prime to share
+# byte strings byte by byte in GF(2^8), with gf256.py
+GF256 = 'gf256'
+
+# Fields of at least this many bits reduce by shift and add rather than %,
+# which CPython's long division does faster for smaller numbers
+FOLD_BITS = 256
+
+# Candidates are divided by the primes below this before Miller-Rabin, which
+# throws out most composites for the cost of a few small divisions
+SIEVE_LIMIT = 2000
+SMALL_PRIMES = tuple(q for q in range(2, SIEVE_LIMIT)
+                     if all(q % d for d in range(2, int(q ** 0.5) + 1)))
+MILLER_RABIN_ROUNDS = 40
+
+"""
+Finds the first Mersenne prime larger than n
+Parameters:
+    n: the message, a non-negative integer
+Returns:
+    p: the smallest Mersenne prime in MERSENNE_PRIMES greater than n
+Raises:
+    ValueError: if n is at least the largest prime in MERSENNE_PRIMES
+"""
 
 def get_larger_prime(n):
-    largest_prime = 0
-    for i, ex in enumerate(MERSENNE_EXPONENTS[1:], start=1):
-        mersenne = pow_arr[-1] - 1
-        if n < mersenne:
-            return mersenne
-        prev_ex = MERSENNE_EXPONENTS[i-1]
-        prev_pow = pow_arr[i-1]
-        pow_arr.append(prev_pow * pow(2, ex - prev_ex))
+    i = bisect_right(MERSENNE_PRIMES, n)
+    if i == len(MERSENNE_PRIMES):
+        raise ValueError("messages must be below 2^{} - 1".format(
+            MERSENNE_EXPONENTS[-1]))
+    return MERSENNE_PRIMES[i]
+
+"""
+Tests whether n is prime with trial division by SMALL_PRIMES and then rounds
+of the Miller-Rabin test with random bases
+A composite passes each round with probability at most 1/4
+Parameters:
+    n:      integer to test
+    rounds: number of Miller-Rabin rounds
+Returns:
+    prime: False if n is certainly composite, True if it is prime with
+        probability at least 1 - 4^-rounds
+"""
+
+def is_probable_prime(n, rounds=MILLER_RABIN_ROUNDS):
+    if n < 2:
+        return False
+    for q in SMALL_PRIMES:
+        if n % q == 0:
+            return n == q
+    if n < SIEVE_LIMIT ** 2:
+        return True
+    d, s = n - 1, 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+    for _ in range(rounds):
+        x = pow(random.randrange(2, n - 1), d, n)
+        if x == 1 or x == n - 1:
+            continue
+        for _ in range(s - 1):
+            x = x * x % n
+            if x == n - 1:
+                break
+        else:
+            return False
+    return True
+
+"""
+The integers modulo a prime p
+reduce(x) gives x mod p, for any integer x
+"""
+
+class PrimeField():
+    def __init__(self, p):
+        self.p = p
+
+    def reduce(self, x):
+        return x % self.p
+
+"""
+The integers modulo the Mersenne prime p = 2^k - 1
+Since 2^k = 1 mod p, x = (x & p) + (x >> k) mod p, so for fields of at least
+FOLD_BITS bits reduce folds x down k bits at a time with a mask, a shift and
+an add instead of dividing by p
+"""
+
+class MersenneField(PrimeField):
+    def __init__(self, exponent):
+        PrimeField.__init__(self, 2**exponent - 1)
+        self.exponent = exponent
+        if exponent >= FOLD_BITS:
+            self.reduce = self.fold
+
+    def fold(self, x):
+        p, k = self.p, self.exponent
+        if x < 0:
+            x = self.fold(-x)
+            return p - x if x else 0
+        while x >> k:
+            x = (x & p) + (x >> k)
+        return 0 if x == p else x
+
+_fields = {}
+
+"""
+Gets the field of integers modulo p, a MersenneField if p is a Mersenne
+number and a PrimeField otherwise
+Fields are made once for each p and kept
+Parameters:
+    p: the prime to be used as the field size
+Returns:
+    field: PrimeField with field.p == p
+"""
+
+def get_field(p):
+    field = _fields.get(p)
+    if field is None:
+        p = int(p)
+        if p > 1 and p & (p + 1) == 0:
+            field = MersenneField(p.bit_length())
+        else:
+            field = PrimeField(p)
+        _fields[p] = field
+    return field
@@ -0,0 +1,82 @@
+"""
+Shares a secret or reconstructs one from the command line
+share prints the prime of the field, or gf256, on the first line and then
+one share per line as x:y, with y in hex for byte strings. reconstruct takes
+the same lines, as arguments or on standard input, and prints the secret
+
+Usage:
+    python shamir_cli.py share MESSAGE -t T -n N [--bytes]
+    python shamir_cli.py reconstruct [P X:Y [X:Y ...]]
+
+For example:
+    python shamir_cli.py share 1234 -t 2 -n 3 | head -3 | \\
+        python shamir_cli.py reconstruct
+"""
+
+import argparse
+import sys
+from binascii import hexlify, unhexlify
+
+from shamir_share import GF256, share, reconstruct
+
+def share_lines(message, t, n, as_bytes):
+    """
+    Shares message and gives the lines share prints
+    """
+    if as_bytes:
+        shares, p = share(message, t, n, field=GF256)
+        return [GF256] + ['{0}:{1}'.format(x, hexlify(y)) for x, y in shares]
+    shares, p = share(int(message), t, n)
+    return [str(p)] + ['{0}:{1}'.format(x, y) for x, y in shares]
+
+def reconstruct_lines(lines):
+    """
+    Reconstructs the secret from the lines share printed, the field first
+    """
+    p = lines[0] if lines[0] == GF256 else int(lines[0])
+    shares = []
+    for line in lines[1:]:
+        x, y = line.split(':')
+        shares.append((int(x), unhexlify(y) if p == GF256 else int(y)))
+    return reconstruct(shares, p)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    commands = parser.add_subparsers(dest='command')
+    share_parser = commands.add_parser('share', help='share a secret')
+    share_parser.add_argument('message', help='the secret, an integer '
+                                              'unless --bytes is given')
+    share_parser.add_argument('-t', type=int, required=True,
+                              help='threshold of reconstruction')
+    share_parser.add_argument('-n', type=int, required=True,
+                              help='number of shares')
+    share_parser.add_argument('--bytes', action='store_true',
+                              help='share the message as a byte string in '
+                                   'GF(2^8)')
+    reconstruct_parser = commands.add_parser('reconstruct',
+                                             help='reconstruct a secret')
+    reconstruct_parser.add_argument('lines', nargs='*',
+                                    help='the field and then the shares, '
+                                         'read from standard input if none '
+                                         'are given')
+    args = parser.parse_args()
+
+    if args.command == 'share':
+        if not 1 <= args.t <= args.n:
+            parser.error("need 1 <= t <= n")
+        try:
+            lines = share_lines(args.message, args.t, args.n, args.bytes)
+        except ValueError as e:
+            parser.error(str(e))
+        sys.stdout.write('\n'.join(lines) + '\n')
+    else:
+        lines = args.lines or sys.stdin.read().split()
+        try:
+            message = reconstruct_lines(lines)
+        except (ValueError, TypeError, IndexError) as e:
+            parser.error("bad shares: {0}".format(e))
+        sys.stdout.write(message if lines[0] == GF256 else
+                         str(message) + '\n')
+
+if __name__ == '__main__':
+    main()
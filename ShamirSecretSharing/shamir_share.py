@@ -1,38 +1,164 @@
-from prime import get_larger_prime
-from polynomials import get_random_coefs, produce_shares, interpolate
+from prime import GF256, get_larger_prime
+from polynomials import (get_random_coefs, random_polynomials,
+                         produce_shares, produce_shares_many, interpolate,
+                         interpolate_many)
+
+# gf256 (and with it NumPy) and multiprocessing are imported where they are
+# used, so that sharing and reconstructing integers one at a time starts up
+# with only the standard library
+
+# Batches are cut into about this many chunks per worker, so that workers that
+# finish early pick up more, but no chunk is smaller than MIN_CHUNK so that
+# pickling doesn't cost more than the work
+CHUNKS_PER_WORKER = 4
+MIN_CHUNK = 1000
 
 """
 Produces the shares in a t-out-of-n shamir sharing scheme of a message
 Parameters:
-    message: The message to be encoded and shared. Must be an integer.
+    message: The message to be encoded and shared. Must be an integer, or a
+             byte string if field is GF256.
     t:       The threshold of reconstruction
-    n:       The number of shares to produce
+    n:       The number of shares to produce, at most 255 if field is GF256
+    field:   None to share in the first Mersenne prime field larger than both
+             the message and n, or GF256 to share a byte string byte by byte
+             in GF(2^8)
 Returns:
     tuple (shares, p) where
-        shares is a list of (x, y) coordinates
-        p is the prime associated with the field those shares were produced in
+        shares is a list of (x, y) coordinates, where y is a byte string as
+            long as the message if field is GF256
+        p is the prime associated with the field those shares were produced
+            in, or GF256
 """
 
-def share(message, t, n):
+def share(message, t, n, field=None):
     if n < t:
         print "n < t"
         return None
 
-    p = get_larger_prime(message)
+    if field == GF256:
+        from gf256 import share_bytes
+        return share_bytes(message, t, n), GF256
+    if field is not None:
+        raise ValueError("unknown field {!r}".format(field))
+
+    # The x values 1..n must be distinct and nonzero mod p, or shares collide
+    # and the one at a multiple of p is the message itself
+    p = get_larger_prime(max(message, n))
 
     coefs = [message] + get_random_coefs(t, p)
     shares = produce_shares(coefs, n, p)
     return shares, p
 
+"""
+Cuts a batch into consecutive chunks for workers processes
+Parameters:
+    items:   list to cut
+    workers: number of processes
+Returns:
+    chunks: list of lists, which joined together give items back
+"""
+
+def _chunks(items, workers):
+    size = max(MIN_CHUNK, -(-len(items) // (workers * CHUNKS_PER_WORKER)))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+"""
+Runs func on every task, in a pool of workers processes if there is more than
+one task, and gives the results back in the order of the tasks
+"""
+
+def _map(func, tasks, workers):
+    if len(tasks) < 2:
+        return map(func, tasks)
+    import multiprocessing
+    pool = multiprocessing.Pool(min(workers, len(tasks)))
+    try:
+        return pool.map(func, tasks, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+def _share_chunk(task):
+    messages, t, n, p = task
+    return produce_shares_many(random_polynomials(messages, t, p), n, p)
+
+def _reconstruct_chunk(task):
+    shares_batch, p = task
+    return interpolate_many(shares_batch, p)
+
+"""
+Produces the shares of many messages in t-out-of-n shamir sharing schemes over
+a single field, larger than both the largest message and n, so that the
+share x values are distinct and nonzero mod p
+All the polynomials are evaluated together, so this is much quicker than
+calling share on each message
+With workers, the batch is cut into chunks that are shared in a process pool
+and put back together in the order of the messages
+Parameters:
+    messages: The messages to be encoded and shared. Must be integers.
+    t:        The threshold of reconstruction
+    n:        The number of shares to produce for each message
+    workers:  number of processes to share the batch over, or None to share
+              it in this process
+Returns:
+    tuple (shares_batch, p) where
+        shares_batch is a list of share lists, one per message, in order
+        p is the prime associated with the field those shares were produced in
+"""
+
+def share_many(messages, t, n, workers=None):
+    if n < t:
+        print "n < t"
+        return None
+
+    p = get_larger_prime(max(max(messages) if len(messages) else 0, n))
+
+    if workers is None or workers < 2:
+        return _share_chunk((messages, t, n, p)), p
+    tasks = [(chunk, t, n, p) for chunk in _chunks(list(messages), workers)]
+    shares_batch = []
+    for chunk in _map(_share_chunk, tasks, workers):
+        shares_batch.extend(chunk)
+    return shares_batch, p
+
 """
 Reconstructs the message from a list of shares
 Parameters:
     shares: list of (x, y) coordinates corresponding to shares
-    p: the prime associated with the sharing scheme
+    p: the prime associated with the sharing scheme, or GF256
 Returns:
     message: the message
 """
 
 def reconstruct(shares, p):
+    if p == GF256:
+        from gf256 import reconstruct_bytes
+        return reconstruct_bytes(shares)
     message = interpolate(shares, p)
     return message
+
+"""
+Reconstructs many messages shared in the same field
+The Lagrange weights are worked out once per distinct set of share x values,
+so reconstructing a batch from the same share holders is one dot product per
+message
+With workers, the batch is cut into chunks that are reconstructed in a
+process pool, giving exactly the messages reconstructing it here would
+Parameters:
+    shares_batch: list of share lists, each as in reconstruct
+    p: the prime associated with the sharing scheme
+    workers: number of processes to reconstruct the batch over, or None to
+             reconstruct it in this process
+Returns:
+    messages: list of the messages, in order
+"""
+
+def reconstruct_many(shares_batch, p, workers=None):
+    if workers is None or workers < 2:
+        return interpolate_many(shares_batch, p)
+    tasks = [(chunk, p) for chunk in _chunks(list(shares_batch), workers)]
+    messages = []
+    for chunk in _map(_reconstruct_chunk, tasks, workers):
+        messages.extend(chunk)
+    return messages
@@ -0,0 +1,360 @@
+"""
+Benchmarks sharing and reconstruction over a grid of (t, n) schemes, message
+sizes and fields, checks that every message comes back exactly and that t-1
+shares say nothing about it, and writes the results as JSON so that runs from
+different versions can be compared
+
+Cases:
+    prime: integer messages of --message-bits bits, each shared in the first
+        Mersenne prime field larger than both it and n, so the message size
+        picks the field unless n is larger
+    gf256: byte string messages of --message-bytes bytes, shared byte by byte
+        in GF(2^8)
+For every case and scheme, a batch of --batch messages is timed on:
+    share: share_many for prime messages, share for each gf256 message
+    reconstruct: reconstruct_many for prime messages, reconstruct for each
+        gf256 message, each from a random t of the n shares
+Throughput is the best of a few runs, in messages and bytes of message per
+second. Latency is measured by timing --samples single share and reconstruct
+calls, and is reported as the median (p50) and 99th percentile (p99) in
+microseconds
+
+Checks:
+    correct: the fraction of messages given back exactly by t random shares,
+        both in the batch and one at a time, which must be 1
+    t-1 shares: shares of the same message are made over and over, and the
+        values of t-1 of them are put in up to LEAK_BUCKETS buckets by size.
+        Those values must be uniform whatever the message, so a chi-squared
+        test against each bucket's share of the field must pass at the 0.1%
+        level, and interpolating t-1 shares must give back the message no
+        more often than guessing, 1 in p, give or take four standard
+        deviations
+
+Usage:
+    python shamir_sweep.py [--schemes 2:3,3:5,5:10,10:20]
+                           [--message-bits 16,60,126,520,1278]
+                           [--message-bytes 16,1024,65536]
+                           [--output results.json] [--compare baseline.json]
+
+The program exits with status 1 if any check fails, or with --compare if any
+throughput dropped below --tolerance of the baseline
+"""
+
+from __future__ import division, print_function
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import timeit
+
+from prime import GF256, MERSENNE_EXPONENTS
+from shamir_share import share, reconstruct, share_many, reconstruct_many
+
+timer = timeit.default_timer
+
+OPERATIONS = ('share', 'reconstruct')
+
+# Most buckets for the t-1 shares check, and LEAK_LIMITS[k] is the chi-squared
+# value with k degrees of freedom that a uniform sample exceeds 0.1% of the
+# time
+LEAK_BUCKETS = 16
+LEAK_LIMITS = (None, 10.83, 13.82, 16.27, 18.47, 20.52, 22.46, 24.32, 26.12,
+               27.88, 29.59, 31.26, 32.91, 34.53, 36.12, 37.70)
+
+def _percentile(sorted_times, percent):
+    """
+    Nearest rank percentile of a sorted list, in microseconds
+    """
+    idx = int(round(percent / 100 * (len(sorted_times) - 1)))
+    return sorted_times[idx] * 1e6
+
+def _make_messages(field, size, count):
+    """
+    count random messages of size bits for prime, or size bytes for gf256,
+    with the top bit of prime messages set so that they all pick the same
+    field
+    """
+    if field == 'gf256':
+        return [os.urandom(size) for _ in range(count)]
+    return [random.getrandbits(size - 1) | 1 << (size - 1)
+            for _ in range(count)]
+
+def _share_batch(field, messages, t, n):
+    if field == 'gf256':
+        return [share(m, t, n, field=GF256)[0] for m in messages], GF256
+    return share_many(messages, t, n)
+
+def _reconstruct_batch(field, samples, p):
+    if field == 'gf256':
+        return [reconstruct(sample, p) for sample in samples]
+    return reconstruct_many(samples, p)
+
+def _field_bits(p):
+    return 8 if p == GF256 else p.bit_length()
+
+def leak_check(field, size, t, n, samples):
+    """
+    Shares one message samples times and tests that the values of t-1 of the
+    shares are uniform
+
+    Returns:
+        (chi2, limit, recovered, guess) where chi2 is the chi-squared
+        statistic of the bucketed values and limit the value it must stay
+        below, recovered is the number of the t-1 share sets that
+        interpolated to the message, and guess is the number expected by
+        chance, None for gf256
+    """
+    message = _make_messages(field, size, 1)[0]
+    holders = random.sample(range(n), t - 1)
+    field_size = 256 if field == 'gf256' else None
+    counts = None
+    recovered = 0
+    for _ in range(samples):
+        shares, p = share(message, t, n,
+                          field=GF256 if field == 'gf256' else None)
+        if counts is None:
+            field_size = field_size or p
+            buckets = min(LEAK_BUCKETS, field_size)
+            counts = [0] * buckets
+        sample = [shares[i] for i in holders]
+        for _, y in sample:
+            if field == 'gf256':
+                for byte in bytearray(y):
+                    counts[byte * buckets // 256] += 1
+            else:
+                counts[y * buckets // p] += 1
+        if field == 'prime':
+            recovered += reconstruct(sample, p) == message
+    # Value v is in bucket v * buckets // field_size, so bucket b holds the
+    # values from ceil(b * field_size / buckets) up to the next bucket's start
+    starts = [-(-b * field_size // buckets) for b in range(buckets + 1)]
+    total = sum(counts)
+    chi2 = 0.0
+    for b, count in enumerate(counts):
+        expected = total * (starts[b + 1] - starts[b]) / field_size
+        chi2 += (count - expected) ** 2 / expected
+    guess = samples / p if field == 'prime' else None
+    return chi2, LEAK_LIMITS[buckets - 1], recovered, guess
+
+def run_case(field, size, t, n, batch, repeat, samples, leak_samples):
+    """
+    Times and checks one field, message size and scheme
+
+    Returns:
+        (results, check) where results has one dict per operation and check
+        is a dict of the checks' outcomes
+    """
+    messages = _make_messages(field, size, batch)
+    message_bytes = size if field == 'gf256' else size / 8
+    best = dict.fromkeys(OPERATIONS, float('inf'))
+    correct = 0
+    for _ in range(repeat):
+        start = timer()
+        shares_batch, p = _share_batch(field, messages, t, n)
+        best['share'] = min(timer() - start, best['share'])
+        holders = [random.sample(shares, t) for shares in shares_batch]
+        start = timer()
+        recovered = _reconstruct_batch(field, holders, p)
+        best['reconstruct'] = min(timer() - start, best['reconstruct'])
+        correct += sum(m == r for m, r in zip(messages, recovered))
+
+    latencies = dict((name, []) for name in OPERATIONS)
+    field_arg = GF256 if field == 'gf256' else None
+    for message in messages[:samples]:
+        start = timer()
+        shares, p = share(message, t, n, field=field_arg)
+        latencies['share'].append(timer() - start)
+        sample = random.sample(shares, t)
+        start = timer()
+        recovered = reconstruct(sample, p)
+        latencies['reconstruct'].append(timer() - start)
+        correct += recovered == message
+    checked = repeat * len(messages) + min(samples, len(messages))
+
+    results = []
+    for name in OPERATIONS:
+        times = sorted(latencies[name])
+        results.append({'field': field,
+                        'field_bits': _field_bits(p),
+                        'message_bits': int(message_bytes * 8),
+                        't': t,
+                        'n': n,
+                        'operation': name,
+                        'ops_per_sec': len(messages) / best[name],
+                        'mb_per_sec': len(messages) * message_bytes /
+                                      best[name] / 2**20,
+                        'p50_us': _percentile(times, 50),
+                        'p99_us': _percentile(times, 99)})
+
+    check = {'field': field,
+             'field_bits': _field_bits(p),
+             'message_bits': int(message_bytes * 8),
+             't': t,
+             'n': n,
+             'correct': correct / checked,
+             'leak_chi2': None,
+             'leak_limit': None,
+             't_minus_1_recovered': None,
+             'guess_rate': None}
+    check['passed'] = check['correct'] == 1
+    if t > 1:
+        chi2, limit, recovered, guess = leak_check(field, size, t, n,
+                                                   leak_samples)
+        check['leak_chi2'] = chi2
+        check['leak_limit'] = limit
+        check['passed'] = check['passed'] and chi2 < limit
+        if guess is not None:
+            check['t_minus_1_recovered'] = recovered / leak_samples
+            check['guess_rate'] = guess / leak_samples
+            # Recoveries by chance are about Poisson, and the 1 allows for a
+            # single lucky one in a field too large to expect any
+            check['passed'] = (check['passed'] and
+                               recovered <= guess + 4 * guess ** 0.5 + 1)
+    return results, check
+
+def sweep(schemes, message_bits, message_bytes, batch, repeat, samples,
+          leak_samples):
+    """
+    Runs every combination of field, message size and scheme
+
+    Returns:
+        (results, checks) lists of dicts
+    """
+    results = []
+    checks = []
+    cases = ([('prime', bits) for bits in message_bits] +
+             [('gf256', size) for size in message_bytes])
+    for field, size in cases:
+        for t, n in schemes:
+            print("{0:<6} | {1:>6} {2:<5} | t = {3:d}, n = {4:d}".format(
+                field, size, 'bits' if field == 'prime' else 'bytes', t, n),
+                file=sys.stderr)
+            case, check = run_case(field, size, t, n, batch, repeat, samples,
+                                   leak_samples)
+            results.extend(case)
+            checks.append(check)
+    return results, checks
+
+def _case_key(result):
+    return (result['field'], result['message_bits'], result['t'], result['n'],
+            result['operation'])
+
+def compare(results, baseline, tolerance):
+    """
+    Finds the throughputs that dropped below tolerance times the baseline
+
+    Returns:
+        (list) (result, baseline ops/s) tuples
+    """
+    before = dict((_case_key(result), result['ops_per_sec'])
+                  for result in baseline['results'])
+    return [(result, before[_case_key(result)]) for result in results
+            if _case_key(result) in before and
+            result['ops_per_sec'] < tolerance * before[_case_key(result)]]
+
+def _ints(text):
+    return [int(value) for value in text.split(',')]
+
+def _schemes(text):
+    schemes = []
+    for scheme in text.split(','):
+        t, n = scheme.split(':')
+        schemes.append((int(t), int(n)))
+    return schemes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--schemes', type=_schemes,
+                        default=[(2, 3), (3, 5), (5, 10), (10, 20)],
+                        help='comma separated t:n schemes')
+    parser.add_argument('--message-bits', type=_ints,
+                        default=[16, 60, 126, 520, 1278],
+                        help='comma separated prime field message sizes')
+    parser.add_argument('--message-bytes', type=_ints,
+                        default=[16, 1024, 65536],
+                        help='comma separated gf256 message sizes')
+    parser.add_argument('--batch', type=int, default=1000,
+                        help='number of messages timed per run')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='number of runs to take the best of')
+    parser.add_argument('--samples', type=int, default=200,
+                        help='number of single calls timed for latency')
+    parser.add_argument('--leak-samples', type=int, default=500,
+                        help='number of sharings in the t-1 shares check')
+    parser.add_argument('--output', help='file to write the JSON results to')
+    parser.add_argument('--compare',
+                        help='JSON results of an earlier run to compare to')
+    parser.add_argument('--tolerance', type=float, default=0.9,
+                        help='fraction of the baseline throughput below '
+                             'which a result counts as a regression')
+    args = parser.parse_args()
+    for t, n in args.schemes:
+        if not 1 <= t <= n:
+            parser.error("need 1 <= t <= n, got {0:d}:{1:d}".format(t, n))
+        if args.message_bytes and n > 255:
+            parser.error("gf256 needs n <= 255, got {0:d}".format(n))
+    # Messages have their top bit set and must stay below the largest prime
+    for bits in args.message_bits:
+        if not 2 <= bits < MERSENNE_EXPONENTS[-1]:
+            parser.error("message bits must be from 2 to {0:d}, got "
+                         "{1:d}".format(MERSENNE_EXPONENTS[-1] - 1, bits))
+    for size in args.message_bytes:
+        if size < 1:
+            parser.error("message bytes must be at least 1, got "
+                         "{0:d}".format(size))
+    if min(args.batch, args.repeat, args.samples, args.leak_samples) < 1:
+        parser.error("--batch, --repeat, --samples and --leak-samples must "
+                     "be at least 1")
+
+    results, checks = sweep(args.schemes, args.message_bits,
+                            args.message_bytes, args.batch, args.repeat,
+                            args.samples, args.leak_samples)
+
+    print("{0:<6}{1:>6}{2:>9}{3:>4}{4:>4}  {5:<12}{6:>12}{7:>10}{8:>10}"
+          "{9:>10}".format("field", "bits", "message", "t", "n", "operation",
+                           "msgs/s", "MB/s", "p50 us", "p99 us"))
+    for result in results:
+        print("{field:<6}{field_bits:>6d}{message_bits:>9d}{t:>4d}{n:>4d}  "
+              "{operation:<12}{ops_per_sec:>12.0f}{mb_per_sec:>10.2f}"
+              "{p50_us:>10.1f}{p99_us:>10.1f}".format(**result))
+    failed = [check for check in checks if not check['passed']]
+    for check in failed:
+        print("FAILED {field} {message_bits:d}-bit messages t = {t:d}, "
+              "n = {n:d}: correct {correct}, chi2 {leak_chi2} (limit "
+              "{leak_limit}), t-1 shares recovered {t_minus_1_recovered} "
+              "(guessing {guess_rate})".format(**check))
+    print("{0:d} of {1:d} cases passed their checks".format(
+        len(checks) - len(failed), len(checks)))
+
+    if args.output:
+        # Enough about the run to tell whether two files are comparable
+        meta = {'python': platform.python_version(),
+                'implementation': platform.python_implementation(),
+                'platform': platform.platform(),
+                'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'batch': args.batch,
+                'repeat': args.repeat,
+                'samples': args.samples,
+                'leak_samples': args.leak_samples}
+        with open(args.output, 'w') as f:
+            json.dump({'meta': meta, 'results': results, 'checks': checks},
+                      f, indent=1, sort_keys=True)
+
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for result, before in regressions:
+            print("REGRESSION {field} {message_bits:d}-bit messages "
+                  "t = {t:d}, n = {n:d} {operation}: ".format(**result) +
+                  "{0:.0f} -> {1:.0f} msgs/s".format(before,
+                                                     result['ops_per_sec']))
+    if failed or regressions:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Times sharing a batch of secrets one at a time against share_many, which
+evaluates all of their polynomials together, and then the polynomial
+evaluation alone, produce_shares in a loop against produce_shares_many, in
+fields from 31 to 521 bits
+In fields where p * (n + 1) fits in an int64 produce_shares_many works on
+int64 arrays, otherwise on arrays of Python integers
+
+Usage:
+    python share_benchmark.py [--repeat R] [--secrets N]
+"""
+
+from __future__ import division, print_function
+import argparse
+import random
+import timeit
+
+from polynomials import produce_shares, produce_shares_many
+from shamir_share import share, share_many
+
+def best_rate(func, count, repeat):
+    return count / min(timeit.repeat(func, number=1, repeat=repeat))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='number of runs to take the best of')
+    parser.add_argument('--secrets', type=int, default=100000,
+                        help='number of secrets shared per run')
+    args = parser.parse_args()
+
+    messages = [random.randrange(10**6) for _ in range(args.secrets)]
+    print("Sharing {0:d} messages below 10**6".format(args.secrets))
+    print("{0:>9}{1:>16}{2:>18}{3:>10}".format("(t, n)", "share /s",
+                                               "share_many /s", "speedup"))
+    for t, n in ((2, 3), (3, 5), (10, 20)):
+        single = best_rate(lambda: [share(m, t, n) for m in messages],
+                           args.secrets, args.repeat)
+        many = best_rate(lambda: share_many(messages, t, n), args.secrets,
+                         args.repeat)
+        print("{0:>9}{1:>16.0f}{2:>18.0f}{3:>9.1f}x".format(
+            "({0}, {1})".format(t, n), single, many, many / single))
+
+    print("\nEvaluating {0:d} polynomials".format(args.secrets))
+    print("{0:>6}{1:>9}{2:>20}{3:>25}{4:>10}".format(
+        "bits", "(t, n)", "produce_shares /s", "produce_shares_many /s",
+        "speedup"))
+    for bits in (31, 61, 127, 521):
+        p = 2**bits - 1
+        for t, n in ((3, 5), (10, 20)):
+            coefs_batch = [[random.randrange(p) for _ in range(t)]
+                           for _ in range(args.secrets)]
+            single = best_rate(lambda: [produce_shares(coefs, n, p)
+                                        for coefs in coefs_batch],
+                               args.secrets, args.repeat)
+            many = best_rate(lambda: produce_shares_many(coefs_batch, n, p),
+                             args.secrets, args.repeat)
+            print("{0:>6}{1:>9}{2:>20.0f}{3:>25.0f}{4:>9.1f}x".format(
+                bits, "({0}, {1})".format(t, n), single, many,
+                many / single))
+
+
+if __name__ == '__main__':
+    main()
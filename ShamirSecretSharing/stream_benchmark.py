@@ -0,0 +1,68 @@
+"""
+Times share_file and reconstruct_file on a file of random bytes, in Mersenne
+fields from 61 to 1279 bits, and reports the throughput in MB/s of payload
+Both work on BLOCK_CHUNKS chunks at a time, so the throughput and the memory
+used are the same for multi-GB files; the peak memory of the process is
+printed at the end to show it
+
+Usage:
+    python stream_benchmark.py [--megabytes M] [--repeat R]
+"""
+
+from __future__ import division, print_function
+import argparse
+import os
+import resource
+import shutil
+import tempfile
+import timeit
+
+from stream_share import share_file, reconstruct_file
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--megabytes', type=float, default=4,
+                        help='size of the file shared')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='number of runs to take the best of')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'payload')
+        size = int(args.megabytes * 2**20)
+        with open(path, 'wb') as f:
+            for _ in range(0, size, 2**20):
+                f.write(os.urandom(min(2**20, size)))
+            f.truncate(size)
+        copy = os.path.join(directory, 'copy')
+
+        print("Sharing {0:g} MB".format(size / 2**20))
+        print("{0:>6}{1:>9}{2:>12}{3:>18}".format("bits", "(t, n)",
+                                                  "share MB/s",
+                                                  "reconstruct MB/s"))
+        for exponent in (61, 127, 521, 1279):
+            for t, n in ((2, 3), (3, 5), (10, 20)):
+                share_paths = []
+                def run_share():
+                    share_paths[:] = share_file(path, t, n,
+                                                exponent=exponent)
+                share_time = min(timeit.repeat(run_share, number=1,
+                                               repeat=args.repeat))
+                reconstruct_time = min(timeit.repeat(
+                    lambda: reconstruct_file(share_paths[-t:], copy),
+                    number=1, repeat=args.repeat))
+                with open(path, 'rb') as f, open(copy, 'rb') as g:
+                    assert f.read() == g.read()
+                print("{0:>6}{1:>9}{2:>12.2f}{3:>18.2f}".format(
+                    exponent, "({0}, {1})".format(t, n),
+                    size / 2**20 / share_time,
+                    size / 2**20 / reconstruct_time))
+    finally:
+        shutil.rmtree(directory)
+    print("\nPeak memory: {0:.0f} MB".format(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,267 @@
+from binascii import hexlify, unhexlify
+from prime import MERSENNE_EXPONENTS, get_field
+from polynomials import (evaluate_many, random_polynomials,
+                         cached_lagrange_weights)
+import os
+import struct
+
+# Every share stream starts with a header:
+#   magic, version, Mersenne exponent of the field, threshold t, the share's
+#   x value and an id shared by all the streams of one sharing
+# then has one value per chunk, and ends with the payload length
+HEADER = struct.Struct('>4sBHHH8s')
+TRAILER = struct.Struct('>Q')
+MAGIC = b'SSSS'
+VERSION = 1
+
+# Chunks shared per batch, which bounds the memory used however long the
+# payload is
+BLOCK_CHUNKS = 1024
+
+"""
+Gets the prime, chunk size and share value size for a Mersenne exponent
+A chunk has fewer bits than p, so every chunk is a valid message
+Parameters:
+    exponent: exponent k of the Mersenne prime 2^k - 1 used as the field size
+Returns:
+    tuple (p, chunk_size, width) where
+        p is the prime
+        chunk_size is the number of payload bytes shared in each value
+        width is the number of bytes each share value is written in
+"""
+
+def field_sizes(exponent):
+    if exponent not in MERSENNE_EXPONENTS or exponent < 13:
+        raise ValueError("{} is not a Mersenne exponent of at least 13".format(
+            exponent))
+    return 2**exponent - 1, (exponent - 1) // 8, (exponent + 7) // 8
+
+"""
+Reads size bytes from a file, fewer only at the end of the file
+"""
+
+def _read_exact(f, size):
+    data = f.read(size)
+    while len(data) < size:
+        more = f.read(size - len(data))
+        if not more:
+            break
+        data += more
+    return data
+
+"""
+Yields the payload in pieces of exactly size bytes, apart from the last
+Parameters:
+    source: file-like object with read, or iterable of byte strings
+    size:   number of bytes in each piece
+Returns:
+    generator of byte strings
+"""
+
+def _read_blocks(source, size):
+    if hasattr(source, 'read'):
+        while True:
+            block = _read_exact(source, size)
+            if block:
+                yield block
+            if len(block) < size:
+                return
+    else:
+        buf = b''
+        for data in source:
+            buf += data
+            while len(buf) >= size:
+                yield buf[:size]
+                buf = buf[size:]
+        if buf:
+            yield buf
+
+def _to_int(data):
+    return int(hexlify(data), 16) if data else 0
+
+def _to_bytes(value, width):
+    return unhexlify('{0:0{1}x}'.format(value, 2 * width))
+
+"""
+Shares a payload in a t-out-of-n shamir sharing scheme, writing the n share
+streams as the payload is read
+The payload is cut into chunks that are each shared as a message in the field
+of the Mersenne prime 2^exponent - 1, BLOCK_CHUNKS chunks at a time, so memory
+use doesn't depend on the payload's length
+Parameters:
+    source:   the payload, as a file-like object with read or an iterable of
+              byte strings
+    t:        The threshold of reconstruction
+    n:        The number of share streams to produce
+    outputs:  list of n writable binary file-like objects, the ith gets the
+              share with x value i + 1
+    exponent: Mersenne exponent of the field
+Returns:
+    length: the number of payload bytes shared
+"""
+
+def share_stream(source, t, n, outputs, exponent=521):
+    if not 1 <= t <= n:
+        raise ValueError("need 1 <= t <= n")
+    if len(outputs) != n:
+        raise ValueError("need one output per share")
+    p, chunk_size, width = field_sizes(exponent)
+    if n >= p:
+        raise ValueError("need n < p, so that the x values are distinct")
+    sharing_id = os.urandom(8)
+    for x, output in enumerate(outputs, 1):
+        output.write(HEADER.pack(MAGIC, VERSION, exponent, t, x, sharing_id))
+
+    length = 0
+    for block in _read_blocks(source, chunk_size * BLOCK_CHUNKS):
+        length += len(block)
+        if len(block) % chunk_size:
+            block += b'\0' * (chunk_size - len(block) % chunk_size)
+        chunks = [_to_int(block[i:i + chunk_size])
+                  for i in range(0, len(block), chunk_size)]
+        y = evaluate_many(random_polynomials(chunks, t, p), n, p)
+        for output, row in zip(outputs, y.tolist()):
+            output.write(b''.join(_to_bytes(value, width) for value in row))
+
+    for output in outputs:
+        output.write(TRAILER.pack(length))
+    return length
+
+"""
+Reads and checks the headers of share streams from the same sharing
+Parameters:
+    inputs: list of readable binary file-like objects, each at the start of a
+            share stream
+Returns:
+    tuple (exponent, t, x) where x is the list of the streams' x values
+"""
+
+def _read_headers(inputs):
+    headers = []
+    for f in inputs:
+        data = _read_exact(f, HEADER.size)
+        if len(data) < HEADER.size:
+            raise ValueError("share stream is too short for a header")
+        headers.append(HEADER.unpack(data))
+    magic, version, exponent, t, _, sharing_id = headers[0]
+    for header in headers:
+        if header[:2] != (MAGIC, VERSION):
+            raise ValueError("not a version {} share stream".format(VERSION))
+        if (header[2], header[3], header[5]) != (exponent, t, sharing_id):
+            raise ValueError("share streams are from different sharings")
+    x = [header[4] for header in headers]
+    if len(set(x)) != len(x):
+        raise ValueError("share streams must have distinct x values")
+    if len(inputs) < t:
+        raise ValueError("need {} share streams, got {}".format(t,
+                                                                len(inputs)))
+    return exponent, t, x
+
+"""
+Reconstructs a payload from share streams written by share_stream, writing it
+out as the streams are read
+Only the first t streams are read, and the Lagrange weights of their x values
+are worked out once, so each chunk costs a weighted sum of t values
+Parameters:
+    inputs: list of at least t readable binary file-like objects, each at the
+            start of a different share stream of the same sharing
+    output: writable binary file-like object the payload is written to
+Returns:
+    length: the number of payload bytes written
+"""
+
+def reconstruct_stream(inputs, output):
+    exponent, t, x = _read_headers(inputs)
+    inputs, x = inputs[:t], x[:t]
+    p, chunk_size, width = field_sizes(exponent)
+    weights = cached_lagrange_weights(x, p)
+    reduce = get_field(p).reduce
+    limit = 256 ** chunk_size
+    block_size = width * BLOCK_CHUNKS
+
+    # The last chunk is held back until the trailer says how much of it is
+    # padding, and so are the bytes that might be the trailer
+    pending = [b''] * t
+    last_chunk = b''
+    written = 0
+    while True:
+        blocks = [pending[i] + _read_exact(f, block_size + TRAILER.size -
+                                                len(pending[i]))
+                  for i, f in enumerate(inputs)]
+        if len(set(len(block) for block in blocks)) != 1:
+            raise ValueError("share streams have different lengths")
+        done = len(blocks[0]) < block_size + TRAILER.size
+        usable = len(blocks[0]) - TRAILER.size
+        if not done:
+            usable -= usable % width
+        elif usable < 0 or usable % width:
+            raise ValueError("share stream is truncated")
+        pending = [block[usable:] for block in blocks]
+
+        values = [[_to_int(block[i:i + width])
+                   for i in range(0, usable, width)] for block in blocks]
+        chunks = []
+        for y in zip(*values):
+            m = reduce(sum(w * y_i for w, y_i in zip(weights, y)))
+            if m >= limit:
+                raise ValueError("shares don't reconstruct a valid chunk")
+            chunks.append(_to_bytes(m, chunk_size))
+        if chunks:
+            output.write(last_chunk + b''.join(chunks[:-1]))
+            written += len(last_chunk) + chunk_size * (len(chunks) - 1)
+            last_chunk = chunks[-1]
+        if done:
+            break
+
+    lengths = set(TRAILER.unpack(trailer)[0] for trailer in pending)
+    if len(lengths) != 1:
+        raise ValueError("share streams disagree on the payload length")
+    length = lengths.pop()
+    tail = length - written
+    if not 0 <= tail <= len(last_chunk) or (last_chunk and tail == 0):
+        raise ValueError("payload length doesn't match the share streams")
+    output.write(last_chunk[:tail])
+    return length
+
+"""
+Shares a file in a t-out-of-n shamir sharing scheme
+Parameters:
+    path:        path of the file to share
+    t:           The threshold of reconstruction
+    n:           The number of shares to produce
+    share_paths: list of n paths to write the shares to, by default
+                 path.share1 to path.sharen
+    exponent:    Mersenne exponent of the field
+Returns:
+    share_paths: the paths the shares were written to
+"""
+
+def share_file(path, t, n, share_paths=None, exponent=521):
+    if share_paths is None:
+        share_paths = ['{}.share{}'.format(path, x) for x in range(1, n + 1)]
+    outputs = [open(share_path, 'wb') for share_path in share_paths]
+    try:
+        with open(path, 'rb') as source:
+            share_stream(source, t, n, outputs, exponent)
+    finally:
+        for output in outputs:
+            output.close()
+    return share_paths
+
+"""
+Reconstructs a file shared with share_file
+Parameters:
+    share_paths: list of paths of at least t shares of the file
+    path:        path to write the file to
+Returns:
+    length: the number of bytes written
+"""
+
+def reconstruct_file(share_paths, path):
+    inputs = [open(share_path, 'rb') for share_path in share_paths]
+    try:
+        with open(path, 'wb') as output:
+            return reconstruct_stream(inputs, output)
+    finally:
+        for f in inputs:
+            f.close()
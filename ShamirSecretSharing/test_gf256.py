@@ -0,0 +1,107 @@
+from gf256 import (GF256, EXP, LOG, MUL, gf_mul, gf_inverse,
+                   gf_lagrange_weights, wide_table, share_bytes,
+                   reconstruct_bytes)
+from shamir_share import share, reconstruct
+import gf256
+import os
+import random
+
+"""
+Multiplies two bytes as polynomials over GF(2), reducing by the AES
+polynomial, one bit at a time
+"""
+
+def slow_mul(a, b):
+    product = 0
+    while b:
+        if b & 1:
+            product ^= a
+        a <<= 1
+        if a & 0x100:
+            a ^= 0x11b
+        b >>= 1
+    return product
+
+print "Testing field arithmetic"
+assert gf_mul(0x57, 0x83) == 0xc1
+assert sorted(EXP[:255]) == range(1, 256)
+for a in range(256):
+    for b in range(256):
+        assert MUL[a, b] == slow_mul(a, b)
+for a in range(1, 256):
+    assert gf_mul(a, gf_inverse(a)) == 1
+    assert EXP[LOG[a]] == a
+try:
+    gf_inverse(0)
+    assert False
+except ValueError:
+    pass
+for a in (0, 1, 2, 0x53, 255):
+    table = wide_table(a)
+    for pair in (0, 1, 0x100, 0x1234, 0xffff):
+        assert table[pair] == (slow_mul(a, pair >> 8) << 8 |
+                               slow_mul(a, pair & 255))
+
+print "Testing weights sum to one"
+for _ in range(20):
+    x = random.sample(range(1, 256), random.randint(1, 20))
+    total = 0
+    for w in gf_lagrange_weights(x):
+        total ^= w
+    assert total == 1
+for x in ([1, 1], [0, 1], [1, 256]):
+    try:
+        gf_lagrange_weights(x)
+        assert False
+    except ValueError:
+        pass
+
+print "Testing any t shares reconstruct"
+# Small blocks so that messages span several of them
+gf256.BLOCK_PAIRS = 8
+for length in (0, 1, 2, 15, 16, 17, 1001):
+    message = os.urandom(length)
+    for t, n in ((1, 1), (1, 4), (2, 3), (5, 9), (30, 255)):
+        shares = share_bytes(message, t, n)
+        assert [x for x, _ in shares] == range(1, n + 1)
+        assert all(len(y) == length for _, y in shares)
+        assert reconstruct_bytes(random.sample(shares, t)) == message
+        assert reconstruct_bytes(shares) == message
+        if t > 1 and length > 8:
+            assert reconstruct_bytes(random.sample(shares, t - 1)) != message
+gf256.BLOCK_PAIRS = 32768
+assert reconstruct_bytes(share_bytes(bytearray(b'abc'), 2, 2)) == b'abc'
+for t, n in ((0, 3), (3, 2), (2, 256)):
+    try:
+        share_bytes(b'abc', t, n)
+        assert False
+    except ValueError:
+        pass
+try:
+    reconstruct_bytes([(1, b'ab'), (2, b'abc')])
+    assert False
+except ValueError:
+    pass
+
+print "Testing t - 1 shares say nothing about a byte"
+# With one share of a 2-out-of-n sharing, every byte value is as likely
+counts = [0] * 256
+for y in bytearray(share_bytes(b'\0' * 256000, 2, 3)[1][1]):
+    counts[y] += 1
+assert min(counts) > 800 and max(counts) < 1200
+
+print "Testing the field choice of share and reconstruct"
+message = os.urandom(100)
+shares, p = share(message, 3, 5, field=GF256)
+assert p == GF256
+assert reconstruct(random.sample(shares, 3), p) == message
+shares, p = share(12345, 3, 5)
+assert p != GF256
+assert reconstruct(shares[:3], p) == 12345
+try:
+    share(12345, 3, 5, field='gf65536')
+    assert False
+except ValueError:
+    pass
+
+print "All tests successful!"
@@ -0,0 +1,216 @@
+from polynomials import (get_random_coefs, get_random_coefs_batch,
+                         random_field_elements, random_polynomials,
+                         produce_shares, produce_shares_many, interpolate,
+                         lagrange_weights, mod_inverse,
+                         cached_lagrange_weights, clear_weight_cache)
+from shamir_share import share, reconstruct, reconstruct_many, share_many
+import polynomials
+import numpy as np
+import random
+import subprocess
+import sys
+
+"""
+Evaluates the polynomial with the given coefficients at x = 1..n with Python
+integers, reducing mod p at every step, as a reference to check
+produce_shares' deferred reduction against
+"""
+
+def exact_shares(coefs, n, p):
+    shares = []
+    for x in range(1, n + 1):
+        y = 0
+        for c in reversed(coefs):
+            y = (y * x + c) % p
+        shares.append((x, y))
+    return shares
+
+print "Testing modular inverses"
+for p in (7, 2**61 - 1, 2**521 - 1):
+    for a in (1, 2, p - 1, random.randrange(1, p)):
+        assert a * mod_inverse(a, p) % p == 1
+try:
+    mod_inverse(14, 7)
+    assert False
+except ValueError:
+    pass
+
+print "Testing random coefficients"
+for p in (7, 11, 2**31 - 1, 2**61 - 1, 2**63 - 25, 2**127 - 1, 2**521 - 1):
+    single = get_random_coefs(5, p)
+    assert len(single) == 4 and all(type(c) in (int, long) for c in single)
+    coefs = get_random_coefs_batch(3000, 4, p)
+    assert coefs.shape == (3000, 3)
+    assert coefs.dtype == (object if p >= 2**63 else np.int64)
+    assert 0 <= coefs.min() and coefs.max() < p
+    values = random_field_elements(3000, p)
+    assert 0 <= min(values) and max(values) < p
+    # As many values as expected have the top bit of p set
+    top = 2**(p.bit_length() - 1)
+    expected = 3000.0 * (p - top) / p
+    assert abs(sum(1 for v in values if v >= top) - expected) < 200
+    assert abs((coefs >= top).sum() / 3.0 - expected) < 200
+# Every value below p is as likely, including when most draws are rejected
+for p in (7, 11, 17):
+    for values in (random_field_elements(17000, p),
+                   get_random_coefs_batch(17000, 2, p).ravel()):
+        counts = np.bincount(values, minlength=p)
+        assert len(counts) == p and 17000.0 / p * 0.85 < counts.min()
+        assert counts.max() < 17000.0 / p * 1.15
+assert get_random_coefs(1, 7) == []
+assert get_random_coefs_batch(0, 3, 2**127 - 1).shape == (0, 2)
+coefs = random_polynomials([1, 2, 3], 4, 2**521 - 1)
+assert coefs.shape == (3, 4) and list(coefs[:, 0]) == [1, 2, 3]
+
+print "Testing weights sum to one"
+# The constant polynomial 1 interpolates to 1 at zero
+for p in (127, 2**127 - 1):
+    x = random.sample(range(1, 127), 20)
+    assert sum(lagrange_weights(x, p)) % p == 1
+
+print "Testing repeated x values are rejected"
+for x in ([1, 2, 1], [1, 8]):
+    try:
+        lagrange_weights(x, 7)
+        assert False
+    except ValueError:
+        pass
+
+print "Testing produce_shares output reconstructs exactly"
+p = 2**31 - 1
+for t in range(1, 6):
+    for _ in range(200):
+        message = random.randrange(p)
+        coefs = [message] + get_random_coefs(t, p)
+        shares = produce_shares(coefs, 10, p)
+        assert interpolate(random.sample(shares, t), p) == message
+
+print "Testing Mersenne fields up to 1279 bits"
+for exponent in (61, 127, 521, 1279):
+    p = 2**exponent - 1
+    for t, n in ((2, 3), (5, 9), (50, 60), (200, 200)):
+        message = random.randrange(p)
+        coefs = [message] + [random.randrange(p) for _ in range(t - 1)]
+        shares = exact_shares(coefs, n, p)
+        sample = random.sample(shares, t)
+        assert interpolate(sample, p) == message
+        # Any t shares give the message, t - 1 don't
+        assert interpolate(shares[-t:], p) == message
+        if t > 1:
+            assert interpolate(sample[1:], p) != message
+    print "{} bits: OK".format(exponent)
+
+print "Testing cached weights"
+clear_weight_cache()
+p = 2**127 - 1
+x = [3, 1, 4]
+weights = cached_lagrange_weights(x, p)
+assert list(weights) == lagrange_weights(x, p)
+assert cached_lagrange_weights([3, 1, 4], p) is weights
+assert cached_lagrange_weights([1, 3, 4], p) is not weights
+assert cached_lagrange_weights(x, 2**61 - 1) != weights
+# The least recently used weights are dropped once the cache is full
+polynomials.WEIGHT_CACHE_SIZE = 3
+clear_weight_cache()
+for x in ([1, 2], [1, 3], [1, 4], [1, 2], [1, 5]):
+    cached_lagrange_weights(x, p)
+assert len(polynomials._weight_cache) == 3
+assert ((1, 3), p) not in polynomials._weight_cache
+assert ((1, 2), p) in polynomials._weight_cache
+polynomials.WEIGHT_CACHE_SIZE = 0
+clear_weight_cache()
+assert cached_lagrange_weights([1, 2], p) == tuple(lagrange_weights([1, 2], p))
+assert len(polynomials._weight_cache) == 0
+polynomials.WEIGHT_CACHE_SIZE = 256
+
+print "Testing batch reconstruction"
+for exponent in (31, 521):
+    p = 2**exponent - 1
+    messages = []
+    batch = []
+    holders = [random.sample(range(1, 11), 4) for _ in range(3)]
+    for i in range(300):
+        message = random.randrange(p)
+        coefs = [message] + [random.randrange(p) for _ in range(3)]
+        shares = exact_shares(coefs, 10, p)
+        messages.append(message)
+        batch.append([shares[x - 1] for x in random.choice(holders)])
+    assert reconstruct_many(batch, p) == messages
+    assert [reconstruct(shares, p) for shares in batch] == messages
+assert reconstruct_many([], p) == []
+
+print "Testing shares are exact in large fields"
+for exponent in (31, 61, 127, 521):
+    p = 2**exponent - 1
+    for t, n in ((1, 1), (2, 5), (10, 30)):
+        coefs_batch = [[random.randrange(p) for _ in range(t)]
+                       for _ in range(50)]
+        shares_batch = produce_shares_many(coefs_batch, n, p)
+        assert len(shares_batch) == 50
+        for coefs, shares in zip(coefs_batch, shares_batch):
+            assert produce_shares(coefs, n, p) == exact_shares(coefs, n, p)
+            assert shares == exact_shares(coefs, n, p)
+# p * (n + 1) just fits in an int64, and just doesn't
+for p, n in ((2**59 - 1, 15), (2**61 - 1, 15)):
+    coefs = [p - 1] * 5
+    assert produce_shares_many([coefs], n, p) == [exact_shares(coefs, n, p)]
+assert produce_shares_many([], 5, 7) == []
+# Coefficients too big for an int64 are reduced first
+coefs = [2**64 + 1, 2**70, -1]
+assert produce_shares_many([coefs], 5, 127) == [exact_shares(coefs, 5, 127)]
+
+print "Testing batch sharing"
+messages = [random.randrange(10**6) for _ in range(500)]
+shares_batch, p = share_many(messages, 3, 5)
+assert [len(shares) for shares in shares_batch] == [5] * 500
+assert reconstruct_many([random.sample(shares, 3) for shares in shares_batch],
+                        p) == messages
+assert share_many(messages, 6, 5) is None
+
+print "Testing batches split over processes"
+messages = [10**6] * 4000 + [random.randrange(10**6) for _ in range(3000)]
+shares_batch, p = share_many(messages, 3, 5, workers=3)
+assert len(shares_batch) == len(messages)
+# Workers don't draw the same coefficients as each other
+assert len(set(tuple(shares) for shares in shares_batch[:4000])) == 4000
+samples = [random.sample(shares, 3) for shares in shares_batch]
+assert reconstruct_many(samples, p, workers=3) == messages
+assert reconstruct_many(samples, p, workers=2) == \
+    reconstruct_many(samples, p)
+assert share_many([], 2, 3, workers=2)[0] == []
+assert reconstruct_many([], p, workers=2) == []
+
+print "Testing fields smaller than n"
+# share(1, 2, 5) used to share over p = 3, where x = 3 is 0 mod p and its
+# share is the message
+for message in range(10):
+    for n in range(1, 40):
+        t = random.randint(1, n)
+        shares, p = share(message, t, n)
+        assert p > max(message, n)
+        assert len(set(x % p for x, _ in shares)) == n
+        assert reconstruct(random.sample(shares, t), p) == message
+
+# share_many([0, 1, 2], 2, 4) used to share over p = 3 too
+for n in range(2, 40):
+    messages = [random.randrange(4) for _ in range(20)]
+    shares_batch, p = share_many(messages, 2, n)
+    assert p > n
+    for shares in shares_batch:
+        assert len(set(x % p for x, _ in shares)) == n
+    samples = [random.sample(shares, 2) for shares in shares_batch]
+    assert reconstruct_many(samples, p) == messages
+
+print "Testing that one secret needs no NumPy"
+lazy = subprocess.check_output([sys.executable, '-c', """
+import sys
+from shamir_share import share, reconstruct, reconstruct_many
+shares, p = share(1234, 3, 5)
+assert reconstruct(shares[:3], p) == 1234
+assert reconstruct_many([shares[:3], shares[2:]], p) == [1234, 1234]
+print sorted(m for m in ('numpy', 'gf256', 'multiprocessing')
+             if m in sys.modules)
+"""])
+assert lazy.strip() == '[]'
+
+print "All tests successful!"
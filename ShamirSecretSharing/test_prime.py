@@ -0,0 +1,66 @@
+from prime import (MERSENNE_EXPONENTS, MERSENNE_PRIMES, FOLD_BITS,
+                   get_larger_prime, get_field, MersenneField,
+                   is_probable_prime)
+import numpy as np
+import random
+
+print "Testing the prime table"
+assert MERSENNE_PRIMES == tuple(sorted(MERSENNE_PRIMES))
+for p in MERSENNE_PRIMES[:8]:
+    assert all(p % d for d in range(2, int(p ** 0.5) + 1))
+for p in MERSENNE_PRIMES[2:]:
+    # Fermat's little theorem, for the primes too big to divide out
+    assert pow(3, p - 1, p) == 1
+
+print "Testing the primality test"
+for n in range(-2, 5000):
+    assert is_probable_prime(n) == (n > 1 and all(n % d for d in range(2, n)))
+# The largest take seconds each, and are checked by Fermat's test above
+for p in MERSENNE_PRIMES[:15]:
+    assert is_probable_prime(p)
+# Carmichael numbers fool the Fermat test, and the rest are 2^k - 1 for prime
+# k that aren't Mersenne primes
+for n in [561, 1105, 1729, 2465, 41041, 825265, 321197185]:
+    assert not is_probable_prime(n)
+for ex in (11, 23, 29, 37, 41, 43, 47, 53, 59, 67, 71, 101, 523):
+    assert not is_probable_prime(2**ex - 1)
+assert not is_probable_prime(MERSENNE_PRIMES[12] * MERSENNE_PRIMES[14])
+
+print "Testing field selection"
+assert get_larger_prime(0) == 3
+assert get_larger_prime(2) == 3
+assert get_larger_prime(3) == 7
+assert get_larger_prime(10**6) == 2**31 - 1
+assert get_larger_prime(np.int64(10**6)) == 2**31 - 1
+for _ in range(1000):
+    n = random.randrange(MERSENNE_PRIMES[-1])
+    p = get_larger_prime(n)
+    assert n < p and not any(n < q < p for q in MERSENNE_PRIMES)
+# The same message always gets the same prime
+assert [get_larger_prime(100) for _ in range(50)] == [127] * 50
+try:
+    get_larger_prime(MERSENNE_PRIMES[-1])
+    assert False
+except ValueError:
+    pass
+
+print "Testing reduction"
+assert isinstance(get_field(7), MersenneField)
+assert not isinstance(get_field(11), MersenneField)
+assert get_field(2**521 - 1) is get_field(2**521 - 1)
+assert get_field(2**521 - 1).reduce == get_field(2**521 - 1).fold
+assert get_field(2**127 - 1).reduce != get_field(2**127 - 1).fold
+for ex in MERSENNE_EXPONENTS:
+    field = get_field(2**ex - 1)
+    p = field.p
+    assert field.exponent == ex
+    values = [0, 1, p - 1, p, p + 1, 2 * p, p * p, p ** 3 + 5, -1, -p, -p - 1]
+    values += [random.randrange(-p ** 3, p ** 3) for _ in range(100)]
+    values += [random.randrange(p) * random.randrange(p) for _ in range(100)]
+    for x in values:
+        assert field.reduce(x) == x % p
+        assert field.fold(x) == x % p
+assert get_field(11).reduce(-25) == 8
+print "Shift and add from {} bits: OK".format(FOLD_BITS)
+
+print "All tests successful!"
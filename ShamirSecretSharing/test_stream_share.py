@@ -0,0 +1,136 @@
+from io import BytesIO
+from stream_share import (share_stream, reconstruct_stream, share_file,
+                          reconstruct_file, field_sizes)
+import stream_share
+import os
+import random
+import shutil
+import tempfile
+
+"""
+File-like object that returns at most a few bytes per read, like a pipe
+"""
+
+class TrickleReader():
+    def __init__(self, data):
+        self.f = BytesIO(data)
+
+    def read(self, size):
+        return self.f.read(min(size, random.randint(1, 7)))
+
+def share_bytes(payload, t, n, exponent):
+    outputs = [BytesIO() for _ in range(n)]
+    assert share_stream(BytesIO(payload), t, n, outputs, exponent) == \
+        len(payload)
+    return [output.getvalue() for output in outputs]
+
+def reconstruct_bytes(shares):
+    output = BytesIO()
+    length = reconstruct_stream([BytesIO(s) for s in shares], output)
+    assert length == len(output.getvalue())
+    return output.getvalue()
+
+def raises_value_error(shares):
+    try:
+        reconstruct_bytes(shares)
+        return False
+    except ValueError:
+        return True
+
+# Small blocks so that payloads span many of them
+stream_share.BLOCK_CHUNKS = 4
+
+print "Testing field sizes"
+assert field_sizes(521) == (2**521 - 1, 65, 66)
+assert field_sizes(13) == (2**13 - 1, 1, 2)
+for exponent in (7, 11, 600):
+    try:
+        field_sizes(exponent)
+        assert False
+    except ValueError:
+        pass
+
+print "Testing payloads of every awkward length"
+for exponent in (13, 61, 127, 521, 1279):
+    _, chunk_size, _ = field_sizes(exponent)
+    block_size = chunk_size * stream_share.BLOCK_CHUNKS
+    for length in (0, 1, chunk_size - 1, chunk_size, chunk_size + 1,
+                   block_size - 1, block_size, block_size + 1,
+                   3 * block_size + 5):
+        payload = os.urandom(length)
+        shares = share_bytes(payload, 3, 5, exponent)
+        assert len(set(len(s) for s in shares)) == 1
+        assert reconstruct_bytes(random.sample(shares, 3)) == payload
+        assert reconstruct_bytes(shares) == payload
+    print "{} bits: OK".format(exponent)
+
+print "Testing any t share streams reconstruct"
+payload = os.urandom(2000)
+for t, n in ((1, 1), (1, 3), (2, 2), (4, 9)):
+    shares = share_bytes(payload, t, n, 127)
+    for _ in range(5):
+        assert reconstruct_bytes(random.sample(shares, t)) == payload
+
+print "Testing sources and streams that come in small pieces"
+pieces = [os.urandom(random.randint(0, 50)) for _ in range(100)]
+payload = b''.join(pieces)
+outputs = [BytesIO() for _ in range(4)]
+assert share_stream(iter(pieces), 2, 4, outputs, 61) == len(payload)
+shares = [output.getvalue() for output in outputs]
+assert share_bytes(payload, 2, 4, 61)[0] != shares[0]
+output = BytesIO()
+reconstruct_stream([TrickleReader(s) for s in shares[2:]], output)
+assert output.getvalue() == payload
+outputs = [BytesIO() for _ in range(4)]
+share_stream(TrickleReader(payload), 2, 4, outputs, 61)
+assert reconstruct_bytes([o.getvalue() for o in outputs[:2]]) == payload
+
+print "Testing bad share streams are rejected"
+payload = os.urandom(500)
+shares = share_bytes(payload, 3, 5, 127)
+other = share_bytes(payload, 3, 5, 127)
+assert raises_value_error(shares[:2])
+assert raises_value_error([shares[0], shares[0], shares[1]])
+assert raises_value_error(shares[:2] + other[2:3])
+assert raises_value_error([shares[0], shares[1], shares[2][:-1]])
+assert raises_value_error([s[:-20] for s in shares[:3]])
+assert raises_value_error([b'XXXX' + s[4:] for s in shares[:3]])
+assert raises_value_error([b''] * 3)
+for t, n, outputs in ((3, 2, [BytesIO()] * 2), (2, 3, [BytesIO()] * 2)):
+    try:
+        share_stream(BytesIO(payload), t, n, outputs)
+        assert False
+    except ValueError:
+        pass
+# x = 8191 is 0 in the 13-bit field
+try:
+    share_stream(BytesIO(payload), 2, 2**13 - 1, [BytesIO()] * (2**13 - 1),
+                 exponent=13)
+    assert False
+except ValueError:
+    pass
+# t - 1 share streams and a wrong one don't give the payload back
+forged = shares[2][:stream_share.HEADER.size] + \
+         os.urandom(len(shares[2]) - stream_share.HEADER.size -
+                    stream_share.TRAILER.size) + \
+         shares[2][-stream_share.TRAILER.size:]
+assert raises_value_error(shares[:2] + [forged]) or \
+    reconstruct_bytes(shares[:2] + [forged]) != payload
+
+print "Testing files"
+directory = tempfile.mkdtemp()
+try:
+    path = os.path.join(directory, 'secret.bin')
+    payload = os.urandom(10000)
+    with open(path, 'wb') as f:
+        f.write(payload)
+    share_paths = share_file(path, 3, 6)
+    assert share_paths == [path + '.share' + str(x) for x in range(1, 7)]
+    copy = os.path.join(directory, 'copy.bin')
+    assert reconstruct_file(share_paths[3:], copy) == len(payload)
+    with open(copy, 'rb') as f:
+        assert f.read() == payload
+finally:
+    shutil.rmtree(directory)
+
+print "All tests successful!"
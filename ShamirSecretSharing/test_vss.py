@@ -0,0 +1,76 @@
+from vss import (GROUP_BITS, MIN_PRIME, get_group, multi_exp,
+                 share_verifiable, verify_share, verify_shares)
+from prime import is_probable_prime
+from shamir_share import reconstruct
+import random
+
+# A small group keeps the tests quick, the default one is only built once
+BITS = 640
+
+print "Testing the commitment group"
+for p, bits in ((MIN_PRIME, BITS), (MIN_PRIME, GROUP_BITS), (2**127 - 1, 256)):
+    q, g = get_group(p, bits)
+    assert is_probable_prime(q)
+    assert (q - 1) % p == 0 and abs(q.bit_length() - bits) <= 1
+    assert g != 1 and pow(g, p, q) == 1
+    assert get_group(p, bits) == (q, g)
+try:
+    get_group(MIN_PRIME, 521)
+    assert False
+except ValueError:
+    pass
+
+print "Testing multi-exponentiation"
+q, g = get_group(MIN_PRIME, BITS)
+for m in (0, 1, 2, 5, 20):
+    bases = [random.randrange(q) for _ in range(m)]
+    exponents = [random.choice([0, 1, 15, 16, random.randrange(MIN_PRIME)])
+                 for _ in range(m)]
+    product = 1
+    for b, e in zip(bases, exponents):
+        product = product * pow(b, e, q) % q
+    assert multi_exp(bases, exponents, q) == product
+
+print "Testing verifiable sharing"
+for t, n in ((1, 1), (1, 4), (2, 3), (3, 5), (10, 20)):
+    message = random.getrandbits(random.choice([8, 100, 500]))
+    shares, p, commitments = share_verifiable(message, t, n, BITS)
+    assert p >= MIN_PRIME and message < p and len(commitments) == t
+    q_p, g_p = get_group(p, BITS)
+    assert commitments[0] == pow(g_p, message, q_p)
+    assert reconstruct(random.sample(shares, t), p) == message
+    assert all(verify_share(s, commitments, p, BITS) for s in shares)
+    assert verify_shares(shares, commitments, p, BITS)
+    assert verify_shares(shares[:1], commitments, p, BITS)
+    assert verify_shares([], commitments, p, BITS)
+
+    # A share off by any amount fails both checks, wherever it is
+    for _ in range(5):
+        bad = list(shares)
+        i = random.randrange(n)
+        x, y = bad[i]
+        bad[i] = (x, (y + random.randrange(1, p)) % p)
+        assert not verify_share(bad[i], commitments, p, BITS)
+        assert not verify_shares(bad, commitments, p, BITS)
+    if t > 1:
+        x, y = shares[0]
+        assert not verify_share((x + 1, y), commitments, p, BITS)
+
+    # So does a changed commitment, and one outside the group of order p
+    bad = list(commitments)
+    bad[-1] = bad[-1] * g_p % q_p
+    assert not verify_shares(shares, bad, p, BITS)
+    bad[-1] = commitments[-1] * (q_p - 1) % q_p
+    assert not verify_shares(shares, bad, p, BITS)
+try:
+    share_verifiable(5, 3, 2, BITS)
+    assert False
+except ValueError:
+    pass
+
+print "Testing the default group"
+shares, p, commitments = share_verifiable(12345, 3, 5)
+assert verify_shares(shares, commitments, p)
+assert all(verify_share(s, commitments, p) for s in shares)
+
+print "All tests successful!"
@@ -0,0 +1,186 @@
+from binascii import hexlify
+from prime import get_larger_prime, is_probable_prime
+from polynomials import get_random_coefs, produce_shares
+import os
+
+# Bits of the modulus q of the commitment group. The discrete logarithm in the
+# integers modulo q has to be hard, so this is well above the field's bits
+GROUP_BITS = 2048
+# Messages are shared in at least this field. The commitments are in a
+# subgroup of order p, where Pollard's rho takes a discrete logarithm in about
+# sqrt(p) steps, so p needs 256 bits for 128-bit security, and this is the
+# first Mersenne prime that large. It says nothing about guessing: see
+# share_verifiable
+MIN_PRIME = 2**521 - 1
+# Size of the random multipliers of the batch check. A bad share gets past it
+# with probability at most 2^-BATCH_BITS
+BATCH_BITS = 64
+# Bits of the exponents taken at a time by multi_exp
+WINDOW = 4
+
+_groups = {}
+
+"""
+Finds a group to commit to coefficients in GF(p) with: the subgroup of order
+p of the integers modulo a prime q = k * p + 1
+k starts at the power of two that gives q about bits bits and goes up by 2
+until q is prime, so the same p and bits always give the same group, and a
+share holder can find it from them without trusting the dealer. Groups are
+found once for each p and bits and kept
+Parameters:
+    p:    the prime used as the field size
+    bits: size of q in bits, at least 64 more than p
+Returns:
+    tuple (q, g) where
+        q is the prime modulus
+        g generates the subgroup of order p
+"""
+
+def get_group(p, bits=GROUP_BITS):
+    group = _groups.get((p, bits))
+    if group is None:
+        if bits < p.bit_length() + 64:
+            raise ValueError("the group needs at least {} bits".format(
+                p.bit_length() + 64))
+        k = 2**(bits - p.bit_length())
+        while not is_probable_prime(k * p + 1):
+            k += 2
+        q = k * p + 1
+        h = 2
+        while pow(h, k, q) == 1:
+            h += 1
+        group = _groups[(p, bits)] = (q, pow(h, k, q))
+    return group
+
+"""
+Computes the product of bases[i]^exponents[i] modulo q with simultaneous
+multi-exponentiation
+Every base gets a table of its first 2^WINDOW powers, then the exponents are
+read WINDOW bits at a time from the top, squaring the running product WINDOW
+times and multiplying in one table entry per base for each window. All the
+bases share the squarings, so m exponentiations cost about as many squarings
+as one, plus one multiplication per base and window
+Parameters:
+    bases:     list of integers
+    exponents: list of non-negative integers, one per base
+    q:         the modulus
+Returns:
+    product: integer in [0, q)
+"""
+
+def multi_exp(bases, exponents, q):
+    top = max(e.bit_length() for e in exponents) if exponents else 0
+    mask = 2**WINDOW - 1
+    tables = []
+    for b, e in zip(bases, exponents):
+        # A table only needs the powers the windows of its exponent can pick
+        size = min(mask, e)
+        row = [1, b % q]
+        for _ in range(size - 1):
+            row.append(row[-1] * row[1] % q)
+        tables.append(row)
+    result = 1
+    for shift in range((top - 1) // WINDOW * WINDOW, -1, -WINDOW):
+        if result != 1:
+            for _ in range(WINDOW):
+                result = result * result % q
+        for row, e in zip(tables, exponents):
+            digit = (e >> shift) & mask
+            if digit:
+                result = result * row[digit] % q
+    return result % q
+
+"""
+Produces the shares in a t-out-of-n Feldman verifiable sharing scheme of a
+message, that is a shamir sharing together with a commitment to every
+coefficient of the polynomial
+The commitment to a coefficient a is g^a modulo q, in the group from
+get_group, so anyone can check that a share is a point of the polynomial
+committed to without learning the coefficients
+The commitment to the message is g^message, so anyone can test a guess at
+the message against it, in a field of any size. It only hides messages with
+enough entropy that they can't be guessed, such as random keys
+Parameters:
+    message: The message to be encoded and shared. Must be an integer.
+    t:       The threshold of reconstruction
+    n:       The number of shares to produce
+    bits:    size of the commitment group's modulus in bits
+Returns:
+    tuple (shares, p, commitments) where
+        shares and p are as from shamir_share.share
+        commitments is a list of t integers, the commitment to coefs[j]
+            being commitments[j]
+"""
+
+def share_verifiable(message, t, n, bits=GROUP_BITS):
+    if n < t:
+        raise ValueError("n < t")
+    p = max(get_larger_prime(message), MIN_PRIME)
+    q, g = get_group(p, bits)
+    coefs = [message] + get_random_coefs(t, p)
+    shares = produce_shares(coefs, n, p)
+    commitments = [pow(g, a, q) for a in coefs]
+    return shares, p, commitments
+
+"""
+Checks one share against the commitments to its polynomial, by testing that
+g^y = product of commitments[j]^(x^j) modulo q with one multi_exp
+Parameters:
+    share:       (x, y) share from share_verifiable
+    commitments: the commitments from share_verifiable
+    p:           the prime associated with the sharing scheme
+    bits:        size of the commitment group's modulus in bits
+Returns:
+    valid: True if the share is a point of the polynomial committed to
+"""
+
+def verify_share(share, commitments, p, bits=GROUP_BITS):
+    q, g = get_group(p, bits)
+    x, y = share
+    # g^-y is g^(p - y), as g has order p
+    exponents = [(-y) % p]
+    x_j = 1
+    for _ in commitments:
+        exponents.append(x_j)
+        x_j = x_j * x % p
+    return multi_exp([g] + list(commitments), exponents, q) == 1
+
+"""
+Checks many shares of the same polynomial at once against its commitments
+Each share i gets a random multiplier r_i of BATCH_BITS bits, and the checks
+of verify_share raised to the r_i are multiplied together into one:
+    g^(sum r_i y_i) = product of commitments[j]^(sum r_i x_i^j) modulo q
+which holds for valid shares, and fails with probability at least
+1 - 2^-BATCH_BITS if any share is bad. This is a single multi_exp of t + 1
+bases whatever the number of shares, instead of one per share
+The random multipliers only catch bad shares if the commitments are in the
+subgroup of order p, so each one is checked with an exponentiation first
+Parameters:
+    shares:      list of (x, y) shares from share_verifiable
+    commitments: the commitments from share_verifiable
+    p:           the prime associated with the sharing scheme
+    bits:        size of the commitment group's modulus in bits
+Returns:
+    valid: True if every share is a point of the polynomial committed to
+"""
+
+def verify_shares(shares, commitments, p, bits=GROUP_BITS):
+    q, g = get_group(p, bits)
+    for c in commitments:
+        if not 0 < c < q or pow(c, p, q) != 1:
+            return False
+    if not shares:
+        return True
+    data = hexlify(os.urandom(BATCH_BITS // 8 * len(shares)))
+    width = BATCH_BITS // 4
+    y_sum = 0
+    exponents = [0] * len(commitments)
+    for i, (x, y) in enumerate(shares):
+        r = int(data[i * width:(i + 1) * width], 16)
+        y_sum += r * y
+        x_j = r
+        for j in range(len(commitments)):
+            exponents[j] += x_j
+            x_j = x_j * x % p
+    exponents = [(-y_sum) % p] + [e % p for e in exponents]
+    return multi_exp([g] + list(commitments), exponents, q) == 1
@@ -0,0 +1,54 @@
+"""
+Times checking all n shares of a Feldman verifiable sharing one at a time
+with verify_share against all at once with verify_shares, which folds them
+into a single multi-exponentiation with random multipliers, for n up to 1000
+Everything runs on Python integers in the group from get_group
+
+Usage:
+    python vss_benchmark.py [--bits B] [--repeat R]
+"""
+
+from __future__ import division, print_function
+import argparse
+import timeit
+
+from vss import (GROUP_BITS, MIN_PRIME, get_group, share_verifiable,
+                 verify_share, verify_shares)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--bits', type=int, default=GROUP_BITS,
+                        help='size of the commitment group modulus')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='number of runs of the batch check to take the '
+                             'best of')
+    args = parser.parse_args()
+
+    group_time = timeit.timeit(lambda: get_group(MIN_PRIME, args.bits),
+                               number=1)
+    print("Finding the {0:d}-bit group took {1:.2f} s, once".format(
+        args.bits, group_time))
+    print("{0:>5}{1:>6}{2:>14}{3:>16}{4:>14}{5:>10}".format(
+        "t", "n", "share (ms)", "one by one (ms)", "batch (ms)", "speedup"))
+    for t in (3, 10):
+        for n in (10, 100, 1000):
+            result = []
+            def run_share():
+                result[:] = share_verifiable(2**100, t, n, args.bits)
+            share_time = timeit.timeit(run_share, number=1)
+            shares, p, commitments = result
+            def one_by_one():
+                assert all(verify_share(s, commitments, p, args.bits)
+                           for s in shares)
+            single_time = timeit.timeit(one_by_one, number=1)
+            batch_time = min(timeit.repeat(
+                lambda: verify_shares(shares, commitments, p, args.bits),
+                number=1, repeat=args.repeat))
+            assert verify_shares(shares, commitments, p, args.bits)
+            print("{0:>5d}{1:>6d}{2:>14.1f}{3:>16.1f}{4:>14.1f}{5:>9.1f}x"
+                  .format(t, n, share_time * 1e3, single_time * 1e3,
+                          batch_time * 1e3, single_time / batch_time))
+
+
+if __name__ == '__main__':
+    main()